@@ -4,7 +4,7 @@ in4viz - ER図可視化ライブラリ
 SVGとdraw.io形式での出力をサポートする統合ER図作成ライブラリ
 """
 
-from .core.models import Table, Column, LineType, Cardinality
+from .core.models import Table, Column, LineType, DetailLevel, Cardinality
 from .backends.svg import SVGERDiagram
 from .backends.drawio import DrawioERDiagram
 
@@ -14,6 +14,7 @@ __all__ = [
     'Table',
     'Column',
     'LineType',
+    'DetailLevel',
     'Cardinality',
     'SVGERDiagram',
     'DrawioERDiagram',
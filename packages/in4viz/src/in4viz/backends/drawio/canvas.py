@@ -1,6 +1,34 @@
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple
 from ...core.models import LineType
 
+# mxCell 内でセルIDを参照する属性
+_CELL_REF_KEYS = ('id', 'parent', 'source', 'target')
+
+
+class _LocalCellIds:
+    """ワーカープロセス内で使う仮のセルID発行器(親プロセスで通し番号に振り直す)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def get_next_cell_id(self) -> str:
+        cell_id = f'L{self.count}'
+        self.count += 1
+        return cell_id
+
+
+def _render_mxcell_batch(
+    tasks: List[Tuple[Any, Dict[str, Any], int, int]]
+) -> List[Tuple[List[Dict[str, Any]], str, int]]:
+    """ワーカープロセスでノードの mxCell をまとめて生成する(仮IDと発行数を返す)"""
+    results = []
+    for stencil, data, x, y in tasks:
+        ids = _LocalCellIds()
+        cells, cell_id = stencil.render_mxcells(data, x, y, ids)
+        results.append((cells, cell_id, ids.count))
+    return results
+
 
 class DrawioCanvas:
     """draw.io用のキャンバス管理クラス"""
@@ -27,6 +55,33 @@ class DrawioCanvas:
         self.next_cell_id += 1
         return cell_id
 
+    def render_node_cells(self, workers: int) -> List[Tuple[List[Dict[str, Any]], str]]:
+        """
+        全ノードの mxCell を workers 個のプロセスで分担して生成する
+
+        ワーカーでは仮IDで生成し、ノード順に get_next_cell_id() と同じ通し番号へ振り直すので、
+        直列に生成した場合と同じセルIDになる。
+
+        Returns:
+            ノードごとの (mxCellデータのリスト, グループセルID)
+        """
+        tasks = [(node.stencil, node.data, node.x, node.y) for node in self.nodes]
+        size = max(1, -(-len(tasks) // (workers * 4)))
+        batches = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for batch in executor.map(_render_mxcell_batch, batches) for result in batch]
+
+        node_cells = []
+        for cells, cell_id, count in results:
+            mapping = {f'L{i}': str(self.next_cell_id + i) for i in range(count)}
+            self.next_cell_id += count
+            for cell in cells:
+                for key in _CELL_REF_KEYS:
+                    if cell.get(key) in mapping:
+                        cell[key] = mapping[cell[key]]
+            node_cells.append((cells, mapping[cell_id]))
+        return node_cells
+
     def add_node(self, node: 'DrawioNode'):
         """ノードを追加"""
         self.nodes.append(node)
@@ -1,7 +1,7 @@
-from typing import List, Dict, Tuple
-from ...core.models import LineType, Cardinality, Table
+from typing import List, Dict, Tuple, Any, Optional
+from ...core.models import LineType, DetailLevel, Cardinality, Table
 from ...core.layout import LayoutEngine
-from ...core.routing import EdgeRouter
+from ...core.routing import EdgeRouter, RouteResult
 from .canvas import DrawioCanvas, DrawioNode
 from .stencil import DrawioTableStencil
 from .rendering import DrawioEdge
@@ -16,15 +16,34 @@ class DrawioERDiagram:
         default_line_type: LineType = LineType.STRAIGHT,
         min_width: int = 1200,
         min_height: int = 800,
-        ideal_length_factor: float = 1.6
+        ideal_length_factor: float = 1.6,
+        router_options: Optional[Dict[str, Any]] = None,
+        collapse_parallel_edges: bool = False,
+        client_routing: bool = False,
+        detail_level: DetailLevel = DetailLevel.FULL
     ):
         self.canvas = DrawioCanvas(default_line_type, min_width, min_height)
         self.nodes = self.canvas.nodes
         self.min_width = min_width
         self.min_height = min_height
         self.ideal_length_factor = ideal_length_factor
+        # EdgeRouter.route()/reroute() に渡す追加オプション(例: {'cache': RouteCache()})
+        self.router_options: Dict[str, Any] = dict(router_options or {})
+        # 同じテーブルペアの複数のリレーションを、レイアウトでは1本として数え、
+        # ルーティングでは1本の経路を平行にずらして共有する
+        self.collapse_parallel_edges = collapse_parallel_edges
+        if collapse_parallel_edges:
+            self.router_options.setdefault('collapse_parallel', True)
+        # True なら ORTHOGONAL エッジの経路探索を行わず、ポート位置と進入辺だけ決めて
+        # draw.io の orthogonalEdgeStyle に経路計算を任せる(出力はレイアウト時間だけで済む)
+        self.client_routing = client_routing
+        # テーブルに表示するカラムの範囲(以降に追加するテーブルに適用)
+        self.detail_level = detail_level
         self._layout_dirty = False
         self._route_dirty = False
+        # 直近のルーティング結果と、それ以降に移動したノードの移動前矩形(差分再ルーティング用)
+        self._routes: List[RouteResult] = []
+        self._moved_rects: Dict[str, Tuple[int, int, int, int]] = {}
 
     def add_table(self, table: Table, x: int = None, y: int = None) -> str:
         """
@@ -39,7 +58,7 @@ class DrawioERDiagram:
         """
         table_id = table.name
 
-        stencil = DrawioTableStencil()
+        stencil = DrawioTableStencil(detail_level=self.detail_level)
 
         # Column dataclassをdict形式に変換
         columns_data = []
@@ -118,6 +137,7 @@ class DrawioERDiagram:
             self._route_dirty = False
         node = self.get_node(node_id)
         if node:
+            self._moved_rects.setdefault(node_id, (node.x, node.y, node.width, node.height))
             node.x = x
             node.y = y
             self._route_dirty = True
@@ -135,6 +155,7 @@ class DrawioERDiagram:
         edge = DrawioEdge(from_node_id, to_node_id, line_type or self.canvas.default_line_type, cardinality)
         self.canvas.edges.append(edge)
         self._layout_dirty = True
+        self._routes = []
 
     def _ensure_layout_current(self):
         """必要な場合だけレイアウトとルーティングを更新する"""
@@ -155,13 +176,17 @@ class DrawioERDiagram:
             self._adjust_canvas_size_for_current_layout()
             return
 
+        # Force-directedレイアウトで全ノードが動くので、移動記録は使わない
+        self._moved_rects = {}
+
         # Force-directedレイアウトを実行
         new_width, new_height = LayoutEngine.layout(
             self.nodes,
             self.canvas.edges,
             min_width=self.min_width,
             min_height=self.min_height,
-            ideal_length_factor=self.ideal_length_factor
+            ideal_length_factor=self.ideal_length_factor,
+            collapse_parallel=self.collapse_parallel_edges
         )
 
         # 直交エッジルーティング: 配置確定後にwaypointsを計算(SVGと同一経路)
@@ -173,9 +198,21 @@ class DrawioERDiagram:
     def _route_edges(self):
         """ORTHOGONAL指定のエッジにポート位置と waypoints を設定"""
         orthogonal_edges = [e for e in self.canvas.edges if e.line_type == LineType.ORTHOGONAL]
+        moved_rects, self._moved_rects = self._moved_rects, {}
         if not orthogonal_edges:
+            self._routes = []
             return
-        routes = EdgeRouter.route(self.nodes, orthogonal_edges)
+        if self.client_routing:
+            # 経路はエディタ側で引くので、ポート割り当て(Pass 1〜2)だけ行う
+            routes = EdgeRouter.assign_ports(self.nodes, orthogonal_edges)
+        elif moved_rects and len(self._routes) == len(orthogonal_edges):
+            # ノード移動のみなら影響を受けるエッジだけ引き直す
+            routes = EdgeRouter.reroute(
+                self.nodes, orthogonal_edges, self._routes, moved_rects, **self.router_options
+            )
+        else:
+            routes = EdgeRouter.route(self.nodes, orthogonal_edges, **self.router_options)
+        self._routes = routes
         for edge, route in zip(orthogonal_edges, routes):
             from_node = self.canvas.get_node(edge.from_node_id)
             to_node = self.canvas.get_node(edge.to_node_id)
@@ -184,10 +221,32 @@ class DrawioERDiagram:
                 edge.exit_y = (route.from_point[1] - from_node.y) / from_node.height
                 edge.entry_x = (route.to_point[0] - to_node.x) / to_node.width
                 edge.entry_y = (route.to_point[1] - to_node.y) / to_node.height
+            edge.exit_side = route.from_side
+            edge.entry_side = route.to_side
+            edge.client_routing = self.client_routing
             edge.waypoints = route.waypoints
             edge.route_status = route.route_status
             edge.route_reason = route.route_reason
 
+    def get_route_diagnostics(self) -> List[Dict[str, Any]]:
+        """
+        ORTHOGONAL エッジのルーティング診断情報を取得
+
+        必要ならレイアウト・ルーティングを更新してから返す。
+        遅いエッジの特定には wall_time や expansions で並べ替えて使う。
+
+        Returns:
+            エッジごとの dict のリスト('from' / 'to' にノードID、残りは RouteResult.diagnostics())
+        """
+        self._ensure_layout_current()
+        orthogonal_edges = [e for e in self.canvas.edges if e.line_type == LineType.ORTHOGONAL]
+        diagnostics = []
+        for edge, route in zip(orthogonal_edges, self._routes):
+            entry = {'from': edge.from_node_id, 'to': edge.to_node_id}
+            entry.update(route.diagnostics())
+            diagnostics.append(entry)
+        return diagnostics
+
     def _adjust_canvas_size_for_current_layout(self):
         """現在のレイアウトに基づいてキャンバスサイズを調整"""
         new_width, new_height = LayoutEngine.adjust_canvas_size(
@@ -202,10 +261,14 @@ class DrawioERDiagram:
         self.canvas.width = width
         self.canvas.height = height
 
-    def render_drawio(self) -> str:
+    def render_drawio(self, workers: int = 1) -> str:
         """
         draw.io XML形式でレンダリング
 
+        Args:
+            workers: 2 以上なら、テーブルの mxCell をプロセスプールで並列に生成する
+                (出力は直列の場合と同じ)
+
         Returns:
             mxGraphModel XML文字列
         """
@@ -214,12 +277,17 @@ class DrawioERDiagram:
         cells = []
 
         # ノード（テーブル）をレンダリング
-        for node in self.nodes:
-            # ステンシルからmxCellリストを取得
-            table_cells, table_cell_id = node.stencil.render_mxcells(node.data, node.x, node.y, self.canvas)
-            cells.extend(table_cells)
-            # ノードにcell_idを設定（エッジで参照するため）
-            node.cell_id = table_cell_id
+        if workers > 1 and len(self.nodes) > 1:
+            for node, (table_cells, table_cell_id) in zip(self.nodes, self.canvas.render_node_cells(workers)):
+                cells.extend(table_cells)
+                node.cell_id = table_cell_id
+        else:
+            for node in self.nodes:
+                # ステンシルからmxCellリストを取得
+                table_cells, table_cell_id = node.stencil.render_mxcells(node.data, node.x, node.y, self.canvas)
+                cells.extend(table_cells)
+                # ノードにcell_idを設定（エッジで参照するため）
+                node.cell_id = table_cell_id
 
         # エッジ（関係線）をレンダリング
         for edge in self.canvas.edges:
@@ -234,14 +302,15 @@ class DrawioERDiagram:
         # mxGraphModel XMLを生成
         return DrawioGenerator.create_mxgraph_model(cells, self.canvas.width, self.canvas.height)
 
-    def save_drawio(self, output):
+    def save_drawio(self, output, workers: int = 1):
         """
         draw.io XMLを出力する
 
         Args:
             output: ファイルパス(str)またはファイルライクオブジェクト
+            workers: render_drawio() と同じ
         """
-        xml_content = self.render_drawio()
+        xml_content = self.render_drawio(workers)
 
         if isinstance(output, str):
             # ファイルパスの場合
@@ -1,6 +1,9 @@
 from typing import List, Tuple, Optional
 from ...core.models import LineType, Cardinality
 
+# 進入辺 → draw.io のポート制約(sourcePortConstraint / targetPortConstraint)
+_PORT_CONSTRAINTS = {'top': 'north', 'right': 'east', 'bottom': 'south', 'left': 'west'}
+
 
 class DrawioEdge:
     """draw.io用のエッジ（関係線）クラス"""
@@ -16,6 +19,11 @@ class DrawioEdge:
         self.exit_y: Optional[float] = None
         self.entry_x: Optional[float] = None
         self.entry_y: Optional[float] = None
+        # 進入辺('top' | 'right' | 'bottom' | 'left')。client_routing 時のポート制約に使う
+        self.exit_side: Optional[str] = None
+        self.entry_side: Optional[str] = None
+        # True なら経路計算を draw.io に任せる(orthogonalEdgeStyle + ポート制約、waypoints なし)
+        self.client_routing = False
         self.route_status: str = "ok"
         self.route_reason: str = ""
 
@@ -51,10 +59,17 @@ class DrawioEdge:
 
         # LineTypeに応じたedgeStyle
         # ORTHOGONAL は in4viz 側で計算した waypoints を mxGeometry/Array に渡して
-        # SVG と同じ経路で描画する。drawio ネイティブの orthogonalEdgeStyle は使わない。
+        # SVG と同じ経路で描画する。client_routing の場合だけ drawio ネイティブの
+        # orthogonalEdgeStyle を使い、ポート位置と進入辺の制約だけを渡して経路はエディタに任せる。
         if self.line_type == LineType.ORTHOGONAL:
-            style_parts.append("edgeStyle=none")
-            style_parts.append("rounded=0")
+            if self.client_routing:
+                style_parts.append("edgeStyle=orthogonalEdgeStyle")
+                style_parts.append("rounded=0")
+                style_parts.append("orthogonalLoop=1")
+                style_parts.append("jettySize=auto")
+            else:
+                style_parts.append("edgeStyle=none")
+                style_parts.append("rounded=0")
             # ポート分配済みなら exitX/Y, entryX/Y を指定して SVG と同じ位置で接続
             if self.exit_x is not None:
                 style_parts.append(f"exitX={self.exit_x:.4f}")
@@ -66,6 +81,11 @@ class DrawioEdge:
                 style_parts.append(f"entryY={self.entry_y:.4f}")
                 style_parts.append("entryDx=0")
                 style_parts.append("entryDy=0")
+            if self.client_routing:
+                if self.exit_side is not None:
+                    style_parts.append(f"sourcePortConstraint={_PORT_CONSTRAINTS[self.exit_side]}")
+                if self.entry_side is not None:
+                    style_parts.append(f"targetPortConstraint={_PORT_CONSTRAINTS[self.entry_side]}")
         elif self.line_type == LineType.SPLINE:
             style_parts.append("edgeStyle=elbowEdgeStyle")
             style_parts.append("curved=1")
@@ -1,4 +1,5 @@
 from typing import List, Dict, Any, Tuple
+from ...core.models import DetailLevel
 from ...core.text_metrics import calculate_text_width
 from .generator import DrawioGenerator
 
@@ -6,9 +7,11 @@ from .generator import DrawioGenerator
 class DrawioTableStencil:
     """draw.io用のテーブルステンシル（テーブル形式 - SVGと同一レイアウト）"""
 
-    def __init__(self, width: int = 400, min_height: int = 100):
+    def __init__(self, width: int = 400, min_height: int = 100, detail_level: DetailLevel = DetailLevel.FULL):
         self.width = width
         self.min_height = min_height
+        # 表示するカラムの範囲。高さ・幅の計算にも反映されるので、レイアウトも小さくなる
+        self.detail_level = detail_level
         self.row_height = 22
         self.header_height = 25
         self.min_logical_width = 40
@@ -18,11 +21,20 @@ class DrawioTableStencil:
         self.min_constraint_width = 25
         self.padding = 10
 
+    def _visible_columns(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """detail_level に応じて表示するカラム"""
+        columns = data.get('columns', [])
+        if self.detail_level == DetailLevel.HEADER:
+            return []
+        if self.detail_level == DetailLevel.KEYS:
+            return [col for col in columns if col.get('primary_key', False) or col.get('foreign_key', False)]
+        return columns
+
     def _calculate_widths(self, data: Dict[str, Any]) -> Dict[str, int]:
         """テーブルとカラムの幅を計算"""
         physical_name = data.get('table_name', 'Table')
         logical_name = data.get('logical_name', physical_name)
-        columns = data.get('columns', [])
+        columns = self._visible_columns(data)
 
         # テーブル名の幅計算
         logical_table_width = max(self.min_logical_width, calculate_text_width(logical_name, True) + self.padding)
@@ -63,6 +75,10 @@ class DrawioTableStencil:
 
         column_total_width = marker_width + max_logical_col_width + max_physical_col_width + max_type_width + max_constraint_width
 
+        # ヘッダーのみの場合はテーブル名の幅だけにする
+        if self.detail_level == DetailLevel.HEADER:
+            column_total_width = 0
+
         return {
             'table_logical_width': logical_table_width,
             'table_physical_width': physical_table_width,
@@ -78,7 +94,7 @@ class DrawioTableStencil:
 
     def calculate_height(self, data: Dict[str, Any]) -> int:
         """テーブルの高さを計算"""
-        columns = data.get('columns', [])
+        columns = self._visible_columns(data)
         pk_columns = [col for col in columns if col.get('primary_key', False)]
         regular_columns = [col for col in columns if not col.get('primary_key', False)]
 
@@ -106,7 +122,7 @@ class DrawioTableStencil:
         cells = []
         physical_name = data.get('table_name', 'Table')
         logical_name = data.get('logical_name', physical_name)
-        columns = data.get('columns', [])
+        columns = self._visible_columns(data)
         bgcolor = data.get('bgcolor', '#ffffff')
         use_gradient = data.get('use_gradient', False)
 
@@ -1,4 +1,4 @@
 """SVG出力バックエンド"""
-from .er_diagram import SVGERDiagram
+from .er_diagram import SVGERDiagram, SVGDelta
 
-__all__ = ['SVGERDiagram']
+__all__ = ['SVGERDiagram', 'SVGDelta']
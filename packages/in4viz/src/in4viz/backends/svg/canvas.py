@@ -1,7 +1,25 @@
-from typing import List, Dict, Any, Tuple
-from ...core.models import LineType
-from .rendering import Edge
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Deque, Iterator, Optional, Tuple
+from ...core.models import DetailLevel, LineType
+from ...core.spatial import SpatialIndex
+from .rendering import Edge, render_ie_symbol_defs
 from .stencil import Stencil
+from .styles import SVGStyleSheet, _escape_id
+
+
+def node_element_id(node_id: str) -> str:
+    """テーブルの <g> 要素ID"""
+    return f'n-{_escape_id(node_id)}'
+
+
+# 並列描画でワーカーに1度に渡すノード数
+_FRAGMENT_BATCH_SIZE = 16
+
+
+def _render_fragment_batch(tasks: List[Tuple[Stencil, Dict[str, Any], Dict[str, Any]]]) -> List[str]:
+    """ワーカープロセスでノード断片をまとめて描画する"""
+    return [stencil.render(data, 0, 0, **kwargs) for stencil, data, kwargs in tasks]
 
 
 class Canvas:
@@ -10,6 +28,8 @@ class Canvas:
         self.height = height
         self.default_line_type = default_line_type
         self.nodes: List['Node'] = []
+        # node_id → ノード(get_node の高速化用。add_node で登録する)
+        self._node_map: Dict[str, 'Node'] = {}
         self.edges: List[Edge] = []
         self.next_position = [50, 50]
         self.column_width = 450
@@ -17,6 +37,7 @@ class Canvas:
 
     def add_node(self, node: 'Node'):
         self.nodes.append(node)
+        self._node_map.setdefault(node.node_id, node)
 
     def add_edge(self, from_node_id: str, to_node_id: str, line_type: LineType = None):
         if line_type is None:
@@ -25,6 +46,10 @@ class Canvas:
         self.edges.append(edge)
 
     def get_node(self, node_id: str) -> 'Node':
+        node = self._node_map.get(node_id)
+        if node is not None:
+            return node
+        # add_node を通さずに追加されたノード
         for node in self.nodes:
             if node.node_id == node_id:
                 return node
@@ -114,30 +139,144 @@ class Canvas:
         return int(from_x), int(from_y), int(to_x), int(to_y), from_edge, to_edge
 
     def render_edges(self) -> List[str]:
-        edge_parts = []
+        return list(self.iter_edges())
+
+    def _edge_endpoints(self, edge: Edge) -> Optional[Tuple[int, int, int, int, str, str]]:
+        """エッジの両端の座標と接続辺(ノードが見つからなければ None)"""
+        from_node = self.get_node(edge.from_node_id)
+        to_node = self.get_node(edge.to_node_id)
+        if not (from_node and to_node):
+            return None
+        if edge.from_point is not None and edge.to_point is not None:
+            # ルーター由来のポートとサイドを優先利用
+            return (*edge.from_point, *edge.to_point, edge.from_side, edge.to_side)
+        return self._get_node_edge_points(from_node, to_node)
+
+    def edge_element_ids(self) -> List[str]:
+        """
+        エッジの <g> 要素ID(self.edges と同じ順)
+
+        同じテーブルペアのエッジは、追加順の通し番号で区別する。
+        """
+        counts: Dict[Tuple[str, str], int] = {}
+        element_ids = []
         for edge in self.edges:
-            from_node = self.get_node(edge.from_node_id)
-            to_node = self.get_node(edge.to_node_id)
-
-            if from_node and to_node:
-                if edge.from_point is not None and edge.to_point is not None:
-                    # ルーター由来のポートとサイドを優先利用
-                    from_x, from_y = edge.from_point
-                    to_x, to_y = edge.to_point
-                    from_edge = edge.from_side
-                    to_edge = edge.to_side
-                else:
-                    from_x, from_y, to_x, to_y, from_edge, to_edge = self._get_node_edge_points(from_node, to_node)
-                edge_parts.append(edge.render(from_x, from_y, to_x, to_y, edge.line_type, from_edge, to_edge))
+            pair = (edge.from_node_id, edge.to_node_id)
+            k = counts.get(pair, 0)
+            counts[pair] = k + 1
+            element_ids.append(f'e-{_escape_id(edge.from_node_id)}-{_escape_id(edge.to_node_id)}-{k}')
+        return element_ids
+
+    def render_edge(self, edge: Edge, element_id: str, compact: bool = False, minify: bool = False) -> Optional[str]:
+        """エッジを要素ID付きの <g> で返す(ノードが見つからなければ None)"""
+        endpoints = self._edge_endpoints(edge)
+        if endpoints is None:
+            return None
+        from_x, from_y, to_x, to_y, from_edge, to_edge = endpoints
+        body = edge.render(from_x, from_y, to_x, to_y, edge.line_type, from_edge, to_edge, compact, minify)
+        if minify:
+            return f'<g id="{element_id}">{body}</g>'
+        return f'<g id="{element_id}">\n{body}\n</g>'
+
+    def iter_edges(self, compact: bool = False, minify: bool = False, edges: Optional[List[Edge]] = None) -> Iterator[str]:
+        """
+        エッジのSVG断片を1本ずつ生成する(compact なら書式をクラスで指定、minify なら省略形)
+
+        edges を指定した場合はそのエッジだけを描画する。
+        """
+        element_ids = {id(edge): element_id for edge, element_id in zip(self.edges, self.edge_element_ids())}
+        for edge in self.edges if edges is None else edges:
+            part = self.render_edge(edge, element_ids[id(edge)], compact, minify)
+            if part is not None:
+                yield part
+
+    def build_index(self, cell_size: int = 256) -> Tuple[SpatialIndex, SpatialIndex]:
+        """
+        ノードとエッジの空間索引を作る
 
-        return edge_parts
+        Returns:
+            (ノード索引, エッジ索引)。要素番号は self.nodes / self.edges の添字
+        """
+        node_index = SpatialIndex(cell_size)
+        for i, node in enumerate(self.nodes):
+            node_index.insert(i, (node.x, node.y, node.x + node.width, node.y + node.height))
+        edge_index = SpatialIndex(cell_size)
+        for i, edge in enumerate(self.edges):
+            endpoints = self._edge_endpoints(edge)
+            if endpoints is not None:
+                from_x, from_y, to_x, to_y, from_edge, to_edge = endpoints
+                for box in edge.bounds(from_x, from_y, to_x, to_y, edge.line_type, from_edge, to_edge):
+                    edge_index.insert(i, box)
+        return node_index, edge_index
 
-    def render_arrow_marker(self) -> str:
-        return '''<defs>
+    def iter_node_fragments(
+        self,
+        nodes: List['Node'],
+        styles: Optional[SVGStyleSheet] = None,
+        minify: bool = False,
+        workers: int = 1,
+        detail_level: Optional[DetailLevel] = None,
+        cache: bool = True
+    ) -> Iterator[str]:
+        """
+        nodes の断片を順に生成する
+
+        workers が 2 以上なら、キャッシュにない断片を workers 個のプロセスで分担して描画する。
+        先読みするのは workers * 2 バッチまでなので、並列でも保持する断片の数は一定で済む。
+        出力は直列に描画した場合と同じ。cache=False ならキャッシュに格納しない。
+        detail_level は Node.fragment() と同じ。
+        """
+        missing = sum(node._fragment_key(styles, minify, detail_level) not in node._fragments for node in nodes)
+        if workers <= 1 or missing < 2:
+            for node in nodes:
+                yield node.fragment(styles, minify, detail_level, cache)
+            return
+        batches = (nodes[i:i + _FRAGMENT_BATCH_SIZE] for i in range(0, len(nodes), _FRAGMENT_BATCH_SIZE))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            queue: Deque[Tuple[List[Tuple['Node', Tuple, Optional[str]]], Any]] = deque()
+
+            def submit() -> bool:
+                batch = next(batches, None)
+                if batch is None:
+                    return False
+                entries, tasks = [], []
+                for node in batch:
+                    key = node._fragment_key(styles, minify, detail_level)
+                    fragment = node._fragments.get(key)
+                    if fragment is None:
+                        tasks.append((node.stencil, node.data, node._stencil_kwargs(styles, minify, detail_level)))
+                    entries.append((node, key, fragment))
+                queue.append((entries, executor.submit(_render_fragment_batch, tasks) if tasks else None))
+                return True
+
+            for _ in range(workers * 2):
+                if not submit():
+                    break
+            while queue:
+                entries, future = queue.popleft()
+                rendered = iter(future.result() if future is not None else ())
+                for node, key, fragment in entries:
+                    if fragment is None:
+                        fragment = next(rendered)
+                        if cache:
+                            node._fragments[key] = fragment
+                    yield fragment
+                submit()
+
+    def render_arrow_marker(self, minify: bool = False) -> str:
+        # IE記号はエッジごとに描かず、ここで定義した <symbol> を <use> で参照する
+        if minify:
+            return (
+                '<defs><marker id="arrowhead" markerWidth="10" markerHeight="7" refX="10" refY="3.5" orient="auto">'
+                '<polygon points="0 0 10 3.5 0 7"/></marker>'
+                f'{render_ie_symbol_defs(True)}</defs>'
+            )
+        return f'''<defs>
             <marker id="arrowhead" markerWidth="10" markerHeight="7"
                     refX="10" refY="3.5" orient="auto">
                 <polygon points="0 0, 10 3.5, 0 7" fill="black"/>
             </marker>
+{render_ie_symbol_defs()}
         </defs>'''
 
 
@@ -145,12 +284,27 @@ class Node:
     def __init__(self, node_id: str, stencil: Stencil, data: Dict[str, Any], x: int = 0, y: int = 0):
         self.node_id = node_id
         self.stencil = stencil
+        # ローカル座標(原点基準)で描画したSVG断片のキャッシュ。キーは出力モード
+        self._fragments: Dict[Tuple[bool, bool, Optional[str], Optional[DetailLevel]], str] = {}
         self.data = data
         self.x = x
         self.y = y
         self.width = stencil.width
         self.height = self._calculate_height()
 
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self._data
+
+    @data.setter
+    def data(self, data: Dict[str, Any]):
+        self._data = data
+        self.invalidate()
+
+    def invalidate(self):
+        """描画キャッシュを破棄する(data を直接書き換えた場合に呼ぶ)"""
+        self._fragments.clear()
+
     def _calculate_height(self) -> int:
         if hasattr(self.stencil, 'calculate_height'):
             return self.stencil.calculate_height(self.data)
@@ -161,5 +315,74 @@ class Node:
             return self.stencil.get_width(self.data)
         return self.stencil.width
 
-    def render(self) -> str:
-        return self.stencil.render(self.data, self.x, self.y)
+    def _detail_override(self, detail_level: Optional[DetailLevel]) -> Optional[DetailLevel]:
+        """ステンシルの表示詳細度と同じなら None(同じ断片を別々にキャッシュしないため)"""
+        if detail_level == getattr(self.stencil, 'detail_level', None):
+            return None
+        return detail_level
+
+    def _fragment_key(
+        self, styles: Optional[SVGStyleSheet], minify: bool, detail_level: Optional[DetailLevel] = None
+    ) -> Tuple[bool, bool, Optional[str], Optional[DetailLevel]]:
+        """断片キャッシュのキー"""
+        # compact モードの共有グラデーションIDは描画ごとに振り直されるのでキーに含める
+        gradient_id = None
+        if styles is not None and self.data.get('use_gradient', False):
+            gradient_id = styles.gradient_id(self.data.get('bgcolor', '#ffffff'))
+        return (styles is not None, minify, gradient_id, self._detail_override(detail_level))
+
+    def _stencil_kwargs(
+        self, styles: Optional[SVGStyleSheet], minify: bool, detail_level: Optional[DetailLevel] = None
+    ) -> Dict[str, Any]:
+        """ステンシルに渡す追加引数(独自ステンシルとの互換のため、既定値でないものだけ)"""
+        kwargs = {}
+        if styles is not None:
+            kwargs['styles'] = styles
+        if minify:
+            kwargs['minify'] = True
+        detail_level = self._detail_override(detail_level)
+        if detail_level is not None:
+            kwargs['detail_level'] = detail_level
+        return kwargs
+
+    def fragment(
+        self,
+        styles: Optional[SVGStyleSheet] = None,
+        minify: bool = False,
+        detail_level: Optional[DetailLevel] = None,
+        cache: bool = True
+    ) -> str:
+        """
+        原点基準で描画したステンシルの断片(キャッシュがあればそれを返す)
+
+        detail_level を指定すると、ステンシルの表示詳細度の代わりにその詳細度で描く。
+        cache=False なら、新たに描画した断片をキャッシュに格納しない。
+        """
+        key = self._fragment_key(styles, minify, detail_level)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = self.stencil.render(self.data, 0, 0, **self._stencil_kwargs(styles, minify, detail_level))
+            if cache:
+                self._fragments[key] = fragment
+        return fragment
+
+    def render(
+        self,
+        styles: Optional[SVGStyleSheet] = None,
+        minify: bool = False,
+        detail_level: Optional[DetailLevel] = None
+    ) -> str:
+        """
+        ノードを <g transform="translate(x y)"> で配置して返す
+
+        ステンシルは原点基準で1度だけ描画してキャッシュするので、
+        移動しただけのノードは再描画しない。
+        """
+        return self.place(self.fragment(styles, minify, detail_level), minify)
+
+    def place(self, fragment: str, minify: bool = False) -> str:
+        """原点基準の断片 fragment を <g transform="translate(x y)"> でノードの位置に配置する"""
+        element_id = node_element_id(self.node_id)
+        if minify:
+            return f'<g id="{element_id}" transform="translate({int(self.x)} {int(self.y)})">{fragment}</g>'
+        return f'<g id="{element_id}" transform="translate({self.x} {self.y})">\n{fragment}\n</g>'
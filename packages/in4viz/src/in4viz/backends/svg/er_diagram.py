@@ -1,10 +1,35 @@
-from typing import List, Dict, Tuple
-from ...core.models import LineType, Cardinality, Table
+from dataclasses import dataclass, field
+import gzip
+import json
+import math
+import os
+from typing import List, Dict, Iterator, Tuple, Any, Optional
+from ...core.models import LineType, DetailLevel, Cardinality, Table
 from ...core.layout import LayoutEngine
-from ...core.routing import EdgeRouter
-from .canvas import Canvas, Node
+from ...core.routing import EdgeRouter, RouteResult
+from ...core.spatial import SpatialIndex
+from .canvas import Canvas, Node, node_element_id
 from .stencil import TableStencil
 from .rendering import Edge
+from .styles import SVGStyleSheet
+
+
+@dataclass
+class SVGDelta:
+    """render_svg_delta() の結果
+
+    要素IDはテーブルが 'n-'、エッジが 'e-' で始まる。
+    added はノード→エッジの文書順に並ぶので、クライアントはノードを最初のエッジの前、
+    エッジを末尾に挿入すればよい。
+    """
+    token: str
+    width: int
+    height: int
+    # since_token が無効だった場合は文書全体(added / updated / removed は空)
+    document: Optional[str] = None
+    added: List[Tuple[str, str]] = field(default_factory=list)    # (要素ID, SVG断片)
+    updated: List[Tuple[str, str]] = field(default_factory=list)  # (要素ID, SVG断片)
+    removed: List[str] = field(default_factory=list)              # 要素ID
 
 
 class SVGERDiagram:
@@ -15,15 +40,33 @@ class SVGERDiagram:
         default_line_type: LineType = LineType.STRAIGHT,
         min_width: int = 800,
         min_height: int = 600,
-        ideal_length_factor: float = 1.6
+        ideal_length_factor: float = 1.6,
+        router_options: Optional[Dict[str, Any]] = None,
+        collapse_parallel_edges: bool = False,
+        detail_level: DetailLevel = DetailLevel.FULL
     ):
         self.canvas = Canvas(min_width, min_height, default_line_type)
         self.nodes = self.canvas.nodes
         self.min_width = min_width
         self.min_height = min_height
         self.ideal_length_factor = ideal_length_factor
+        # EdgeRouter.route()/reroute() に渡す追加オプション(例: {'cache': RouteCache()})
+        self.router_options: Dict[str, Any] = dict(router_options or {})
+        # 同じテーブルペアの複数のリレーションを、レイアウトでは1本として数え、
+        # ルーティングでは1本の経路を平行にずらして共有する
+        self.collapse_parallel_edges = collapse_parallel_edges
+        if collapse_parallel_edges:
+            self.router_options.setdefault('collapse_parallel', True)
+        # テーブルに表示するカラムの範囲(以降に追加するテーブルに適用)
+        self.detail_level = detail_level
         self._layout_dirty = False
         self._route_dirty = False
+        # 直近のルーティング結果と、それ以降に移動したノードの移動前矩形(差分再ルーティング用)
+        self._routes: List[RouteResult] = []
+        self._moved_rects: Dict[str, Tuple[int, int, int, int]] = {}
+        # 直近の render_svg_delta() の (トークン, minify, 要素ID → 状態)
+        self._delta_serial = 0
+        self._delta_baseline: Optional[Tuple[str, bool, Dict[str, Any]]] = None
 
     def add_table(self, table: Table, x: int = None, y: int = None) -> str:
         """
@@ -38,7 +81,7 @@ class SVGERDiagram:
         """
         table_id = table.name
 
-        stencil = TableStencil()
+        stencil = TableStencil(detail_level=self.detail_level)
 
         # Column dataclassをdict形式に変換
         columns_data = []
@@ -117,6 +160,7 @@ class SVGERDiagram:
             self._route_dirty = False
         node = self.get_node(node_id)
         if node:
+            self._moved_rects.setdefault(node_id, (node.x, node.y, node.width, node.height))
             node.x = x
             node.y = y
             self._route_dirty = True
@@ -134,6 +178,7 @@ class SVGERDiagram:
         edge = Edge(from_node_id, to_node_id, line_type or self.canvas.default_line_type, cardinality)
         self.canvas.edges.append(edge)
         self._layout_dirty = True
+        self._routes = []
 
     def _ensure_layout_current(self):
         """必要な場合だけレイアウトとルーティングを更新する"""
@@ -154,13 +199,17 @@ class SVGERDiagram:
             self._adjust_canvas_size_for_current_layout()
             return
 
+        # Force-directedレイアウトで全ノードが動くので、移動記録は使わない
+        self._moved_rects = {}
+
         # Force-directedレイアウトを実行
         new_width, new_height = LayoutEngine.layout(
             self.nodes,
             self.canvas.edges,
             min_width=self.min_width,
             min_height=self.min_height,
-            ideal_length_factor=self.ideal_length_factor
+            ideal_length_factor=self.ideal_length_factor,
+            collapse_parallel=self.collapse_parallel_edges
         )
 
         # 直交エッジルーティング: 配置確定後にwaypointsを計算
@@ -172,9 +221,18 @@ class SVGERDiagram:
     def _route_edges(self):
         """ORTHOGONAL指定のエッジにポート/サイド/waypoints を設定"""
         orthogonal_edges = [e for e in self.canvas.edges if e.line_type == LineType.ORTHOGONAL]
+        moved_rects, self._moved_rects = self._moved_rects, {}
         if not orthogonal_edges:
+            self._routes = []
             return
-        routes = EdgeRouter.route(self.nodes, orthogonal_edges)
+        if moved_rects and len(self._routes) == len(orthogonal_edges):
+            # ノード移動のみなら影響を受けるエッジだけ引き直す
+            routes = EdgeRouter.reroute(
+                self.nodes, orthogonal_edges, self._routes, moved_rects, **self.router_options
+            )
+        else:
+            routes = EdgeRouter.route(self.nodes, orthogonal_edges, **self.router_options)
+        self._routes = routes
         for edge, route in zip(orthogonal_edges, routes):
             edge.from_point = route.from_point
             edge.to_point = route.to_point
@@ -184,6 +242,25 @@ class SVGERDiagram:
             edge.route_status = route.route_status
             edge.route_reason = route.route_reason
 
+    def get_route_diagnostics(self) -> List[Dict[str, Any]]:
+        """
+        ORTHOGONAL エッジのルーティング診断情報を取得
+
+        必要ならレイアウト・ルーティングを更新してから返す。
+        遅いエッジの特定には wall_time や expansions で並べ替えて使う。
+
+        Returns:
+            エッジごとの dict のリスト('from' / 'to' にノードID、残りは RouteResult.diagnostics())
+        """
+        self._ensure_layout_current()
+        orthogonal_edges = [e for e in self.canvas.edges if e.line_type == LineType.ORTHOGONAL]
+        diagnostics = []
+        for edge, route in zip(orthogonal_edges, self._routes):
+            entry = {'from': edge.from_node_id, 'to': edge.to_node_id}
+            entry.update(route.diagnostics())
+            diagnostics.append(entry)
+        return diagnostics
+
     def _adjust_canvas_size_for_current_layout(self):
         """現在のレイアウトに基づいてキャンバスサイズを調整"""
         new_width, new_height = LayoutEngine.adjust_canvas_size(
@@ -198,41 +275,316 @@ class SVGERDiagram:
         self.canvas.width = width
         self.canvas.height = height
 
-    def render_svg(self) -> str:
+    def render_svg(
+        self,
+        compact: bool = False,
+        minify: bool = False,
+        workers: int = 1,
+        viewport: Optional[Tuple[int, int, int, int]] = None
+    ) -> str:
         """
         SVG形式でレンダリング
 
+        Args:
+            compact: True の場合、テキスト・線の書式を1つの <style> ブロックのクラスで指定し、
+                グラデーションを色ごとに1つだけ定義して共有する(出力サイズが小さくなる)
+            minify: True の場合、改行・インデントと既定値の属性を省き、座標を整数にして、
+                ORTHOGONAL エッジを相対コマンド(h / v)で書き出す。compact と併用できる
+            workers: 2 以上なら、キャッシュにないテーブルの断片をプロセスプールで並列に描画する
+                (出力は直列の場合と同じ)
+            viewport: (x, y, width, height) を指定すると、その範囲に重なるテーブルとエッジだけを出力し、
+                viewBox をその範囲にする
+
         Returns:
             SVG XML文字列
         """
+        return ''.join(self._iter_svg(compact, minify, workers, viewport, cache=True))
+
+    def iter_svg(
+        self,
+        compact: bool = False,
+        minify: bool = False,
+        workers: int = 1,
+        viewport: Optional[Tuple[int, int, int, int]] = None
+    ) -> Iterator[str]:
+        """
+        SVGを断片ごとに生成する
+
+        ヘッダー、defs、ノード1つ分、エッジ1本分の順に文字列を返す。
+        連結すると render_svg() と同じ文字列になる。
+        文書全体を保持しないので、巨大な図でもメモリ使用量は最大の断片程度で済む。
+        描画した断片はノードのキャッシュにも残さない(render_svg() はキャッシュする)。
+        workers が 2 以上でも、先読みは workers に比例する数のノードまでにとどめる。
+
+        Args:
+            compact, minify, workers, viewport: render_svg() と同じ
+
+        Yields:
+            SVG XML文字列の断片
+        """
+        return self._iter_svg(compact, minify, workers, viewport, cache=False)
+
+    def _iter_svg(
+        self,
+        compact: bool,
+        minify: bool,
+        workers: int,
+        viewport: Optional[Tuple[int, int, int, int]],
+        cache: bool
+    ) -> Iterator[str]:
         self._ensure_layout_current()
+        if viewport is None:
+            header = f'width="{self.canvas.width}" height="{self.canvas.height}"'
+            nodes, edges = self.nodes, self.canvas.edges
+        else:
+            x, y, width, height = viewport
+            header = f'width="{width}" height="{height}" viewBox="{x} {y} {width} {height}"'
+            nodes, edges = self._select_region(self.canvas.build_index(), viewport)
+        yield from self._iter_svg_document(header, nodes, edges, compact, minify, workers, cache=cache)
 
-        node_parts = []
+    def _select_region(
+        self,
+        indexes: Tuple[SpatialIndex, SpatialIndex],
+        viewport: Tuple[float, float, float, float]
+    ) -> Tuple[List[Node], List[Edge]]:
+        """空間索引から、viewport (x, y, width, height) に重なるノードとエッジを元の順序で取り出す"""
+        node_index, edge_index = indexes
+        x, y, width, height = viewport
+        rect = (x, y, x + width, y + height)
+        nodes = [self.nodes[i] for i in node_index.query(rect)]
+        edges = [self.canvas.edges[i] for i in edge_index.query(rect)]
+        return nodes, edges
+
+    def _iter_svg_document(
+        self,
+        header: str,
+        nodes: List[Node],
+        edges: List[Edge],
+        compact: bool,
+        minify: bool,
+        workers: int = 1,
+        detail_level: Optional[DetailLevel] = None,
+        cache: bool = True
+    ) -> Iterator[str]:
+        """
+        <svg> 要素の属性 header と、描画するノード・エッジからSVG文書の断片を生成する
+
+        detail_level を指定すると、テーブルをその詳細度で描く(外枠の大きさは変えない)。
+        cache=False なら、描画したノード断片をキャッシュに残さない。
+        """
+        styles = None
+        if compact:
+            # グラデーションは defs に先に書き出すので、使う色を先に登録する
+            styles = SVGStyleSheet()
+            for node in nodes:
+                if node.data.get('use_gradient', False):
+                    styles.gradient_id(node.data.get('bgcolor', '#ffffff'))
+
+        # minify モードでは断片間の改行・インデントを入れない
+        indent, newline = ('', '') if minify else ('\n    ', '\n')
+        yield f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" {header}>{indent}'
+        yield self.canvas.render_arrow_marker(minify)
+        if styles is not None:
+            yield styles.render(minify)
+        yield indent
+        fragments = self.canvas.iter_node_fragments(nodes, styles, minify, workers, detail_level, cache)
+        for i, (fragment, node) in enumerate(zip(fragments, nodes)):
+            if i:
+                yield newline
+            yield node.place(fragment, minify)
+        yield indent
+        for i, edge_part in enumerate(self.canvas.iter_edges(compact, minify, edges)):
+            if i:
+                yield newline
+            yield edge_part
+        yield f'{newline}</svg>'
+
+    def render_svg_delta(self, since_token: Optional[str] = None, minify: bool = False) -> SVGDelta:
+        """
+        前回の render_svg_delta() からの差分を返す
+
+        テーブル・エッジは要素ID付きの <g> で出力されるので、クライアントは
+        added / updated / removed に従って DOM を差し替えればよい。
+        since_token が直前に返したトークンでない場合(初回を含む)は、文書全体を document に入れて返す。
+        変化の判定はテーブルの位置と描画キャッシュ、エッジの端点・経路・記号で行い、
+        変化したエッジだけを描画し直す。
+
+        Args:
+            since_token: 前回返された SVGDelta.token
+            minify: render_svg() と同じ(前回と異なる場合は文書全体を返す)
+
+        Returns:
+            SVGDelta
+        """
+        self._ensure_layout_current()
+
+        states: Dict[str, Any] = {}
         for node in self.nodes:
-            node_parts.append(node.render())
+            states[node_element_id(node.node_id)] = (node, (node.x, node.y, node.fragment(None, minify)))
+        for edge, element_id in zip(self.canvas.edges, self.canvas.edge_element_ids()):
+            endpoints = self.canvas._edge_endpoints(edge)
+            if endpoints is None:
+                continue
+            cardinality = edge.cardinality
+            signature = (
+                endpoints, tuple(edge.waypoints), edge.line_type,
+                cardinality.from_side if cardinality else None,
+                cardinality.to_side if cardinality else None,
+                edge.route_status, edge.route_reason,
+            )
+            states[element_id] = (edge, signature)
+
+        baseline = self._delta_baseline
+        self._delta_serial += 1
+        token = str(self._delta_serial)
+        self._delta_baseline = (token, minify, {element_id: state[1] for element_id, state in states.items()})
+        delta = SVGDelta(token, self.canvas.width, self.canvas.height)
+
+        if baseline is None or baseline[0] != since_token or baseline[1] != minify:
+            delta.document = self.render_svg(minify=minify)
+            return delta
+
+        previous = baseline[2]
+        for element_id, (element, signature) in states.items():
+            old = previous.get(element_id)
+            if old == signature:
+                continue
+            if isinstance(element, Node):
+                fragment = element.render(None, minify)
+            else:
+                fragment = self.canvas.render_edge(element, element_id, minify=minify)
+            (delta.added if old is None else delta.updated).append((element_id, fragment))
+        delta.removed = [element_id for element_id in previous if element_id not in states]
+        return delta
+
+    def export_tiles(
+        self,
+        output_dir: str,
+        tile_size: int = 512,
+        levels: int = 3,
+        header_only_levels: int = 1,
+        compact: bool = False,
+        minify: bool = False
+    ) -> Dict[str, Any]:
+        """
+        キャンバスを複数のズームレベルのSVGタイルに分割して書き出す
 
-        edge_parts = self.canvas.render_edges()
+        レベル 0 が最も粗く、レベルが1つ上がるごとに倍率が2倍になる(最上位レベルが等倍)。
+        各タイルは tile_size 四方で、viewBox でキャンバス上の担当範囲を表す。
+        何も描画されないタイルは書き出さない。
+        タイルは output_dir/<レベル>/<列>_<行>.svg、一覧は output_dir/tiles.json に書き出す。
 
-        svg_content = f'''<svg xmlns="http://www.w3.org/2000/svg" width="{self.canvas.width}" height="{self.canvas.height}">
-    {self.canvas.render_arrow_marker()}
-    {chr(10).join(node_parts)}
-    {chr(10).join(edge_parts)}
-</svg>'''
-        return svg_content
+        Args:
+            output_dir: 出力先ディレクトリ(なければ作成する)
+            tile_size: タイル1枚の出力サイズ(px)
+            levels: ズームレベルの数
+            header_only_levels: 粗い方からこの数のレベルでは、テーブルを DetailLevel.HEADER で
+                (ヘッダーのみ、外枠は配置時の大きさのまま)描く
+            compact, minify: render_svg() と同じ
 
-    def save_svg(self, output):
+        Returns:
+            tiles.json と同じ内容の dict
+        """
+        self._ensure_layout_current()
+        indexes = self.canvas.build_index()
+        manifest: Dict[str, Any] = {
+            'width': self.canvas.width,
+            'height': self.canvas.height,
+            'tile_size': tile_size,
+            'levels': [],
+        }
+        for level in range(levels):
+            # タイル1枚が担当するキャンバス上の範囲(px)
+            span = tile_size * 2 ** (levels - 1 - level)
+            scale = tile_size / span
+            columns = max(1, math.ceil(self.canvas.width / span))
+            rows = max(1, math.ceil(self.canvas.height / span))
+            detail_level = DetailLevel.HEADER if level < header_only_levels else self.detail_level
+            tiles = []
+            for row in range(rows):
+                for column in range(columns):
+                    viewport = (column * span, row * span, span, span)
+                    nodes, edges = self._select_region(indexes, viewport)
+                    if not nodes and not edges:
+                        continue
+                    header = (
+                        f'width="{tile_size}" height="{tile_size}" '
+                        f'viewBox="{column * span} {row * span} {span} {span}"'
+                    )
+                    path = os.path.join(output_dir, str(level), f'{column}_{row}.svg')
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, 'w', encoding='utf-8') as f:
+                        self._write_svg(f, self._iter_svg_document(
+                            header, nodes, edges, compact, minify, detail_level=detail_level, cache=False
+                        ))
+                    tiles.append([column, row])
+            manifest['levels'].append({
+                'level': level,
+                'scale': scale,
+                'columns': columns,
+                'rows': rows,
+                'detail_level': detail_level.value,
+                'tiles': tiles,
+            })
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, 'tiles.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def save_svg(
+        self,
+        output,
+        compact: bool = False,
+        compress: Optional[bool] = None,
+        compress_level: int = 9,
+        minify: bool = False,
+        workers: int = 1,
+        viewport: Optional[Tuple[int, int, int, int]] = None
+    ):
         """
         SVGファイルを保存する
 
+        iter_svg() の断片を順に書き込むので、文書全体の文字列は作らず、ノード断片もキャッシュしない。
+        圧縮時も断片ごとに gzip へ流し込むため、非圧縮の文書全体は作らない。
+
         Args:
             output: ファイルパス(str)またはファイルライクオブジェクト
+                (圧縮時はバイナリ、非圧縮時はテキストのストリーム)
+            compact: render_svg() と同じ
+            compress: True で gzip 圧縮した SVGZ を書き出す。
+                None の場合、ファイルパスの拡張子が .svgz なら圧縮する
+            compress_level: gzip の圧縮レベル(0-9)
+            minify, workers, viewport: render_svg() と同じ
         """
-        svg_content = self.render_svg()
+        if compress is None:
+            compress = isinstance(output, str) and output.lower().endswith('.svgz')
 
+        chunks = self.iter_svg(compact, minify, workers, viewport)
         if isinstance(output, str):
             # ファイルパスの場合
-            with open(output, 'w', encoding='utf-8') as f:
-                f.write(svg_content)
+            if compress:
+                with open(output, 'wb') as f:
+                    self._write_svgz(f, chunks, compress_level)
+            else:
+                with open(output, 'w', encoding='utf-8') as f:
+                    self._write_svg(f, chunks)
+        elif compress:
+            # バイナリストリームの場合
+            self._write_svgz(output, chunks, compress_level)
         else:
             # ストリームオブジェクトの場合
-            output.write(svg_content)
+            self._write_svg(output, chunks)
+
+    @staticmethod
+    def _write_svg(stream, chunks: Iterator[str]):
+        """iter_svg() の断片をストリームに書き込む"""
+        for chunk in chunks:
+            stream.write(chunk)
+
+    @staticmethod
+    def _write_svgz(stream, chunks: Iterator[str], compress_level: int):
+        """iter_svg() の断片を gzip 圧縮してバイナリストリームに書き込む"""
+        # 同じ図から同じバイト列になるよう、ヘッダーにファイル名・時刻を入れない
+        with gzip.GzipFile(filename='', mode='wb', compresslevel=compress_level, fileobj=stream, mtime=0) as gz:
+            for chunk in chunks:
+                gz.write(chunk.encode('utf-8'))
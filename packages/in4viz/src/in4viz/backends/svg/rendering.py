@@ -2,6 +2,82 @@ from dataclasses import dataclass, field
 from typing import List, Tuple, Optional
 from ...core.models import LineType, Cardinality
 
+# IE記法のカーディナリティ記号: 記法 → (<symbol> のID, 接続点から記号の外側の端までの距離)
+# 記号は右辺(+x 方向)に伸びる向きで定義し、<use> の rotate で各辺に向ける
+_IE_SYMBOLS = {
+    '0': ('ie-zero', 11),
+    '1': ('ie-one', 12),
+    '0..1': ('ie-zero-one', 15),
+    'many': ('ie-many', 12),
+}
+_IE_MANY_ALIASES = ("*", "1..*", "0..*", "0...*", "1...*", "many")
+_SIDE_ROTATIONS = {'right': 0, 'bottom': 90, 'left': 180, 'top': 270}
+_SIDE_DIRECTIONS = {'right': (1, 0), 'bottom': (0, 1), 'left': (-1, 0), 'top': (0, -1)}
+# 線分の外接矩形に足す余白(IE記号の長さ・幅を含める)
+_BOUNDS_MARGIN = 16
+
+
+def render_ie_symbol_defs(minify: bool = False) -> str:
+    """<defs> に入れる IE記号の <symbol> 定義を返す(minify なら既定値の属性と改行を省く)"""
+    thin = 'stroke="black"' if minify else 'stroke="black" stroke-width="1"'
+    bold = 'stroke="black" stroke-width="2"'
+    circle = f'<circle cx="8" r="3" fill="none" {thin}/>' if minify else f'<circle cx="8" cy="0" r="3" fill="none" {thin}/>'
+    return ('' if minify else '\n').join((
+        f'<symbol id="ie-zero" overflow="visible">{circle}</symbol>',
+        '<symbol id="ie-one" overflow="visible">'
+        f'<line x1="8" y1="-4" x2="8" y2="4" {bold}/>'
+        f'<line x1="4" y1="0" x2="12" y2="0" {bold}/></symbol>',
+        f'<symbol id="ie-zero-one" overflow="visible">{circle}'
+        f'<line x1="15" y1="-4" x2="15" y2="4" {bold}/></symbol>',
+        '<symbol id="ie-many" overflow="visible">'
+        f'<line x1="12" y1="0" x2="4" y2="-5" {thin}/>'
+        f'<line x1="12" y1="0" x2="4" y2="5" {thin}/>'
+        f'<line x1="12" y1="0" x2="4" y2="0" {thin}/></symbol>',
+    ))
+
+
+def _place_ie_symbol(x: int, y: int, cardinality: str, edge_type: str) -> Tuple[str, int, int]:
+    """IE記号の <use> と、線の新しい接続点を返す(記号がなければ空文字と元の点)"""
+    rotation = _SIDE_ROTATIONS.get(edge_type)
+    if rotation is None:
+        return "", x, y
+    if not cardinality:
+        cardinality = "1"
+    elif cardinality in _IE_MANY_ALIASES:
+        cardinality = "many"
+    symbol = _IE_SYMBOLS.get(cardinality)
+    if symbol is None:
+        return "", x, y
+    symbol_id, extent = symbol
+    transform = f'translate({x} {y})' if not rotation else f'translate({x} {y}) rotate({rotation})'
+    dx, dy = _SIDE_DIRECTIONS[edge_type]
+    # SVG 1.1 のビューアは xlink:href しか解釈しないので、SVG 2 の href と併記する
+    use = f'<use href="#{symbol_id}" xlink:href="#{symbol_id}" transform="{transform}"/>'
+    return use, x + dx * extent, y + dy * extent
+
+
+def _relative_path(points: List[Tuple[int, int]]) -> str:
+    """折れ線を、始点以外を相対コマンド(水平 h・垂直 v・その他 l)で表した path データにする"""
+    (x, y), rest = points[0], points[1:]
+    commands = [f'M{x} {y}']
+    for px, py in rest:
+        dx, dy = px - x, py - y
+        if dy == 0 and dx != 0:
+            commands.append(f'h{dx}')
+        elif dx == 0 and dy != 0:
+            commands.append(f'v{dy}')
+        elif dx or dy:
+            # 負号は区切り文字を兼ねる
+            commands.append(f'l{dx}{"" if dy < 0 else " "}{dy}')
+        x, y = px, py
+    return ''.join(commands)
+
+
+def _perpendicular_point(x, y, edge_type, length):
+    """接地面（外枠の辺）に対して垂直に伸ばした点を計算"""
+    dx, dy = _SIDE_DIRECTIONS.get(edge_type, (0, 0))
+    return x + dx * length, y + dy * length
+
 
 @dataclass
 class Edge:
@@ -22,120 +98,43 @@ class Edge:
         if self.cardinality is None:
             self.cardinality = Cardinality()
 
-    def render(self, from_x: int, from_y: int, to_x: int, to_y: int, line_type: LineType, from_edge: str = None, to_edge: str = None) -> str:
-        def get_perpendicular_point(x, y, edge_type, length):
-            """接地面（外枠の辺）に対して垂直に伸ばした点を計算"""
-            if edge_type == 'left':
-                return x - length, y
-            elif edge_type == 'right':
-                return x + length, y
-            elif edge_type == 'top':
-                return x, y - length
-            elif edge_type == 'bottom':
-                return x, y + length
-            else:
-                return x, y
-
-        def render_ie_notation_symbol(x: int, y: int, cardinality: str, edge_type: str) -> tuple:
-            """IE記法でカーディナリティ記号を描画し、新しい接続点を返す"""
-            symbols = []
-            new_x, new_y = x, y
-
-            if cardinality == "0":
-                if edge_type == 'left':
-                    circle_x = x - 8
-                    symbols.append(f'<circle cx="{circle_x}" cy="{y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    new_x = circle_x - 3
-                elif edge_type == 'right':
-                    circle_x = x + 8
-                    symbols.append(f'<circle cx="{circle_x}" cy="{y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    new_x = circle_x + 3
-                elif edge_type == 'top':
-                    circle_y = y - 8
-                    symbols.append(f'<circle cx="{x}" cy="{circle_y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    new_y = circle_y - 3
-                elif edge_type == 'bottom':
-                    circle_y = y + 8
-                    symbols.append(f'<circle cx="{x}" cy="{circle_y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    new_y = circle_y + 3
-
-            elif not cardinality or cardinality == "1":
-                if edge_type == 'left':
-                    cross_x = x - 8
-                    symbols.append(f'<line x1="{cross_x}" y1="{y-4}" x2="{cross_x}" y2="{y+4}" stroke="black" stroke-width="2"/>')
-                    symbols.append(f'<line x1="{cross_x-4}" y1="{y}" x2="{cross_x+4}" y2="{y}" stroke="black" stroke-width="2"/>')
-                    new_x = cross_x - 4
-                elif edge_type == 'right':
-                    cross_x = x + 8
-                    symbols.append(f'<line x1="{cross_x}" y1="{y-4}" x2="{cross_x}" y2="{y+4}" stroke="black" stroke-width="2"/>')
-                    symbols.append(f'<line x1="{cross_x-4}" y1="{y}" x2="{cross_x+4}" y2="{y}" stroke="black" stroke-width="2"/>')
-                    new_x = cross_x + 4
-                elif edge_type == 'top':
-                    cross_y = y - 8
-                    symbols.append(f'<line x1="{x}" y1="{cross_y-4}" x2="{x}" y2="{cross_y+4}" stroke="black" stroke-width="2"/>')
-                    symbols.append(f'<line x1="{x-4}" y1="{cross_y}" x2="{x+4}" y2="{cross_y}" stroke="black" stroke-width="2"/>')
-                    new_y = cross_y - 4
-                elif edge_type == 'bottom':
-                    cross_y = y + 8
-                    symbols.append(f'<line x1="{x}" y1="{cross_y-4}" x2="{x}" y2="{cross_y+4}" stroke="black" stroke-width="2"/>')
-                    symbols.append(f'<line x1="{x-4}" y1="{cross_y}" x2="{x+4}" y2="{cross_y}" stroke="black" stroke-width="2"/>')
-                    new_y = cross_y + 4
-
-            elif cardinality == "0..1":
-                if edge_type == 'left':
-                    circle_x = x - 8
-                    line_x = x - 15
-                    symbols.append(f'<circle cx="{circle_x}" cy="{y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{line_x}" y1="{y-4}" x2="{line_x}" y2="{y+4}" stroke="black" stroke-width="2"/>')
-                    new_x = line_x
-                elif edge_type == 'right':
-                    circle_x = x + 8
-                    line_x = x + 15
-                    symbols.append(f'<circle cx="{circle_x}" cy="{y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{line_x}" y1="{y-4}" x2="{line_x}" y2="{y+4}" stroke="black" stroke-width="2"/>')
-                    new_x = line_x
-                elif edge_type == 'top':
-                    circle_y = y - 8
-                    line_y = y - 15
-                    symbols.append(f'<circle cx="{x}" cy="{circle_y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x-4}" y1="{line_y}" x2="{x+4}" y2="{line_y}" stroke="black" stroke-width="2"/>')
-                    new_y = line_y
-                elif edge_type == 'bottom':
-                    circle_y = y + 8
-                    line_y = y + 15
-                    symbols.append(f'<circle cx="{x}" cy="{circle_y}" r="3" fill="none" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x-4}" y1="{line_y}" x2="{x+4}" y2="{line_y}" stroke="black" stroke-width="2"/>')
-                    new_y = line_y
-
-            elif cardinality in ["*", "1..*", "0..*", "0...*", "1...*", "many"]:
-                if edge_type == 'left':
-                    crow_x = x - 12
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x+8}" y2="{y-5}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x+8}" y2="{y+5}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x+8}" y2="{y}" stroke="black" stroke-width="1"/>')
-                    new_x = crow_x
-                elif edge_type == 'right':
-                    crow_x = x + 12
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x-8}" y2="{y-5}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x-8}" y2="{y+5}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{crow_x}" y1="{y}" x2="{crow_x-8}" y2="{y}" stroke="black" stroke-width="1"/>')
-                    new_x = crow_x
-                elif edge_type == 'top':
-                    crow_y = y - 12
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x-5}" y2="{crow_y+8}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x+5}" y2="{crow_y+8}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x}" y2="{crow_y+8}" stroke="black" stroke-width="1"/>')
-                    new_y = crow_y
-                elif edge_type == 'bottom':
-                    crow_y = y + 12
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x-5}" y2="{crow_y-8}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x+5}" y2="{crow_y-8}" stroke="black" stroke-width="1"/>')
-                    symbols.append(f'<line x1="{x}" y1="{crow_y}" x2="{x}" y2="{crow_y-8}" stroke="black" stroke-width="1"/>')
-                    new_y = crow_y
-
-            return '\n'.join(symbols), new_x, new_y
-
-        # IE記号の位置計算と描画
+    def bounds(self, from_x: int, from_y: int, to_x: int, to_y: int, line_type: LineType, from_edge: str = None, to_edge: str = None) -> List[Tuple[int, int, int, int]]:
+        """描画範囲を覆う矩形 (left, top, right, bottom) のリスト(ORTHOGONAL は線分ごと)"""
+        if line_type == LineType.ORTHOGONAL:
+            points = [(from_x, from_y), *self.waypoints, (to_x, to_y)]
+        elif line_type == LineType.SPLINE:
+            # ベジェ曲線は制御点の凸包に収まる
+            points = [
+                (from_x, from_y),
+                _perpendicular_point(from_x, from_y, from_edge, 50 + _BOUNDS_MARGIN),
+                _perpendicular_point(to_x, to_y, to_edge, 50 + _BOUNDS_MARGIN),
+                (to_x, to_y),
+            ]
+            points = [(min(p[0] for p in points), min(p[1] for p in points)),
+                      (max(p[0] for p in points), max(p[1] for p in points))]
+        else:
+            points = [(from_x, from_y), (to_x, to_y)]
+        margin = _BOUNDS_MARGIN
+        return [
+            (min(x1, x2) - margin, min(y1, y2) - margin, max(x1, x2) + margin, max(y1, y2) + margin)
+            for (x1, y1), (x2, y2) in zip(points, points[1:])
+        ]
+
+    def render(self, from_x: int, from_y: int, to_x: int, to_y: int, line_type: LineType, from_edge: str = None, to_edge: str = None, compact: bool = False, minify: bool = False) -> str:
+        # compact モードでは線の書式を共有スタイルのクラス(styles.py)で指定する
+        # minify モードでは座標を整数にし、既定値の属性と改行を省く
+        if minify:
+            from_x, from_y, to_x, to_y = int(from_x), int(from_y), int(to_x), int(to_y)
+        if compact:
+            thin_attrs = path_attrs = 'class="e"'
+        elif minify:
+            thin_attrs = 'stroke="black"'
+            path_attrs = 'stroke="black" fill="none"'
+        else:
+            thin_attrs = 'stroke="black" stroke-width="1"'
+            path_attrs = 'stroke="black" stroke-width="1" fill="none"'
+
+        # IE記号の配置と、線の接続点(記号の外側の端)の計算
         from_symbols = ""
         to_symbols = ""
         final_from_x, final_from_y = from_x, from_y
@@ -143,40 +142,47 @@ class Edge:
 
         if self.cardinality:
             if self.cardinality.from_side:
-                from_symbols, final_from_x, final_from_y = render_ie_notation_symbol(from_x, from_y, self.cardinality.from_side, from_edge)
+                from_symbols, final_from_x, final_from_y = _place_ie_symbol(from_x, from_y, self.cardinality.from_side, from_edge)
 
             if self.cardinality.to_side:
-                to_symbols, final_to_x, final_to_y = render_ie_notation_symbol(to_x, to_y, self.cardinality.to_side, to_edge)
+                to_symbols, final_to_x, final_to_y = _place_ie_symbol(to_x, to_y, self.cardinality.to_side, to_edge)
 
         svg_parts = []
 
         if line_type == LineType.STRAIGHT:
-            svg_parts.append(f'<line x1="{final_from_x}" y1="{final_from_y}" x2="{final_to_x}" y2="{final_to_y}" stroke="black" stroke-width="1"/>')
+            svg_parts.append(f'<line x1="{final_from_x}" y1="{final_from_y}" x2="{final_to_x}" y2="{final_to_y}" {thin_attrs}/>')
 
         elif line_type == LineType.ORTHOGONAL:
             # waypoints が空のときは直線にフォールバック
             points = [(final_from_x, final_from_y), *self.waypoints, (final_to_x, final_to_y)]
-            path_d = "M " + " L ".join(f"{int(px)} {int(py)}" for px, py in points)
+            if minify:
+                path_d = _relative_path([(int(px), int(py)) for px, py in points])
+            else:
+                path_d = "M " + " L ".join(f"{int(px)} {int(py)}" for px, py in points)
             route_attrs = ""
             if self.route_status != "ok":
                 route_attrs = (
                     f' data-route-status="{self.route_status}"'
                     f' data-route-reason="{self.route_reason}"'
                 )
-            svg_parts.append(f'<path d="{path_d}" stroke="black" stroke-width="1" fill="none"{route_attrs}/>')
+            svg_parts.append(f'<path d="{path_d}" {path_attrs}{route_attrs}/>')
 
         elif line_type == LineType.SPLINE:
-            from_perp_x, from_perp_y = get_perpendicular_point(final_from_x, final_from_y, from_edge, 50)
-            to_perp_x, to_perp_y = get_perpendicular_point(final_to_x, final_to_y, to_edge, 50)
+            from_perp_x, from_perp_y = _perpendicular_point(final_from_x, final_from_y, from_edge, 50)
+            to_perp_x, to_perp_y = _perpendicular_point(final_to_x, final_to_y, to_edge, 50)
 
-            svg_parts.append(f'<path d="M {final_from_x} {final_from_y} C {from_perp_x} {from_perp_y} {to_perp_x} {to_perp_y} {final_to_x} {final_to_y}" stroke="black" stroke-width="1" fill="none"/>')
+            if minify:
+                path_d = f'M{final_from_x} {final_from_y}C{from_perp_x} {from_perp_y} {to_perp_x} {to_perp_y} {final_to_x} {final_to_y}'
+            else:
+                path_d = f'M {final_from_x} {final_from_y} C {from_perp_x} {from_perp_y} {to_perp_x} {to_perp_y} {final_to_x} {final_to_y}'
+            svg_parts.append(f'<path d="{path_d}" {path_attrs}/>')
 
         else:
-            svg_parts.append(f'<line x1="{final_from_x}" y1="{final_from_y}" x2="{final_to_x}" y2="{final_to_y}" stroke="black" stroke-width="1"/>')
+            svg_parts.append(f'<line x1="{final_from_x}" y1="{final_from_y}" x2="{final_to_x}" y2="{final_to_y}" {thin_attrs}/>')
 
         if from_symbols:
             svg_parts.append(from_symbols)
         if to_symbols:
             svg_parts.append(to_symbols)
 
-        return '\n'.join(svg_parts)
+        return ('' if minify else '\n').join(svg_parts)
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from ...core.models import DetailLevel
 from ...core.text_metrics import calculate_text_width
+from .styles import SVGStyleSheet, _escape_id, render_gradient
 
 
 class Stencil(ABC):
@@ -9,14 +11,23 @@ class Stencil(ABC):
         self.height = height
 
     @abstractmethod
-    def render(self, data: Dict[str, Any], x: int, y: int) -> str:
+    def render(self, data: Dict[str, Any], x: int, y: int, styles: Optional[SVGStyleSheet] = None, minify: bool = False, detail_level: Optional[DetailLevel] = None) -> str:
+        """
+        Args:
+            styles: compact モードの共有スタイル。指定時は書式をクラスで参照する
+            minify: True の場合、既定値の属性と要素間の改行を省く
+            detail_level: この描画だけ表示詳細度を切り替える(縮小表示用)。
+                外枠の大きさは変えないので、エッジの接続位置はそのまま
+        """
         pass
 
 
 class TableStencil(Stencil):
-    def __init__(self, width: int = 400, min_height: int = 100):
+    def __init__(self, width: int = 400, min_height: int = 100, detail_level: DetailLevel = DetailLevel.FULL):
         super().__init__(width, min_height)
         self.min_height = min_height
+        # 表示するカラムの範囲。高さ・幅の計算にも反映されるので、レイアウトも小さくなる
+        self.detail_level = detail_level
         self.row_height = 22
         self.header_height = 25
         self.min_logical_width = 40
@@ -26,10 +37,21 @@ class TableStencil(Stencil):
         self.min_constraint_width = 25
         self.padding = 10
 
+    def _visible_columns(self, data: Dict[str, Any], detail_level: Optional[DetailLevel] = None) -> List[Dict[str, Any]]:
+        """detail_level(省略時はステンシルの detail_level)に応じて表示するカラム"""
+        columns = data.get('columns', [])
+        if detail_level is None:
+            detail_level = self.detail_level
+        if detail_level == DetailLevel.HEADER:
+            return []
+        if detail_level == DetailLevel.KEYS:
+            return [col for col in columns if col.get('primary_key', False) or col.get('foreign_key', False)]
+        return columns
+
     def _calculate_widths(self, data: Dict[str, Any]) -> Dict[str, int]:
         physical_name = data.get('table_name', 'Table')
         logical_name = data.get('logical_name', physical_name)
-        columns = data.get('columns', [])
+        columns = self._visible_columns(data)
 
         # テーブル名の幅計算
         logical_table_width = max(self.min_logical_width, calculate_text_width(logical_name, True) + self.padding)
@@ -70,6 +92,10 @@ class TableStencil(Stencil):
 
         column_total_width = marker_width + max_logical_col_width + max_physical_col_width + max_type_width + max_constraint_width
 
+        # ヘッダーのみの場合はテーブル名の幅だけにする
+        if self.detail_level == DetailLevel.HEADER:
+            column_total_width = 0
+
         return {
             'table_logical_width': logical_table_width,
             'table_physical_width': physical_table_width,
@@ -83,10 +109,11 @@ class TableStencil(Stencil):
             'total_width': max(table_total_width, column_total_width)
         }
 
-    def render(self, data: Dict[str, Any], x: int, y: int) -> str:
+    def render(self, data: Dict[str, Any], x: int, y: int, styles: Optional[SVGStyleSheet] = None, minify: bool = False, detail_level: Optional[DetailLevel] = None) -> str:
         physical_name = data.get('table_name', 'Table')
         logical_name = data.get('logical_name', physical_name)
-        columns = data.get('columns', [])
+        # detail_level は描くカラムだけに反映し、外枠はステンシルの detail_level での大きさにする
+        columns = self._visible_columns(data, detail_level)
         bgcolor = data.get('bgcolor', '#ffffff')
         use_gradient = data.get('use_gradient', False)
 
@@ -96,17 +123,48 @@ class TableStencil(Stencil):
 
         widths = self._calculate_widths(data)
         self.width = widths['total_width']
-
-        pk_columns_count = len(pk_columns)
-        regular_columns_count = len(regular_columns)
-        extra_rows = 1 if pk_columns_count > 0 and regular_columns_count == 0 else 0
-        actual_height = self.header_height + (len(columns) + extra_rows) * self.row_height
+        actual_height = self.calculate_height(data)
 
         svg_parts = []
 
-        # グラデーション定義を追加（必要な場合）
-        gradient_id = f'gradient_{id(data)}'
-        if use_gradient:
+        # compact モードでは書式を共有スタイルのクラスで指定する
+        if styles is not None:
+            outer_attrs = 'class="tb"'
+            header_attrs = 'class="th"'
+            title_attrs = 'class="t"'
+            logical_attrs = 'class="l"'
+            physical_attrs = 'class="p"'
+            type_attrs = 'class="y"'
+            constraint_attrs = 'class="k"'
+            pk_line_attrs = 'class="th"'
+            marker_attrs = ''  # rect の fill の既定値は黒
+        elif minify:
+            # stroke-width="1"・font-weight="normal"・fill="black" は既定値
+            outer_attrs = 'stroke="black" stroke-width="2"'
+            header_attrs = pk_line_attrs = 'stroke="black"'
+            title_attrs = 'font-family="Arial" font-size="12" font-weight="bold"'
+            logical_attrs = physical_attrs = 'font-family="Arial" font-size="10"'
+            type_attrs = constraint_attrs = 'font-family="Arial" font-size="9"'
+            marker_attrs = ''
+        else:
+            outer_attrs = 'stroke="black" stroke-width="2"'
+            header_attrs = 'stroke="black" stroke-width="1"'
+            title_attrs = 'font-family="Arial" font-size="12" font-weight="bold"'
+            logical_attrs = 'font-family="Arial" font-size="10" font-weight="normal" fill="black"'
+            physical_attrs = 'font-family="Arial" font-size="10" fill="black"'
+            type_attrs = 'font-family="Arial" font-size="9" fill="black"'
+            constraint_attrs = type_attrs
+            pk_line_attrs = 'stroke="black" stroke-width="1"'
+            marker_attrs = ' fill="black"'
+
+        # グラデーション定義を追加（必要な場合）。compact モードでは色ごとの共有定義を参照する
+        # テーブル名から決めるので、別プロセスで描画しても直列の場合と同じIDになる
+        gradient_id = f'gradient_{_escape_id(physical_name)}'
+        if use_gradient and styles is not None:
+            gradient_id = styles.gradient_id(bgcolor)
+        elif use_gradient and minify:
+            svg_parts.append(f'<defs>{render_gradient(gradient_id, bgcolor, True)}</defs>')
+        elif use_gradient:
             svg_parts.append(f'<defs>')
             svg_parts.append(f'  <linearGradient id="{gradient_id}" x1="0%" y1="0%" x2="100%" y2="0%">')
             svg_parts.append(f'    <stop offset="0%" style="stop-color:{bgcolor};stop-opacity:1" />')
@@ -117,16 +175,16 @@ class TableStencil(Stencil):
         # テーブル全体の背景
         fill_value = f'url(#{gradient_id})' if use_gradient else bgcolor
         svg_parts.append(f'<rect x="{x}" y="{y}" width="{self.width}" height="{actual_height}" '
-                        f'fill="{fill_value}" stroke="black" stroke-width="2"/>')
+                        f'fill="{fill_value}" {outer_attrs}/>')
 
         # ヘッダーセクション
         svg_parts.append(f'<rect x="{x}" y="{y}" width="{self.width}" height="{self.header_height}" '
-                        f'fill="{fill_value}" stroke="black" stroke-width="1"/>')
+                        f'fill="{fill_value}" {header_attrs}/>')
 
         # テーブル名表示
         table_display = f'{logical_name} ({physical_name})' if logical_name != physical_name else logical_name
         svg_parts.append(f'<text x="{x + 5}" y="{y + self.header_height//2 + 4}" '
-                        f'font-family="Arial" font-size="12" font-weight="bold">'
+                        f'{title_attrs}>'
                         f'{table_display}</text>')
 
         current_y = y + self.header_height
@@ -140,9 +198,6 @@ class TableStencil(Stencil):
             is_nullable = column.get('nullable', True)
             is_foreign_key = column.get('foreign_key', False)
 
-            text_color = "black"
-            font_weight = "normal"
-
             constraints = []
             if is_foreign_key:
                 constraints.append('FK')
@@ -159,7 +214,7 @@ class TableStencil(Stencil):
 
             # カラムデータ表示
             svg_parts.append(f'<text x="{logical_col_x + 5}" y="{current_y + self.row_height//2 + 3}" '
-                            f'font-family="Arial" font-size="10" font-weight="{font_weight}" fill="{text_color}">'
+                            f'{logical_attrs}>'
                             f'{logical_col_name}</text>')
 
             # NOT NULLマーカー表示
@@ -167,20 +222,20 @@ class TableStencil(Stencil):
                 marker_x = marker_col_x + 3
                 marker_y = current_y + self.row_height // 2 - 3
                 svg_parts.append(f'<rect x="{marker_x}" y="{marker_y}" '
-                                f'width="3" height="6" fill="black"/>')
+                                f'width="3" height="6"{marker_attrs}/>')
 
             svg_parts.append(f'<text x="{physical_col_x + 5}" y="{current_y + self.row_height//2 + 3}" '
-                            f'font-family="Arial" font-size="10" fill="black">'
+                            f'{physical_attrs}>'
                             f'{physical_col_name}</text>')
 
             svg_parts.append(f'<text x="{type_col_x + 5}" y="{current_y + self.row_height//2 + 3}" '
-                            f'font-family="Arial" font-size="9" fill="black">'
+                            f'{type_attrs}>'
                             f'{column_type}</text>')
 
-            # 制約欄
-            if widths['constraint_width'] > 0:
+            # 制約欄(compact・minify モードでは空のテキストを出力しない)
+            if widths['constraint_width'] > 0 and (constraint_text or (styles is None and not minify)):
                 svg_parts.append(f'<text x="{constraint_col_x + 5}" y="{current_y + self.row_height//2 + 3}" '
-                                f'font-family="Arial" font-size="9" fill="black">'
+                                f'{constraint_attrs}>'
                                 f'{constraint_text}</text>')
 
             current_y += self.row_height
@@ -190,16 +245,16 @@ class TableStencil(Stencil):
 
         if pk_columns and pk_end_y:
             svg_parts.append(f'<line x1="{x}" y1="{pk_end_y}" x2="{x + widths["total_width"]}" y2="{pk_end_y}" '
-                            f'stroke="black" stroke-width="1"/>')
+                            f'{pk_line_attrs}/>')
 
         # PKのみのテーブルの場合、空行を追加
         if len(pk_columns) > 0 and len(regular_columns) == 0:
             current_y += self.row_height
 
-        return '\n'.join(svg_parts)
+        return ('' if minify else '\n').join(svg_parts)
 
     def calculate_height(self, data: Dict[str, Any]) -> int:
-        columns = data.get('columns', [])
+        columns = self._visible_columns(data)
         pk_columns = [col for col in columns if col.get('primary_key', False)]
         regular_columns = [col for col in columns if not col.get('primary_key', False)]
 
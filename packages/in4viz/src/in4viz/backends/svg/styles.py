@@ -0,0 +1,68 @@
+"""コンパクト出力用の共有スタイル定義
+
+compact モードでは、テキストや線の書式を要素ごとの属性ではなく
+1つの <style> ブロックのクラスで指定し、グラデーションを色ごとに
+1つだけ定義して全テーブルから参照する。
+"""
+import re
+from typing import Dict
+
+
+def _escape_id(name: str) -> str:
+    """名前を要素IDに使える形にする(英数字・_ 以外は .16進. に置き換えるので、'-' は区切りに使える)"""
+    return re.sub(r'[^\w]', lambda m: f'.{ord(m.group()):x}.', name)
+
+
+# テキストの役割・線の種類ごとのクラス
+_CSS_RULES = (
+    ('t', 'font:bold 12px Arial'),  # テーブル名
+    ('l', 'font:10px Arial'),  # カラム論理名
+    ('p', 'font:10px Arial'),  # カラム物理名
+    ('y', 'font:9px Arial'),  # データ型
+    ('k', 'font:9px Arial'),  # 制約(FK, IDX)
+    ('tb', 'stroke:#000;stroke-width:2'),  # テーブル外枠
+    ('th', 'stroke:#000;stroke-width:1'),  # ヘッダー枠・PK区切り線
+    ('e', 'stroke:#000;stroke-width:1;fill:none'),  # エッジ
+)
+
+
+def render_gradient(gradient_id: str, color: str, minify: bool = False) -> str:
+    """テーブル背景用の左右グラデーション定義を返す(minify なら既定値の属性を省く)"""
+    if minify:
+        return (
+            f'<linearGradient id="{gradient_id}">'
+            f'<stop stop-color="{color}"/><stop offset="1" stop-color="#fff"/>'
+            f'</linearGradient>'
+        )
+    return (
+        f'<linearGradient id="{gradient_id}" x1="0%" y1="0%" x2="100%" y2="0%">'
+        f'<stop offset="0%" style="stop-color:{color};stop-opacity:1"/>'
+        f'<stop offset="100%" style="stop-color:#ffffff;stop-opacity:1"/>'
+        f'</linearGradient>'
+    )
+
+
+class SVGStyleSheet:
+    """compact モードで共有する <style> とグラデーション定義"""
+
+    def __init__(self):
+        # 背景色 → グラデーションID(登録順)
+        self.gradients: Dict[str, str] = {}
+
+    def gradient_id(self, color: str) -> str:
+        """色に対応するグラデーションIDを返す(未登録なら登録する)"""
+        gradient_id = self.gradients.get(color)
+        if gradient_id is None:
+            gradient_id = self.gradients[color] = f'g{len(self.gradients)}'
+        return gradient_id
+
+    def render(self, minify: bool = False) -> str:
+        """<style> ブロックと、登録済みグラデーションの <defs> を返す"""
+        css = ''.join(f'.{name}{{{rule}}}' for name, rule in _CSS_RULES)
+        parts = [f'<style>{css}</style>']
+        if self.gradients:
+            parts.append('<defs>')
+            for color, gradient_id in self.gradients.items():
+                parts.append(render_gradient(gradient_id, color, minify))
+            parts.append('</defs>')
+        return ''.join(parts)
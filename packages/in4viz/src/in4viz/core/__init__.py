@@ -1,13 +1,16 @@
 """共通コアモジュール"""
-from .models import LineType, Cardinality, Column, Table
+from .models import LineType, DetailLevel, Cardinality, Column, Table
 from .text_metrics import calculate_text_width
 from .layout import LayoutEngine
+from .route_cache import RouteCache
 
 __all__ = [
     'LineType',
+    'DetailLevel',
     'Cardinality',
     'Column',
     'Table',
     'calculate_text_width',
     'LayoutEngine',
+    'RouteCache',
 ]
@@ -39,7 +39,8 @@ class LayoutEngine:
         margin: int = 50,
         min_width: int = 800,
         min_height: int = 600,
-        ideal_length_factor: float = 1.6
+        ideal_length_factor: float = 1.6,
+        collapse_parallel: bool = False
     ) -> Tuple[int, int]:
         """
         Force-directedアルゴリズムでノードを配置
@@ -54,6 +55,8 @@ class LayoutEngine:
             ideal_length_factor: ノード間理想距離の係数。
                 ノードの平均サイズに対する倍率として使用される。
                 値を小さくするとエンティティが詰まり、大きくすると広がる（デフォルト: 1.6）
+            collapse_parallel: Trueの場合、同じノードペアを結ぶ複数のエッジを1本として扱い、
+                引力や接続数を重複して数えない
 
         Returns:
             (canvas_width, canvas_height)
@@ -64,6 +67,17 @@ class LayoutEngine:
         n = len(nodes)
         node_map = {node.node_id: node for node in nodes}
 
+        if collapse_parallel:
+            # 同じノードペア（向きは問わない）の並列エッジは最初の1本だけ残す
+            seen_pairs = set()
+            unique_edges = []
+            for edge in edges:
+                pair = frozenset((edge.from_node_id, edge.to_node_id))
+                if pair not in seen_pairs:
+                    seen_pairs.add(pair)
+                    unique_edges.append(edge)
+            edges = unique_edges
+
         # 接続情報を構築
         neighbors = defaultdict(set)
         degree = defaultdict(int)
@@ -9,6 +9,13 @@ class LineType(Enum):
     SPLINE = "spline"
 
 
+class DetailLevel(Enum):
+    """テーブルの表示詳細度"""
+    FULL = "full"      # 全カラム
+    KEYS = "keys"      # PK・FK カラムのみ
+    HEADER = "header"  # テーブル名のみ
+
+
 @dataclass
 class Cardinality:
     from_side: str = "1"  # "1", "0..1", "1..*", "0..*"
@@ -0,0 +1,139 @@
+"""エッジ経路キャッシュ
+
+EdgeRouter の A* 探索結果を、エッジのポート・進入辺と
+探索範囲内の障害物・既存線から作ったキーで保存する。
+図全体が変わっても、個々のエッジから見える局所的な状況が同じなら
+前回の経路をそのまま再利用できる。
+
+- LRU 方式で maxsize 件を超えた古いエントリを捨てる
+- path を指定すると JSON ファイルから読み込み、save() で書き出す
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from typing import List, Tuple, Optional
+
+# キャッシュファイルのフォーマットバージョン(キーの作り方を変えたら上げる)
+_FORMAT_VERSION = 1
+
+
+def _rect_overlaps(
+    rect: Tuple[int, int, int, int],
+    window: Tuple[int, int, int, int]
+) -> bool:
+    rx, ry, rw, rh = rect
+    left, top, right, bottom = window
+    return rx <= right and rx + rw >= left and ry <= bottom and ry + rh >= top
+
+
+def _segment_overlaps(
+    segment: Tuple[int, int, int, int],
+    window: Tuple[int, int, int, int]
+) -> bool:
+    x1, y1, x2, y2 = segment
+    left, top, right, bottom = window
+    return (
+        min(x1, x2) <= right and max(x1, x2) >= left
+        and min(y1, y2) <= bottom and max(y1, y2) >= top
+    )
+
+
+class RouteCache:
+    """エッジ単位の経路キャッシュ(LRU・任意でディスク永続化)"""
+
+    def __init__(self, maxsize: int = 4096, path: Optional[str] = None, window_margin: int = 200):
+        """
+        Args:
+            maxsize: 保持する最大エントリ数
+            path: 永続化ファイルのパス。存在すれば読み込む
+            window_margin: キーに含める探索範囲の余白(px)。
+                ポート間の外接矩形をこの幅だけ広げた範囲の障害物・既存線をキーに使う
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.window_margin = window_margin
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, List[Tuple[int, int]]]' = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(
+        self,
+        src_port: Tuple[int, int],
+        dst_port: Tuple[int, int],
+        src_side: str,
+        dst_side: str,
+        obstacles: List[Tuple[int, int, int, int]],
+        existing_segments: List[Tuple[int, int, int, int]],
+        padding: int
+    ) -> str:
+        """探索範囲内の障害物・既存線を含めたキャッシュキーを作る"""
+        margin = self.window_margin
+        window = (
+            min(src_port[0], dst_port[0]) - margin,
+            min(src_port[1], dst_port[1]) - margin,
+            max(src_port[0], dst_port[0]) + margin,
+            max(src_port[1], dst_port[1]) + margin,
+        )
+        local_obstacles = sorted(r for r in obstacles if _rect_overlaps(r, window))
+        local_segments = sorted(s for s in existing_segments if _segment_overlaps(s, window))
+        digest = hashlib.sha1(repr((local_obstacles, local_segments)).encode('ascii')).hexdigest()
+        return (
+            f'{src_port[0]},{src_port[1]},{src_side}'
+            f'|{dst_port[0]},{dst_port[1]},{dst_side}'
+            f'|{padding}|{digest}'
+        )
+
+    def get(self, key: str) -> Optional[List[Tuple[int, int]]]:
+        """キーに対応する waypoints を返す。なければ None"""
+        waypoints = self._entries.get(key)
+        if waypoints is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(waypoints)
+
+    def put(self, key: str, waypoints: List[Tuple[int, int]]):
+        """waypoints を登録し、maxsize を超えたら最も古いエントリを捨てる"""
+        self._entries[key] = [tuple(p) for p in waypoints]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """全エントリを削除"""
+        self._entries.clear()
+
+    def load(self, path: str):
+        """JSON ファイルからエントリを読み込む(フォーマットが異なれば無視)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != _FORMAT_VERSION:
+            return
+        for key, waypoints in payload.get('entries', []):
+            self.put(key, [(int(x), int(y)) for x, y in waypoints])
+
+    def save(self, path: Optional[str] = None):
+        """
+        エントリを JSON ファイルに書き出す
+
+        Args:
+            path: 出力先。省略時はコンストラクタの path
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('RouteCache.save() requires a path')
+        payload = {
+            'version': _FORMAT_VERSION,
+            'entries': [[key, waypoints] for key, waypoints in self._entries.items()],
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
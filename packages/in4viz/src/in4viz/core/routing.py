@@ -8,18 +8,42 @@
     2. (node, side) ごとにエッジを集めて辺上に等間隔でポート分配
        (相手側の中心位置でソートし、線同士が交差しにくい順に並べる)
     3. 障害物矩形の外周と既存エッジ周辺レーンから候補座標を作る
-    4. 候補座標グリッド上で A* 探索し、ノード矩形を避ける経路を選ぶ
+    4. 候補座標グリッド上で A* 探索してノード矩形を避ける経路を選ぶ
+       (fast_path=True なら、先に試した直線・L字の経路が障害物・既存線と干渉せず
+       A* の下界と同じコストであれば探索せずにそれを採用する)
+       (ヒューリスティックはマンハッタン距離 + 最低限必要な曲がりコスト)
+       巨大な図では coarse_cell で粗いセルグリッド上の通路を先に求め、
+       詳細な探索をその通路内に限定する。max_grid_points で探索グリッドの点数を制限できる。
+       hub_min_edges を指定すると、ハブノードのエッジ群でグリッドと距離場を共有する
     5. 既存エッジとの重なり・交差は soft obstacle としてコストを加算する
     6. ポート間距離が短いエッジから順に経路を確定する
-    7. 全エッジ確定後、他の全エッジを既存線として各エッジを引き直し、
-       コストが下がる場合のみ新しい経路を採用する(リファインメント)
+       (workers を指定すると、範囲が重ならないエッジのバッチを並列に探索し、
+       同じ順序で確定する)
+    7. 全エッジ確定後、既存線との重なり・交差ペナルティを持つエッジだけを
+       他の全エッジを既存線として引き直し、コストが下がる場合のみ採用する。
+       採用で経路が変わったら、その線と干渉するエッジを次ラウンドで再評価する
+       (リファインメント。変化がなくなるか上限ラウンドに達したら終了。
+       refine_mode="jacobi" ではラウンド単位でまとめて引き直す)
+
+collapse_parallel=True の場合、同じノードペアを結ぶ並列エッジは代表エッジだけを 6 で探索し、
+その経路(幹)をポート間隔ぶん平行にずらしたレーンを残りのエッジに使う。
+
+nudge=True の場合は 6 と 7 の間で、同じ座標で重なる平行な中間セグメントを
+スイープで集めて別々のレーンへずらす(ナッジング。A* の再探索より安価)。
 
 既存エッジは通行禁止にはせず、重なりを避けやすくするための追加コストとして扱う。
+RouteCache を渡すと A* 探索の結果を局所的な障害物・既存線をキーに再利用する。
 """
+from array import array
+import bisect
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 import heapq
-from typing import List, Dict, Tuple, Protocol, Optional
+import time
+from typing import Any, Callable, List, Dict, Set, Tuple, Protocol, Optional
+
+from .route_cache import RouteCache
 
 
 @dataclass
@@ -30,8 +54,38 @@ class RouteResult:
     from_side: str  # 'top' | 'right' | 'bottom' | 'left'
     to_side: str
     waypoints: List[Tuple[int, int]] = field(default_factory=list)
-    route_status: str = "ok"
+    route_status: str = "ok"  # 'ok' | 'failed' | 'degraded'(探索予算切れの代替経路)
     route_reason: str = ""
+    # 経路の出所: 'direct' | 'l-shape' (fast path) | 'search' (A*)
+    # | 'hub' (ハブの共有探索) | 'cache' | 'lane' (並列エッジの代表の経路をずらしたもの)
+    # | 'partial' | 'straight' (degraded)。失敗時は ''
+    route_source: str = ""
+    # 経路を決めたパス: 'route' (Pass 3) | 'refine' (Pass 4) | 'kept' (reroute で前回の経路を維持)
+    route_pass: str = field(default="", compare=False)
+    # 診断情報(このエッジの探索の積算値)。grid_points〜peak_heap は fast path・キャッシュで
+    # 決まった場合は 0。wall_time は経路選択全体の時間なので、その場合も計上する。
+    # route_pass と診断情報は経路の同一性の比較には使わない
+    grid_points: int = field(default=0, compare=False)  # 探索した候補座標グリッドの点数
+    blocked_points: int = field(default=0, compare=False)  # そのうち障害物内で通行不可の点数
+    expansions: int = field(default=0, compare=False)  # A* で展開した状態数
+    peak_heap: int = field(default=0, compare=False)  # A* の優先度付きキューの最大長
+    wall_time: float = field(default=0.0, compare=False)  # 経路選択にかかった時間(秒)
+    cost: float = field(default=0.0, compare=False)  # 確定した経路のコスト(長さ + 曲がり + 他エッジとの重なり・交差)
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """診断情報を dict で返す(ログ出力用)"""
+        return {
+            'route_status': self.route_status,
+            'route_reason': self.route_reason,
+            'route_source': self.route_source,
+            'route_pass': self.route_pass,
+            'grid_points': self.grid_points,
+            'blocked_points': self.blocked_points,
+            'expansions': self.expansions,
+            'peak_heap': self.peak_heap,
+            'wall_time': self.wall_time,
+            'cost': self.cost,
+        }
 
 
 class RouteNode(Protocol):
@@ -52,6 +106,9 @@ class RouteEdge(Protocol):
 # 進入辺の方向
 _SIDES = ('top', 'right', 'bottom', 'left')
 
+# 各辺の外向き単位ベクトル
+_OUTWARD = {'top': (0, -1), 'right': (1, 0), 'bottom': (0, 1), 'left': (-1, 0)}
+
 
 def _pick_side(rect: Tuple[int, int, int, int], target_cx: float, target_cy: float) -> str:
     """rect の中心から target に向かう方向で進入辺を選ぶ"""
@@ -90,9 +147,10 @@ def _segment_intersects_rect(
     rx: int, ry: int, rw: int, rh: int,
     padding: int
 ) -> bool:
-    """軸並行(水平/垂直)線分と矩形の交差判定。
+    """線分と矩形の交差判定。
 
-    waypoints は orthogonal なので segment は必ず水平 or 垂直。
+    waypoints は orthogonal なので通常は水平 or 垂直。
+    失敗したエッジの直線フォールバックは斜めになりうる。
     """
     pad_left = rx - padding
     pad_right = rx + rw + padding
@@ -112,8 +170,17 @@ def _segment_intersects_rect(
         seg_min_y = min(y1, y2)
         seg_max_y = max(y1, y2)
         return seg_min_y < pad_bottom and seg_max_y > pad_top
-    # 非軸並行は想定外。安全側で False
-    return False
+    # 斜めの線分は Liang–Barsky 法で矩形内に残る区間 [t0, t1] を求める(端点・角の接触は除く)
+    dx = x2 - x1
+    dy = y2 - y1
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x1 - pad_left), (dx, pad_right - x1), (-dy, y1 - pad_top), (dy, pad_bottom - y1)):
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+    return t0 < t1
 
 
 def _path_clear(
@@ -266,115 +333,604 @@ def _candidate_coordinates(
     return sorted(xs), sorted(ys)
 
 
+# 曲がり1回あたりのコスト(A* と _path_cost で共通)
+_BEND_COST = 30
+
+# 探索状態の進行軸(0: 水平 'h', 1: 垂直 'v')。_AXES[axis] で文字列に戻す
+_AXES = ('h', 'v')
+
+
+def _bend_lower_bound(dx: bool, dy: bool, axis: int) -> int:
+    """ゴールまでに最低限必要な曲がり回数。
+
+    x・y 両方ずれていれば必ず1回は曲がる。片方だけずれている場合は、
+    直前の進行軸(axis、始点は -1)がそのずれの軸と直交していれば1回曲がる必要がある。
+    """
+    if dx and dy:
+        return 1
+    if dx:
+        return 1 if axis == 1 else 0
+    if dy:
+        return 1 if axis == 0 else 0
+    return 0
+
+
+class _SearchGrid:
+    """A* 探索用の候補座標グリッド。
+
+    点 (xs[i], ys[j]) を整数インデックス i * len(ys) + j で表し、
+    障害物内の点と左・右・上・下の隣接点(同じ行・列で最も近い通行可能な点)を
+    配列で前計算する。隣接点との間の障害物判定は初回参照時に行って記録する。
+    リンク番号は 0: 左, 1: 右, 2: 上, 3: 下 で、link >> 1 が進行軸、link ^ 1 が逆向き。
+    """
+
+    def __init__(
+        self,
+        xs: List[int],
+        ys: List[int],
+        obstacles: List[Tuple[int, int, int, int]],
+        padding: int,
+        keep: Tuple[Tuple[int, int], ...] = (),
+        corridor: Optional['_Corridor'] = None
+    ):
+        """
+        Args:
+            xs, ys: 候補座標(昇順)
+            obstacles: 障害物矩形
+            padding: 障害物との余白(px)
+            keep: 障害物内でも通行可能とする点(始点・終点)
+            corridor: 指定すると、その範囲外の点を通行不可の壁にする
+                (障害物内の点と違い、隣接リンクも壁の先へは伸ばさない)
+        """
+        self.xs = xs
+        self.ys = ys
+        self.ny = len(ys)
+        self.size = len(xs) * self.ny
+        self.obstacles = obstacles
+        self.padding = padding
+        self._x_index = {x: i for i, x in enumerate(xs)}
+        self._y_index = {y: j for j, y in enumerate(ys)}
+
+        ny = self.ny
+        blocked = bytearray(self.size)
+        for rx, ry, rw, rh in obstacles:
+            # _point_in_rect と同じく padding 込みの矩形の内側(境界は含まない)
+            x_lo = bisect.bisect_right(xs, rx - padding)
+            x_hi = bisect.bisect_left(xs, rx + rw + padding)
+            y_lo = bisect.bisect_right(ys, ry - padding)
+            y_hi = bisect.bisect_left(ys, ry + rh + padding)
+            if y_hi <= y_lo:
+                continue
+            fill = b'\x01' * (y_hi - y_lo)
+            for i in range(x_lo, x_hi):
+                blocked[i * ny + y_lo:i * ny + y_hi] = fill
+        if corridor is not None:
+            for i, x in enumerate(xs):
+                for j, y in enumerate(ys):
+                    if not corridor.contains((x, y)):
+                        blocked[i * ny + j] = 2
+        for point in keep:
+            idx = self.index(point)
+            if idx is not None:
+                blocked[idx] = 0
+        self.blocked = blocked
+
+        left = array('i', [-1]) * self.size
+        right = array('i', [-1]) * self.size
+        up = array('i', [-1]) * self.size
+        down = array('i', [-1]) * self.size
+        for i in range(len(xs)):
+            prev = -1
+            for idx in range(i * ny, (i + 1) * ny):
+                if blocked[idx]:
+                    if blocked[idx] == 2:
+                        prev = -1
+                    continue
+                if prev >= 0:
+                    up[idx] = prev
+                    down[prev] = idx
+                prev = idx
+        for j in range(ny):
+            prev = -1
+            for idx in range(j, self.size, ny):
+                if blocked[idx]:
+                    if blocked[idx] == 2:
+                        prev = -1
+                    continue
+                if prev >= 0:
+                    left[idx] = prev
+                    right[prev] = idx
+                prev = idx
+        self.links = (left, right, up, down)
+        # (idx * 4 + link) ごとの隣接点間の障害物判定。0: 未判定, 1: 通行可, 2: 不可
+        self._clear = bytearray(self.size * 4)
+
+    def index(self, point: Tuple[int, int]) -> Optional[int]:
+        i = self._x_index.get(point[0])
+        j = self._y_index.get(point[1])
+        if i is None or j is None:
+            return None
+        return i * self.ny + j
+
+    def point(self, idx: int) -> Tuple[int, int]:
+        return self.xs[idx // self.ny], self.ys[idx % self.ny]
+
+    def neighbor(self, idx: int, link: int) -> int:
+        """link 方向の隣接点。障害物を横切る場合や端では -1"""
+        next_idx = self.links[link][idx]
+        if next_idx < 0:
+            return -1
+        slot = idx * 4 + link
+        clear = self._clear[slot]
+        if not clear:
+            clear = 1 if _path_clear(
+                [self.point(idx), self.point(next_idx)], self.obstacles, self.padding
+            ) else 2
+            self._clear[slot] = clear
+            self._clear[next_idx * 4 + (link ^ 1)] = clear
+        return next_idx if clear == 1 else -1
+
+
+# 探索予算を使い切ったときの代替経路の route_source
+_DEGRADED_SOURCES = ('partial', 'straight')
+
+
+class _GridLimitExceeded(Exception):
+    """候補座標グリッドの点数が上限を超えた"""
+
+
+class _SearchBudgetExceeded(Exception):
+    """1エッジ分の探索予算(展開数・時間)を使い切った"""
+
+    def __init__(self, partial: List[Tuple[int, int]]):
+        super().__init__('search budget exceeded')
+        # 探索途中で最もゴールに近づいた点までの経路(探索の始点から)
+        self.partial = partial
+
+
+@dataclass
+class _SearchStats:
+    """1エッジ分の経路探索の計測値。
+
+    探索の計測値は同じエッジの探索(採用されなかった引き直しを含む)で積算し、
+    cost は確定した経路の、他の確定済みエッジを既存線としたコスト。
+    """
+    grid_points: int = 0
+    blocked_points: int = 0
+    expansions: int = 0
+    peak_heap: int = 0
+    wall_time: float = 0.0
+    cost: float = 0.0
+
+    def merge(self, other: '_SearchStats'):
+        """別プロセスで計測した値を足し込む"""
+        self.grid_points += other.grid_points
+        self.blocked_points += other.blocked_points
+        self.expansions += other.expansions
+        self.peak_heap = max(self.peak_heap, other.peak_heap)
+        self.wall_time += other.wall_time
+
+
+class _SearchBudget:
+    """1エッジ分の探索予算。ハブ・粗密・全体探索で共有する"""
+
+    def __init__(self, max_expansions: Optional[int], time_limit: Optional[float]):
+        self.remaining = max_expansions
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    def spend(self) -> bool:
+        """1状態を展開する。予算が残っていなければ False"""
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+        return self.deadline is None or time.perf_counter() <= self.deadline
+
+
+@dataclass
+class _Corridor:
+    """粗いグリッド上で見つけた通路(セル座標の集合)"""
+    cells: Set[Tuple[int, int]]
+    cell: int
+
+    def contains(self, point: Tuple[int, int]) -> bool:
+        return (point[0] // self.cell, point[1] // self.cell) in self.cells
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """通路全体の外接矩形 (left, top, right, bottom)"""
+        cols = [c for c, _ in self.cells]
+        rows = [r for _, r in self.cells]
+        return (
+            min(cols) * self.cell, min(rows) * self.cell,
+            (max(cols) + 1) * self.cell, (max(rows) + 1) * self.cell,
+        )
+
+
+def _coarse_corridor(
+    start: Tuple[int, int],
+    goal: Tuple[int, int],
+    obstacles: List[Tuple[int, int, int, int]],
+    padding: int,
+    cell: int
+) -> Optional[_Corridor]:
+    """cell 四方のセルに分けた粗いグリッド上で start から goal への通路を探す。
+
+    各セルの障害物(padding 込み)の占有率を密度とし、密度が高いほど
+    通過コストを上げる。セル全体が埋まっていれば通行不可とする。
+    見つかったセル列を周囲1セル分広げて通路とする。見つからなければ None。
+    """
+    def cell_of(point: Tuple[int, int]) -> Tuple[int, int]:
+        return point[0] // cell, point[1] // cell
+
+    area = cell * cell
+    density: Dict[Tuple[int, int], float] = defaultdict(float)
+    for rx, ry, rw, rh in obstacles:
+        left, top = rx - padding, ry - padding
+        right, bottom = rx + rw + padding, ry + rh + padding
+        for ci in range(left // cell, (right - 1) // cell + 1):
+            width = min(right, (ci + 1) * cell) - max(left, ci * cell)
+            for cj in range(top // cell, (bottom - 1) // cell + 1):
+                height = min(bottom, (cj + 1) * cell) - max(top, cj * cell)
+                density[(ci, cj)] += width * height / area
+
+    start_cell = cell_of(start)
+    goal_cell = cell_of(goal)
+    used = [start_cell, goal_cell, *density]
+    min_c = min(c for c, _ in used) - 1
+    max_c = max(c for c, _ in used) + 1
+    min_r = min(r for _, r in used) - 1
+    max_r = max(r for _, r in used) + 1
+
+    def passable(c: Tuple[int, int]) -> bool:
+        return c in (start_cell, goal_cell) or density.get(c, 0.0) < 1.0
+
+    best = {start_cell: 0.0}
+    previous: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    queue = [(_manhattan(start_cell, goal_cell), 0.0, start_cell)]
+    found = False
+    while queue:
+        _, cost, current = heapq.heappop(queue)
+        if cost != best[current]:
+            continue
+        if current == goal_cell:
+            found = True
+            break
+        c, r = current
+        for nxt in ((c - 1, r), (c + 1, r), (c, r - 1), (c, r + 1)):
+            if not (min_c <= nxt[0] <= max_c and min_r <= nxt[1] <= max_r) or not passable(nxt):
+                continue
+            next_cost = cost + 1 + 4 * min(density.get(nxt, 0.0), 1.0)
+            if next_cost < best.get(nxt, float('inf')):
+                best[nxt] = next_cost
+                previous[nxt] = current
+                heapq.heappush(queue, (next_cost + _manhattan(nxt, goal_cell), next_cost, nxt))
+    if not found:
+        return None
+
+    cells = set()
+    current = goal_cell
+    while True:
+        c, r = current
+        cells.update((c + dc, r + dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1))
+        if current == start_cell:
+            break
+        current = previous[current]
+    return _Corridor(cells, cell)
+
+
 def _find_grid_path(
     start: Tuple[int, int],
     goal: Tuple[int, int],
     obstacles: List[Tuple[int, int, int, int]],
     existing_segments: List[Tuple[int, int, int, int]],
-    padding: int
+    padding: int,
+    corridor: Optional[_Corridor] = None,
+    max_points: Optional[int] = None,
+    budget: Optional[_SearchBudget] = None,
+    stats: Optional[_SearchStats] = None
 ) -> Optional[List[Tuple[int, int]]]:
-    """障害物外周と既存線周辺の候補座標上で直交A*探索を行う。"""
-    xs, ys = _candidate_coordinates(start, goal, obstacles, existing_segments, padding)
-    blocked = set()
-    points = set()
-    for x in xs:
-        for y in ys:
-            point = (x, y)
-            if point not in (start, goal) and any(_point_in_rect(point, obs, padding) for obs in obstacles):
-                blocked.add(point)
-            else:
-                points.add(point)
+    """障害物外周と既存線周辺の候補座標上で直交A*探索を行う。
 
-    if start not in points or goal not in points:
-        return None
+    ヒューリスティックはマンハッタン距離に最低限必要な曲がりコストを加えたもの
+    (許容的なので最適コストは変わらない)。
+
+    corridor を指定すると、通路と重なる障害物・既存線だけから候補座標を作り、
+    通路外の点を通行不可にする(通路外の障害物は考慮しないので、
+    呼び出し側で全障害物に対する干渉を確認すること)。
 
-    points_by_x: Dict[int, List[int]] = defaultdict(list)
-    points_by_y: Dict[int, List[int]] = defaultdict(list)
-    for x, y in points:
-        points_by_x[x].append(y)
-        points_by_y[y].append(x)
-    for x in points_by_x:
-        points_by_x[x].sort()
-    for y in points_by_y:
-        points_by_y[y].sort()
-
-    def neighbors(point: Tuple[int, int]) -> List[Tuple[Tuple[int, int], str]]:
-        x, y = point
+    Raises:
+        _GridLimitExceeded: 候補座標の点数が max_points を超えた場合
+        _SearchBudgetExceeded: budget を使い切った場合
+    """
+    if corridor is not None:
+        left, top, right, bottom = corridor.bounds()
+        obstacles = [
+            (rx, ry, rw, rh) for rx, ry, rw, rh in obstacles
+            if rx - padding < right and rx + rw + padding > left
+            and ry - padding < bottom and ry + rh + padding > top
+        ]
+        existing_segments = [
+            seg for seg in existing_segments
+            if min(seg[0], seg[2]) <= right and max(seg[0], seg[2]) >= left
+            and min(seg[1], seg[3]) <= bottom and max(seg[1], seg[3]) >= top
+        ]
+    xs, ys = _candidate_coordinates(start, goal, obstacles, existing_segments, padding)
+    if max_points is not None and len(xs) * len(ys) > max_points:
+        raise _GridLimitExceeded(len(xs) * len(ys))
+    grid = _SearchGrid(xs, ys, obstacles, padding, keep=(start, goal), corridor=corridor)
+    if stats is not None:
+        stats.grid_points += grid.size
+        stats.blocked_points += grid.size - grid.blocked.count(0)
+    start_idx = grid.index(start)
+    goal_idx = grid.index(goal)
+    gx, gy = goal
+
+    step_cost = _grid_step_costs(grid, existing_segments)
+
+    def heuristic(idx: int, axis: int) -> float:
+        x, y = grid.point(idx)
+        return (
+            abs(x - gx) + abs(y - gy)
+            + _BEND_COST * _bend_lower_bound(x != gx, y != gy, axis)
+        )
+
+    def successors(idx: int) -> List[Tuple[int, int, float]]:
         result = []
-        x_row = points_by_y[y]
-        y_col = points_by_x[x]
-        x_index = x_row.index(x)
-        y_index = y_col.index(y)
-        for next_x in (x_row[x_index - 1] if x_index > 0 else None,
-                       x_row[x_index + 1] if x_index + 1 < len(x_row) else None):
-            if next_x is not None:
-                next_point = (next_x, y)
-                if next_point not in blocked and _path_clear([point, next_point], obstacles, padding):
-                    result.append((next_point, 'h'))
-        for next_y in (y_col[y_index - 1] if y_index > 0 else None,
-                       y_col[y_index + 1] if y_index + 1 < len(y_col) else None):
-            if next_y is not None:
-                next_point = (x, next_y)
-                if next_point not in blocked and _path_clear([point, next_point], obstacles, padding):
-                    result.append((next_point, 'v'))
+        for link in range(4):
+            next_idx = grid.neighbor(idx, link)
+            if next_idx >= 0:
+                result.append((next_idx, link >> 1, step_cost(idx, link, next_idx)))
         return result
 
-    def heuristic(point: Tuple[int, int]) -> int:
-        return abs(point[0] - goal[0]) + abs(point[1] - goal[1])
+    return _grid_astar(grid, start_idx, goal_idx, successors, heuristic, budget, stats)
+
 
-    start_state = (start, None)
+def _grid_step_costs(
+    grid: _SearchGrid,
+    existing_segments: List[Tuple[int, int, int, int]]
+) -> Callable[[int, int, int], float]:
+    """隣接点間の1ステップのコスト(長さ + 既存線ペナルティ)を返す関数を作る。
+
+    コストは (idx * 4 + link) ごとに初回参照時に計算して記録する。
+    """
+    memo = array('d', [-1.0]) * (grid.size * 4)
+
+    def step_cost(idx: int, link: int, next_idx: int) -> float:
+        slot = idx * 4 + link
+        cost = memo[slot]
+        if cost < 0:
+            a = grid.point(idx)
+            b = grid.point(next_idx)
+            cost = abs(b[0] - a[0]) + abs(b[1] - a[1]) + _soft_segment_cost((*a, *b), existing_segments)
+            memo[slot] = cost
+            memo[next_idx * 4 + (link ^ 1)] = cost
+        return cost
+
+    return step_cost
+
+
+def _grid_astar(
+    grid: _SearchGrid,
+    start_idx: int,
+    goal_idx: int,
+    successors: Callable[[int], List[Tuple[int, int, float]]],
+    heuristic: Callable[[int, int], float],
+    budget: Optional[_SearchBudget] = None,
+    stats: Optional[_SearchStats] = None
+) -> Optional[List[Tuple[int, int]]]:
+    """_SearchGrid 上の直交 A* 本体。
+
+    探索状態は (点インデックス, 進行軸) を 1 つの整数 idx * 2 + axis で表し、
+    コストと直前状態は array に持つ(末尾の 1 要素は進行軸のない始点状態)。
+    successors(idx) は (次の点, 進行軸, 移動コスト) のリスト、
+    heuristic(idx, axis) は残りコストの下界(始点では axis=-1)。
+
+    budget を使い切ると、展開済みの状態のうちヒューリスティック値が最小
+    (最もゴールに近い)状態までの経路を持たせて _SearchBudgetExceeded を送出する。
+    stats には展開数とヒープの最大長を積算する。
+    """
+    start_state = grid.size * 2
+    best = array('d', [float('inf')]) * (start_state + 1)
+    previous = array('i', [-1]) * (start_state + 1)
+    best[start_state] = 0.0
     counter = 0
-    queue = [(heuristic(start), 0.0, counter, start, None)]
-    best: Dict[Tuple[Tuple[int, int], Optional[str]], float] = {start_state: 0.0}
-    previous: Dict[
-        Tuple[Tuple[int, int], Optional[str]],
-        Tuple[Tuple[int, int], Optional[str]]
-    ] = {}
-    goal_state = None
+    queue = [(heuristic(start_idx, -1), 0.0, counter, start_state)]
+    goal_state = -1
+    closest = (float('inf'), start_state)
+
+    def trace(state: int) -> List[Tuple[int, int]]:
+        path = []
+        while state != start_state:
+            path.append(grid.point(state >> 1))
+            state = previous[state]
+        path.append(grid.point(start_idx))
+        path.reverse()
+        return _simplify_path(path)
 
     while queue:
-        _, current_cost, _, point, prev_dir = heapq.heappop(queue)
-        state = (point, prev_dir)
-        if current_cost != best.get(state):
+        _, current_cost, _, state = heapq.heappop(queue)
+        if current_cost != best[state]:
             continue
-        if point == goal:
+        if state == start_state:
+            idx, axis = start_idx, -1
+        else:
+            idx, axis = state >> 1, state & 1
+        if idx == goal_idx:
             goal_state = state
             break
-
-        for next_point, direction in neighbors(point):
-            x1, y1 = point
-            x2, y2 = next_point
-            segment = (x1, y1, x2, y2)
-            length = abs(x2 - x1) + abs(y2 - y1)
-            bend_cost = 0 if prev_dir in (None, direction) else 30
-            next_cost = (
-                current_cost
-                + length
-                + bend_cost
-                + _soft_segment_cost(segment, existing_segments)
-            )
-            next_state = (next_point, direction)
-            if next_cost < best.get(next_state, float('inf')):
+        if stats is not None:
+            stats.expansions += 1
+            stats.peak_heap = max(stats.peak_heap, len(queue) + 1)
+        if budget is not None:
+            remaining = heuristic(idx, axis)
+            if remaining < closest[0]:
+                closest = (remaining, state)
+            if not budget.spend():
+                raise _SearchBudgetExceeded(trace(closest[1]))
+
+        for next_idx, next_axis, move_cost in successors(idx):
+            bend_cost = 0 if axis in (-1, next_axis) else _BEND_COST
+            next_cost = current_cost + move_cost + bend_cost
+            next_state = next_idx * 2 + next_axis
+            if next_cost < best[next_state]:
                 best[next_state] = next_cost
                 previous[next_state] = state
                 counter += 1
-                heapq.heappush(queue, (next_cost + heuristic(next_point), next_cost, counter, next_point, direction))
+                heapq.heappush(queue, (
+                    next_cost + heuristic(next_idx, next_axis),
+                    next_cost, counter, next_state
+                ))
 
-    if goal_state is None:
+    if goal_state < 0:
         return None
+    return trace(goal_state)
 
-    path = []
-    state = goal_state
-    while True:
-        path.append(state[0])
-        if state == start_state:
-            break
-        state = previous[state]
-    path.reverse()
-    return _simplify_path(path)
 
+class _HubSearch:
+    """ハブ(1つの辺に多数のエッジが接続するノード)周辺で共有する探索。
 
-def _choose_path(
+    グループ内の全エッジの端点から1つの候補座標グリッドを作り、
+    ハブ側の出口すべてを始点とする Dijkstra で、既存線を無視した
+    残りコストの下界(距離場)を前計算する。各エッジは相手側からハブ側の
+    出口へ向かう A* で探索し、この距離場をヒューリスティックに使う。
+    既存線のコストは探索のたびにその時点の確定済み経路で評価するので、
+    経路確定順による重なり・交差の回避は通常の探索と変わらない。
+    """
+
+    def __init__(
+        self,
+        exits: List[Tuple[int, int]],
+        far_ends: List[Tuple[int, int]],
+        obstacles: List[Tuple[int, int, int, int]],
+        existing_segments: List[Tuple[int, int, int, int]],
+        padding: int
+    ):
+        """
+        Args:
+            exits: 各エッジのハブ側の出口(ポートから padding+1 外側の点)
+            far_ends: 各エッジの相手側の出口
+            obstacles: ハブ以外のノード矩形
+            existing_segments: グループの最初のエッジを引く時点の確定済みの線
+            padding: 障害物との余白(px)
+        """
+        xs: Set[int] = set()
+        ys: Set[int] = set()
+        for exit_point, far_end in zip(exits, far_ends):
+            cx, cy = _candidate_coordinates(far_end, exit_point, obstacles, existing_segments, padding)
+            xs.update(cx)
+            ys.update(cy)
+        self.obstacles = obstacles
+        self.exits = set(exits)
+        self.grid = _SearchGrid(sorted(xs), sorted(ys), obstacles, padding, keep=(*exits, *far_ends))
+
+        # distance[idx * 2 + axis]: いずれかの出口から axis 方向に進んで idx に着く最小コスト
+        grid = self.grid
+        distance = array('d', [float('inf')]) * (grid.size * 2)
+        queue = []
+        for exit_point in exits:
+            idx = grid.index(exit_point)
+            for axis in (0, 1):
+                distance[idx * 2 + axis] = 0.0
+                queue.append((0.0, idx * 2 + axis))
+        heapq.heapify(queue)
+        while queue:
+            cost, state = heapq.heappop(queue)
+            if cost != distance[state]:
+                continue
+            idx, axis = state >> 1, state & 1
+            x, y = grid.point(idx)
+            for link in range(4):
+                next_idx = grid.neighbor(idx, link)
+                if next_idx < 0:
+                    continue
+                nx, ny = grid.point(next_idx)
+                next_axis = link >> 1
+                next_cost = cost + abs(nx - x) + abs(ny - y) + (0 if next_axis == axis else _BEND_COST)
+                next_state = next_idx * 2 + next_axis
+                if next_cost < distance[next_state]:
+                    distance[next_state] = next_cost
+                    heapq.heappush(queue, (next_cost, next_state))
+        self.distance = distance
+
+    def find_path(
+        self,
+        start: Tuple[int, int],
+        goal: Tuple[int, int],
+        existing_segments: List[Tuple[int, int, int, int]],
+        budget: Optional[_SearchBudget] = None,
+        stats: Optional[_SearchStats] = None
+    ) -> Optional[List[Tuple[int, int]]]:
+        """start→goal の経路。どちらか一方はハブ側の出口であること。
+
+        探索は相手側から行うので、budget を使い切った場合の途中経路は相手側の点から始まる。
+        """
+        exit_point, far_end = (start, goal) if start in self.exits else (goal, start)
+        grid = self.grid
+        far_idx = grid.index(far_end)
+        exit_idx = grid.index(exit_point)
+        if far_idx is None or exit_idx is None:
+            return None
+        distance = self.distance
+
+        def heuristic(idx: int, axis: int) -> float:
+            # 最初に進む軸で場合分けし、現在の軸と違えば曲がりコストを足す
+            to_h = distance[idx * 2]
+            to_v = distance[idx * 2 + 1]
+            if axis == 0:
+                return min(to_h, to_v + _BEND_COST)
+            if axis == 1:
+                return min(to_v, to_h + _BEND_COST)
+            return min(to_h, to_v)
+
+        if heuristic(far_idx, -1) == float('inf'):
+            return None
+        if stats is not None:
+            stats.grid_points += grid.size
+            stats.blocked_points += grid.size - grid.blocked.count(0)
+        step_cost = _grid_step_costs(grid, existing_segments)
+
+        def successors(idx: int) -> List[Tuple[int, int, float]]:
+            result = []
+            for link in range(4):
+                next_idx = grid.neighbor(idx, link)
+                if next_idx >= 0:
+                    result.append((next_idx, link >> 1, step_cost(idx, link, next_idx)))
+            return result
+
+        path = _grid_astar(grid, far_idx, exit_idx, successors, heuristic, budget, stats)
+        if path is None:
+            return None
+        if far_end == start:
+            return path
+        path.reverse()
+        return path
+
+
+def _simple_shapes(
+    start: Tuple[int, int],
+    goal: Tuple[int, int]
+) -> List[Tuple[str, List[Tuple[int, int]]]]:
+    """start→goal を結ぶ曲がり 0〜1 回の直交経路候補 (shape名, 中継点) を返す。
+
+    曲がり 2 回の Z字は A* の下界(曲がり 1 回)に届かないので候補にしない。
+    """
+    sx, sy = start
+    gx, gy = goal
+    if sx == gx or sy == gy:
+        return [('direct', [])]
+    return [
+        ('l-shape', [(gx, sy)]),
+        ('l-shape', [(sx, gy)]),
+    ]
+
+
+def _moves_inward(a: Tuple[int, int], b: Tuple[int, int], side: str) -> bool:
+    """a→b の移動が side の外向きと逆(ノード側へ戻る向き)か"""
+    dx, dy = _OUTWARD[side]
+    return (b[0] - a[0]) * dx + (b[1] - a[1]) * dy < 0
+
+
+def _fast_path(
     src_port: Tuple[int, int],
     dst_port: Tuple[int, int],
     src_side: str,
@@ -382,19 +938,266 @@ def _choose_path(
     obstacles: List[Tuple[int, int, int, int]],
     padding: int,
     existing_segments: List[Tuple[int, int, int, int]]
-) -> Optional[List[Tuple[int, int]]]:
-    """障害物外周候補と既存線コストを使って直交経路を探索する。"""
+) -> Optional[Tuple[List[Tuple[int, int]], str]]:
+    """直線・L字のうち、障害物を避けて既存線とも干渉しない最安の経路を返す。
+
+    A* と同じ区間(src_exit → dst_entry)のコストが A* の下界(マンハッタン距離 +
+    最低限必要な曲がり)に等しい形だけを採用するので、A* より悪い経路は選ばない。
+    該当がなければ None(A* 探索が必要)。
+    """
     offset = padding + 1
     src_exit = _outside_point(src_port, src_side, offset)
     dst_entry = _outside_point(dst_port, dst_side, offset)
-    routed = _find_grid_path(src_exit, dst_entry, obstacles, existing_segments, padding)
-    if routed is None:
+    dx = dst_entry[0] - src_exit[0]
+    dy = dst_entry[1] - src_exit[1]
+    lower_bound = abs(dx) + abs(dy) + _BEND_COST * _bend_lower_bound(dx != 0, dy != 0, -1)
+
+    best: Optional[Tuple[float, List[Tuple[int, int]], str]] = None
+    for shape, corners in _simple_shapes(src_exit, dst_entry):
+        inner = [src_exit, *corners, dst_entry]
+        # 自ノード側へ折り返す形は自ノードを貫通するので除外
+        if _moves_inward(inner[0], inner[1], src_side):
+            continue
+        if _moves_inward(inner[-1], inner[-2], dst_side):
+            continue
+        if _path_cost(inner, []) > lower_bound:
+            continue
+        path = _simplify_path([src_port, *inner, dst_port])
+        if not _path_clear(path, obstacles, padding):
+            continue
+        segments = _segments_from_points(path)
+        if any(_soft_segment_cost(seg, existing_segments) for seg in segments):
+            continue
+        cost = _path_cost(path, [])
+        if best is None or cost < best[0]:
+            best = (cost, path, shape)
+
+    if best is None:
         return None
+    _, path, shape = best
+    return path[1:-1], shape
+
+
+@dataclass(frozen=True)
+class _SearchOptions:
+    """1エッジ分の経路探索の設定(EdgeRouter.route() の引数から作る)"""
+    fast_path: bool = False
+    coarse_cell: int = 0
+    max_grid_points: Optional[int] = None
+    max_expansions: Optional[int] = None
+    time_limit: Optional[float] = None
 
+
+def _choose_path(
+    src_port: Tuple[int, int],
+    dst_port: Tuple[int, int],
+    src_side: str,
+    dst_side: str,
+    obstacles: List[Tuple[int, int, int, int]],
+    padding: int,
+    existing_segments: List[Tuple[int, int, int, int]],
+    options: _SearchOptions = _SearchOptions(),
+    cache: Optional[RouteCache] = None,
+    hub: Optional[_HubSearch] = None,
+    stats: Optional[_SearchStats] = None
+) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """障害物外周候補と既存線コストを使って直交経路を探索する。
+
+    hub を渡すと、グリッド探索の前にハブの共有グリッドと距離場で探索する
+    (見つからなければ通常の探索を行う)。
+    stats を渡すと、探索の計測値と所要時間を積算する。
+
+    Returns:
+        (waypoints, route_source)。経路が見つからない場合は
+        (None, route_reason)('no-orthogonal-path' または 'grid-limit')。
+    """
+    started = time.perf_counter()
+    waypoints, source = _select_path(
+        src_port, dst_port, src_side, dst_side,
+        obstacles, padding, existing_segments, options, cache, hub, stats
+    )
+    if stats is not None:
+        stats.wall_time += time.perf_counter() - started
+    return waypoints, source
+
+
+def _select_path(
+    src_port: Tuple[int, int],
+    dst_port: Tuple[int, int],
+    src_side: str,
+    dst_side: str,
+    obstacles: List[Tuple[int, int, int, int]],
+    padding: int,
+    existing_segments: List[Tuple[int, int, int, int]],
+    options: _SearchOptions,
+    cache: Optional[RouteCache],
+    hub: Optional[_HubSearch],
+    stats: Optional[_SearchStats]
+) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """fast path → キャッシュ → グリッド探索の順に経路を選ぶ(_choose_path の本体)"""
+    if options.fast_path:
+        fast = _fast_path(src_port, dst_port, src_side, dst_side, obstacles, padding, existing_segments)
+        if fast is not None:
+            return fast
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(src_port, dst_port, src_side, dst_side, obstacles, existing_segments, padding)
+        cached = cache.get(cache_key)
+        # キーは探索範囲内しか見ていないので、範囲外の障害物との干渉は毎回確認する
+        if cached is not None and _path_clear([src_port, *cached, dst_port], obstacles, padding):
+            return cached, 'cache'
+
+    offset = padding + 1
+    src_exit = _outside_point(src_port, src_side, offset)
+    dst_entry = _outside_point(dst_port, dst_side, offset)
+    budget = None
+    if options.max_expansions is not None or options.time_limit is not None:
+        budget = _SearchBudget(options.max_expansions, options.time_limit)
+    try:
+        path, source = _search_path(
+            src_port, dst_port, src_exit, dst_entry,
+            obstacles, padding, existing_segments, options, hub, budget, stats
+        )
+    except _SearchBudgetExceeded as exceeded:
+        return _degraded_path(src_port, src_exit, exceeded.partial, dst_entry, dst_port, obstacles, padding)
+    if path is None:
+        return None, source
+    if cache is not None:
+        cache.put(cache_key, path[1:-1])
+    return path[1:-1], source
+
+
+def _search_path(
+    src_port: Tuple[int, int],
+    dst_port: Tuple[int, int],
+    src_exit: Tuple[int, int],
+    dst_entry: Tuple[int, int],
+    obstacles: List[Tuple[int, int, int, int]],
+    padding: int,
+    existing_segments: List[Tuple[int, int, int, int]],
+    options: _SearchOptions,
+    hub: Optional[_HubSearch],
+    budget: Optional[_SearchBudget],
+    stats: Optional[_SearchStats]
+) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """ハブ探索 → 粗密探索 → 全体探索の順に試し、ポートを含む経路と route_source を返す。
+
+    見つからなければ (None, route_reason)。
+    """
+    if hub is not None:
+        routed = hub.find_path(src_exit, dst_entry, existing_segments, budget, stats)
+        if routed is not None:
+            path = _simplify_path([src_port, src_exit, *routed, dst_entry, dst_port])
+            if _path_clear(path, obstacles, padding):
+                return path, 'hub'
+
+    if options.coarse_cell > 0:
+        # 粗いグリッドで通路を決め、その中だけを詳細に探索する
+        corridor = _coarse_corridor(src_exit, dst_entry, obstacles, padding, options.coarse_cell)
+        if corridor is not None:
+            try:
+                routed = _find_grid_path(
+                    src_exit, dst_entry, obstacles, existing_segments, padding,
+                    corridor, options.max_grid_points, budget, stats
+                )
+            except _GridLimitExceeded:
+                routed = None
+            if routed is not None:
+                path = _simplify_path([src_port, src_exit, *routed, dst_entry, dst_port])
+                if _path_clear(path, obstacles, padding):
+                    return path, 'search'
+
+    try:
+        routed = _find_grid_path(
+            src_exit, dst_entry, obstacles, existing_segments, padding,
+            None, options.max_grid_points, budget, stats
+        )
+    except _GridLimitExceeded:
+        return None, 'grid-limit'
+    if routed is None:
+        return None, 'no-orthogonal-path'
     path = _simplify_path([src_port, src_exit, *routed, dst_entry, dst_port])
     if not _path_clear(path, obstacles, padding):
+        return None, 'no-orthogonal-path'
+    return path, 'search'
+
+
+def _degraded_path(
+    src_port: Tuple[int, int],
+    src_exit: Tuple[int, int],
+    partial: List[Tuple[int, int]],
+    dst_entry: Tuple[int, int],
+    dst_port: Tuple[int, int],
+    obstacles: List[Tuple[int, int, int, int]],
+    padding: int
+) -> Tuple[List[Tuple[int, int]], str]:
+    """探索予算を使い切ったエッジの代替経路。
+
+    探索途中で最もゴールに近づいた経路 partial の先端から反対側の出口へ
+    L字でつなぎ、障害物と干渉しなければ 'partial'、どちらの L字も
+    干渉する場合は直線(waypoints=[])で 'straight' を返す。
+    """
+    if partial and partial[0] == dst_entry:
+        # 終点側から探索していた(ハブ探索)
+        head, tail = [src_port, src_exit], [*reversed(partial), dst_port]
+    else:
+        head, tail = [src_port, *(partial or [src_exit])], [dst_entry, dst_port]
+    a, b = head[-1], tail[0]
+    for corner in ((a[0], b[1]), (b[0], a[1])):
+        path = _simplify_path([*head, corner, *tail])
+        if _path_clear(path, obstacles, padding):
+            return path[1:-1], 'partial'
+    return [], 'straight'
+
+
+def _unit(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+    return (b[0] > a[0]) - (b[0] < a[0]), (b[1] > a[1]) - (b[1] < a[1])
+
+
+def _offset_lane(
+    trunk: List[Tuple[int, int]],
+    start_offset: Tuple[int, int],
+    lane: int,
+    end_offset: Tuple[int, int]
+) -> Optional[List[Tuple[int, int]]]:
+    """trunk(ポートからポートまでの直交点列)を平行にずらしたレーンの点列を返す。
+
+    最初のセグメントは start_offset、最後のセグメントは end_offset、
+    中間のセグメントは進行方向の左法線 × lane だけずらす。
+    ずらしたことでセグメントが消えたり逆向きになったりする場合は None。
+    """
+    if len(trunk) < 2:
         return None
-    return path[1:-1]
+    offsets = []
+    for a, b in zip(trunk, trunk[1:]):
+        ux, uy = _unit(a, b)
+        offsets.append((-uy * lane, ux * lane))
+    offsets[0] = start_offset
+    offsets[-1] = end_offset
+
+    if len(offsets) == 1:
+        (x1, y1), (x2, y2) = trunk
+        (sx, sy), (ex, ey) = start_offset, end_offset
+        if start_offset == end_offset:
+            return [(x1 + sx, y1 + sy), (x2 + sx, y2 + sy)]
+        # 直線の幹は中央で法線方向に段をつけてつなぐ
+        mx, my = (x1 + x2) // 2, (y1 + y2) // 2
+        return [(x1 + sx, y1 + sy), (mx + sx, my + sy), (mx + ex, my + ey), (x2 + ex, y2 + ey)]
+
+    x, y = trunk[0]
+    points = [(x + offsets[0][0], y + offsets[0][1])]
+    for k in range(1, len(trunk) - 1):
+        x, y = trunk[k]
+        (ax, ay), (bx, by) = offsets[k - 1], offsets[k]
+        points.append((x + ax + bx, y + ay + by))
+    x, y = trunk[-1]
+    points.append((x + offsets[-1][0], y + offsets[-1][1]))
+
+    for k in range(len(trunk) - 1):
+        if points[k] == points[k + 1] or _unit(points[k], points[k + 1]) != _unit(trunk[k], trunk[k + 1]):
+            return None
+    return points
 
 
 def _manhattan(a: Tuple[int, int], b: Tuple[int, int]) -> int:
@@ -413,13 +1216,334 @@ def _path_cost(
         direction = _segment_direction(x1, y1, x2, y2)
         cost += abs(x2 - x1) + abs(y2 - y1)
         if prev_dir is not None and direction is not None and direction != prev_dir:
-            cost += 30
+            cost += _BEND_COST
         if direction is not None:
             prev_dir = direction
         cost += _soft_segment_cost(segment, existing_segments)
     return cost
 
 
+def _soft_path_cost(
+    points: List[Tuple[int, int]],
+    existing_segments: List[Tuple[int, int, int, int]]
+) -> float:
+    """経路のうち既存線との重なり・交差ペナルティ分だけのコスト"""
+    return sum(
+        _soft_segment_cost(segment, existing_segments)
+        for segment in _segments_from_points(points)
+    )
+
+
+def _segments_interact(
+    segments: List[Tuple[int, int, int, int]],
+    other_segments: List[Tuple[int, int, int, int]]
+) -> bool:
+    """2つの線分列の間に重なり・交差ペナルティが発生するか"""
+    return any(_soft_segment_cost(segment, other_segments) for segment in segments)
+
+
+def _route_batch(
+    tasks: List[Tuple[int, Tuple[int, int], Tuple[int, int], str, str, List[Tuple[int, int, int, int]]]],
+    existing_segments: List[Tuple[int, int, int, int]],
+    padding: int,
+    options: _SearchOptions
+) -> List[Tuple[int, Optional[List[Tuple[int, int]]], str, _SearchStats]]:
+    """1バッチ分のエッジを順に経路探索する(プロセスプールのワーカーで実行)。
+
+    tasks は (idx, src_port, dst_port, src_side, dst_side, obstacles) のリストで、
+    確定した経路はバッチ内の後続エッジにとって既存線になる。
+    """
+    existing = list(existing_segments)
+    results = []
+    for idx, src_port, dst_port, src_side, dst_side, obstacles in tasks:
+        stats = _SearchStats()
+        waypoints, source = _choose_path(
+            src_port, dst_port, src_side, dst_side,
+            obstacles, padding, existing, options, stats=stats
+        )
+        if waypoints is not None:
+            existing.extend(_segments_from_points([src_port, *waypoints, dst_port]))
+        results.append((idx, waypoints, source, stats))
+    return results
+
+
+def _reroute_batch(
+    tasks: List[Tuple[int, Tuple[int, int], Tuple[int, int], str, str, List[Tuple[int, int, int, int]]]],
+    snapshot: Dict[int, List[Tuple[int, int, int, int]]],
+    padding: int,
+    options: _SearchOptions
+) -> List[Tuple[int, Optional[List[Tuple[int, int]]], str, _SearchStats]]:
+    """固定した経路 snapshot を既存線として、各エッジを独立に引き直す(ワーカーで実行)"""
+    results = []
+    for idx, src_port, dst_port, src_side, dst_side, obstacles in tasks:
+        others = [seg for j, segs in snapshot.items() if j != idx for seg in segs]
+        stats = _SearchStats()
+        waypoints, source = _choose_path(
+            src_port, dst_port, src_side, dst_side,
+            obstacles, padding, others, options, stats=stats
+        )
+        results.append((idx, waypoints, source, stats))
+    return results
+
+
+@dataclass
+class _HubGroup:
+    """ハブの (node, side) に接続するエッジの集まり。探索は最初に使うときに作る"""
+    members: List[Tuple[int, str]]  # (エッジ番号, ハブ側の端 'src' | 'dst')
+    obstacles: List[Tuple[int, int, int, int]]
+    search: Optional[_HubSearch] = None
+
+
+@dataclass
+class _RoutingPlan:
+    """1回のルーティング処理で共有する状態(Pass 1〜2 の結果・探索設定・確定済み経路)"""
+    edge_info: List[Optional[Dict]]
+    port_assignment: Dict[Tuple[int, str], Tuple[int, int]]
+    obstacles_map: Dict[int, List[Tuple[int, int, int, int]]]
+    route_order: List[int]
+    padding: int = 12
+    options: _SearchOptions = _SearchOptions()
+    cache: Optional[RouteCache] = None
+    paths: Dict[int, Optional[List[Tuple[int, int]]]] = field(default_factory=dict)
+    sources: Dict[int, str] = field(default_factory=dict)
+    reasons: Dict[int, str] = field(default_factory=dict)
+    hub_groups: Dict[int, '_HubGroup'] = field(default_factory=dict)
+    # 並列エッジのまとめ: 代表エッジ → 同じノードペアのエッジ(代表を含む、番号順)
+    trunks: Dict[int, List[int]] = field(default_factory=dict)
+    stats: Dict[int, _SearchStats] = field(default_factory=dict)
+    passes: Dict[int, str] = field(default_factory=dict)
+    segments_map: Dict[int, List[Tuple[int, int, int, int]]] = field(default_factory=dict)
+
+    def ports(self, idx: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        return self.port_assignment[(idx, 'src')], self.port_assignment[(idx, 'dst')]
+
+    def choose(
+        self,
+        idx: int,
+        existing_segments: List[Tuple[int, int, int, int]],
+        widen: int = 0
+    ) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+        """existing_segments を既存線として idx のエッジの経路を探索する。
+
+        widen を指定すると障害物をその幅だけ広げて探す(ハブの共有探索は使わない)。
+        """
+        info = self.edge_info[idx]
+        src_port, dst_port = self.ports(idx)
+        obstacles = self.obstacles_map[idx]
+        hub = None
+        if widen:
+            obstacles = [(x - widen, y - widen, w + widen * 2, h + widen * 2) for x, y, w, h in obstacles]
+        else:
+            hub = self.hub_search(idx, existing_segments)
+        return _choose_path(
+            src_port, dst_port,
+            info['src_side'], info['dst_side'],
+            obstacles, self.padding, existing_segments,
+            self.options, self.cache, hub, self.stats_for(idx)
+        )
+
+    def leaders(self, order: List[int]) -> List[int]:
+        """order から、代表エッジの経路をずらして引く並列エッジを除いたもの"""
+        followers = {m for members in self.trunks.values() for m in members[1:]}
+        return [idx for idx in order if idx not in followers]
+
+    def trunk_ends(self, leader: int, idx: int) -> Tuple[Tuple[int, str], Tuple[int, str]]:
+        """並列エッジ idx の、代表エッジの始点側・終点側にあたるポートのキー"""
+        if self.edge_info[idx]['src_id'] == self.edge_info[leader]['src_id']:
+            return (idx, 'src'), (idx, 'dst')
+        return (idx, 'dst'), (idx, 'src')
+
+    def lanes(
+        self,
+        leader: int,
+        waypoints: List[Tuple[int, int]]
+    ) -> Tuple[Dict[Tuple[int, str], Tuple[int, int]], Dict[int, Optional[List[Tuple[int, int]]]]]:
+        """代表エッジの経路(幹)を平行にずらした、各並列エッジの waypoints を求める。
+
+        始点側はポートの間隔をそのままレーン幅にする。幹の片側にずらす配置と、
+        反対側に折り返して入れ子にする配置(最初の曲がりの内側に入れない場合用)を試し、
+        障害物と干渉しないレーンの多い方を採用する。終点側は、レーンが
+        交差しないよう、グループのポート位置をレーンの並び順に割り当て直す。
+        ずらすと障害物と干渉する・向きが変わるエッジは None。
+
+        Returns:
+            (終点側ポートの割り当て, エッジ番号 → waypoints)
+        """
+        members = self.trunks[leader]
+        src_port, dst_port = self.ports(leader)
+        trunk = _simplify_path([src_port, *waypoints, dst_port])
+        if len(trunk) < 2:
+            return {}, {idx: None for idx in members}
+        start, end = trunk[0], trunk[-1]
+        ux, uy = _unit(trunk[0], trunk[1])
+        vx, vy = _unit(trunk[-2], trunk[-1])
+        axis = 0 if vx == 0 else 1
+        a_keys = {idx: self.trunk_ends(leader, idx)[0] for idx in members}
+        b_keys = {idx: self.trunk_ends(leader, idx)[1] for idx in members}
+        offsets = {}
+        for idx in members:
+            ax, ay = self.port_assignment[a_keys[idx]]
+            offsets[idx] = (ax - start[0], ay - start[1])
+        lane_of = {idx: -uy * dx + ux * dy for idx, (dx, dy) in offsets.items()}
+        # 終点側: 最後のセグメントの法線方向に並ぶ順でポート位置を割り当てる
+        slots = sorted((self.port_assignment[key] for key in b_keys.values()), key=lambda p: p[axis])
+        ranked = sorted(members, key=lambda idx: ((-vy, vx)[axis] * lane_of[idx], idx))
+        ends = {b_keys[idx]: slot for idx, slot in zip(ranked, slots)}
+
+        best: Optional[Tuple[int, Dict[int, Optional[List[Tuple[int, int]]]]]] = None
+        for shift in (0, -(max(lane_of.values()) + min(lane_of.values()))):
+            result: Dict[int, Optional[List[Tuple[int, int]]]] = {}
+            for idx in members:
+                bx, by = ends[b_keys[idx]]
+                points = _offset_lane(trunk, offsets[idx], lane_of[idx] + shift, (bx - end[0], by - end[1]))
+                if points is None or not _path_clear(points, self.obstacles_map[idx], self.padding):
+                    result[idx] = None
+                    continue
+                inner = points[1:-1]
+                result[idx] = inner if a_keys[idx][1] == 'src' else inner[::-1]
+            valid = sum(1 for lane in result.values() if lane is not None)
+            if best is None or valid > best[0]:
+                best = (valid, result)
+            if valid == len(members) or not shift and len(trunk) == 2:
+                break
+        return ends, best[1]
+
+    def lane_spread(self, leader: int) -> int:
+        """代表エッジの始点側で、並列エッジのポートが広がる幅"""
+        ports = [self.port_assignment[self.trunk_ends(leader, idx)[0]] for idx in self.trunks[leader]]
+        xs = [p[0] for p in ports]
+        ys = [p[1] for p in ports]
+        return max(xs) - min(xs) + max(ys) - min(ys)
+
+    def stats_for(self, idx: int) -> _SearchStats:
+        stats = self.stats.get(idx)
+        if stats is None:
+            stats = self.stats[idx] = _SearchStats()
+        return stats
+
+    def exits(self, idx: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """ポートから padding+1 外側に出た探索の始点・終点"""
+        info = self.edge_info[idx]
+        src_port, dst_port = self.ports(idx)
+        offset = self.padding + 1
+        return (
+            _outside_point(src_port, info['src_side'], offset),
+            _outside_point(dst_port, info['dst_side'], offset),
+        )
+
+    def hub_search(
+        self,
+        idx: int,
+        existing_segments: List[Tuple[int, int, int, int]]
+    ) -> Optional[_HubSearch]:
+        """idx がハブのグループに属していれば、そのグループの共有探索を返す"""
+        group = self.hub_groups.get(idx)
+        if group is None:
+            return None
+        if group.search is None:
+            exits = []
+            far_ends = []
+            for member, role in group.members:
+                src_exit, dst_entry = self.exits(member)
+                if role == 'src':
+                    exits.append(src_exit)
+                    far_ends.append(dst_entry)
+                else:
+                    exits.append(dst_entry)
+                    far_ends.append(src_exit)
+            group.search = _HubSearch(exits, far_ends, group.obstacles, existing_segments, self.padding)
+        return group.search
+
+    def region(self, idx: int) -> Tuple[int, int, int, int]:
+        """経路が通りうるおおよその範囲 (left, top, right, bottom)。
+
+        ポート間の外接矩形を候補座標の外周余白と同じ幅だけ広げたもの。
+        """
+        (sx, sy), (dx, dy) = self.ports(idx)
+        margin = max(40, self.padding * 4)
+        return min(sx, dx) - margin, min(sy, dy) - margin, max(sx, dx) + margin, max(sy, dy) + margin
+
+    def batches(self, order: List[int]) -> List[List[int]]:
+        """order のエッジを、範囲(region)が重なるもの同士でまとめたバッチに分ける。
+
+        範囲が重なるエッジを連結成分としてまとめるので、異なるバッチの経路は
+        互いの探索に影響しにくい。各バッチ内は order の順序を保つ。
+        """
+        parent = {idx: idx for idx in order}
+
+        def find(idx: int) -> int:
+            while parent[idx] != idx:
+                parent[idx] = parent[parent[idx]]
+                idx = parent[idx]
+            return idx
+
+        # x 方向の区間でスイープし、重なる候補だけ y 方向を比べる
+        regions = {idx: self.region(idx) for idx in order}
+        active: List[int] = []
+        for idx in sorted(order, key=lambda i: regions[i][0]):
+            left, top, _, bottom = regions[idx]
+            active = [j for j in active if regions[j][2] >= left]
+            for j in active:
+                if regions[j][1] <= bottom and regions[j][3] >= top:
+                    parent[find(j)] = find(idx)
+            active.append(idx)
+
+        groups: Dict[int, List[int]] = {}
+        for idx in order:
+            groups.setdefault(find(idx), []).append(idx)
+        return list(groups.values())
+
+    def degraded(self, idx: int) -> bool:
+        """探索予算切れの代替経路か"""
+        return self.paths.get(idx) is not None and self.sources.get(idx) in _DEGRADED_SOURCES
+
+    def penalised(self, idx: int) -> bool:
+        """経路がない・代替経路である、または他の確定済みエッジとの重なり・交差ペナルティがあるか"""
+        current = self.paths.get(idx)
+        if current is None or self.degraded(idx):
+            return True
+        src_port, dst_port = self.ports(idx)
+        return bool(_soft_path_cost([src_port, *current, dst_port], self.segments_except(idx)))
+
+    def segments_except(self, idx: int) -> List[Tuple[int, int, int, int]]:
+        """idx 以外の確定済みエッジの線分"""
+        return [seg for j, segs in self.segments_map.items() if j != idx for seg in segs]
+
+    def commit(
+        self,
+        idx: int,
+        waypoints: Optional[List[Tuple[int, int]]],
+        source: str,
+        route_pass: Optional[str] = None,
+        cost: Optional[float] = None
+    ):
+        """経路を確定し、既存線(soft obstacle)として登録する。
+
+        waypoints が None(経路なし)の場合、source は失敗理由として扱う。
+        route_pass は経路を決めたパス('route' | 'refine' | 'kept')で、
+        省略時は前回の値を残す。cost を省略すると他の確定済みエッジに対するコストを計算する。
+        """
+        if route_pass is not None:
+            self.passes[idx] = route_pass
+        self.paths[idx] = waypoints
+        if waypoints is None:
+            self.sources[idx] = ''
+            self.reasons[idx] = source or 'no-orthogonal-path'
+            self.segments_map.pop(idx, None)
+            return
+        self.sources[idx] = source
+        if source in _DEGRADED_SOURCES:
+            self.reasons[idx] = 'search-budget'
+        else:
+            self.reasons.pop(idx, None)
+        src_port, dst_port = self.ports(idx)
+        points = [src_port, *waypoints, dst_port]
+        if cost is None:
+            cost = _path_cost(points, self.segments_except(idx))
+        self.stats_for(idx).cost = cost
+        self.segments_map[idx] = _segments_from_points(points)
+
+
 class EdgeRouter:
     """エッジ経路計算"""
 
@@ -427,7 +1551,19 @@ class EdgeRouter:
     def route(
         nodes: List[RouteNode],
         edges: List[RouteEdge],
-        padding: int = 12
+        padding: int = 12,
+        fast_path: bool = False,
+        cache: Optional[RouteCache] = None,
+        refine_rounds: int = 3,
+        workers: int = 1,
+        refine_mode: str = "serial",
+        coarse_cell: int = 0,
+        max_grid_points: Optional[int] = None,
+        hub_min_edges: int = 0,
+        nudge: bool = False,
+        max_expansions: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        collapse_parallel: bool = False
     ) -> List[RouteResult]:
         """各エッジのルート(始点・終点・進入辺・waypoints)を返す。
 
@@ -435,16 +1571,215 @@ class EdgeRouter:
             nodes: 配置済みノード
             edges: ルーティング対象エッジ
             padding: 障害物との余白(px)
+            fast_path: True なら A* の前に直線・L字の経路を試し、A* の下界と同じコストなら採用する。
+                どの経路を採用したかは RouteResult.route_source に記録される。
+                採用される経路は最適だが A* とは同コストの別経路になりうるため、
+                後続のエッジ・リファインメントの探索がかえって増えることが多く、既定では無効
+            cache: A* の探索結果を再利用する RouteCache(省略時はキャッシュしない)
+            refine_rounds: リファインメントの最大ラウンド数(0 でリファインメントなし)
+            workers: 2 以上なら、範囲が重ならないエッジのバッチを
+                プロセスプールで並列に経路探索する(Pass 3)。
+                バッチをまたぐ重なり・交差はリファインメントで解消する
+            refine_mode: リファインメントの方式。"serial" は1本ずつ引き直して即反映、
+                "jacobi" はラウンドごとに全対象を固定した経路に対して引き直し
+                (workers > 1 なら並列)、順にコストを再確認して採用する
+            coarse_cell: 1以上なら、まずこのサイズ(px)のセルに分けた粗いグリッドで
+                障害物の密度を避ける通路を探し、詳細な A* はその通路内だけで行う
+                (通路内で見つからなければ全体を探索する)。巨大な図向け
+            max_grid_points: 1回の A* の候補座標グリッドの点数の上限。
+                超えたエッジは route_reason="grid-limit" で失敗扱いにする
+            hub_min_edges: 1以上なら、1つの辺にこの本数以上のエッジが接続するノード(ハブ)の
+                エッジ群で候補座標グリッドとハブ側出口からの距離場を共有し、
+                距離場をヒューリスティックにした A* で探索する(workers による並列探索では使わない)
+            nudge: True なら経路確定後、同じ座標で重なる平行な中間セグメントを
+                別々のレーンにずらす(リファインメントの前に行う。
+                refine_rounds=0 と組み合わせるとリファインメントの代わりになる)
+            max_expansions: 1エッジの探索で展開する状態数の上限
+            time_limit: 1エッジの探索時間の上限(秒)。
+                上限を超えたエッジは、探索途中で最もゴールに近づいた経路を L字でつないだ経路
+                (干渉する場合は直線)を route_status="degraded", route_reason="search-budget" で返す
+            collapse_parallel: True なら同じノードペアを結ぶ並列エッジをまとめ、
+                代表エッジ(番号が最小のもの)だけ経路探索して、その経路(幹)を
+                ポート間隔ぶん平行にずらしたレーンを残りのエッジに使う(route_source="lane")。
+                ずらすと障害物と干渉するエッジは個別に探索する
 
         Returns:
             edges と同じ順序の RouteResult リスト。
             同一ノードペアの並列エッジも個別のポート位置を持つ。
             経路が見つからない場合は waypoints=[] (直線フォールバック)。
         """
-        rect_map: Dict[str, Tuple[int, int, int, int]] = {
-            n.node_id: (n.x, n.y, n.width, n.height) for n in nodes
-        }
+        if refine_mode not in ("serial", "jacobi"):
+            raise ValueError(f'unknown refine_mode: {refine_mode!r}')
+        options = _SearchOptions(
+            fast_path, coarse_cell, max_grid_points, max_expansions, time_limit
+        )
+        plan = EdgeRouter._plan(nodes, edges, padding, options, cache, hub_min_edges, collapse_parallel)
+        order = plan.leaders(plan.route_order)
+        EdgeRouter._route_pass(plan, order, workers)
+        if nudge:
+            EdgeRouter._nudge_pass(plan, order)
+        EdgeRouter._refine_pass(plan, order, refine_rounds, refine_mode, workers)
+        return EdgeRouter._results(plan)
+
+    @staticmethod
+    def reroute(
+        nodes: List[RouteNode],
+        edges: List[RouteEdge],
+        previous: List[RouteResult],
+        moved: Dict[str, Tuple[int, int, int, int]],
+        padding: int = 12,
+        fast_path: bool = False,
+        cache: Optional[RouteCache] = None,
+        refine_rounds: int = 3,
+        workers: int = 1,
+        refine_mode: str = "serial",
+        coarse_cell: int = 0,
+        max_grid_points: Optional[int] = None,
+        hub_min_edges: int = 0,
+        nudge: bool = False,
+        max_expansions: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        collapse_parallel: bool = False
+    ) -> List[RouteResult]:
+        """一部のノードが移動した後、影響を受けるエッジだけを引き直す。
+
+        引き直し対象は、移動ノードに接続するエッジ、現在の経路が移動ノードの
+        旧矩形・新矩形(padding込み)を横切るエッジ、ポート位置や進入辺が
+        変わったエッジ。それ以外のエッジは previous の経路とポートをそのまま使う。
+
+        Args:
+            nodes: 配置済みノード(移動後)
+            edges: ルーティング対象エッジ(previous と同じ順序)
+            previous: 前回の route()/reroute() の結果
+            moved: 移動したノードID → 移動前の矩形 (x, y, width, height)
+            padding: 障害物との余白(px)
+            fast_path, cache, refine_rounds, workers, refine_mode,
+            coarse_cell, max_grid_points, hub_min_edges, nudge,
+            max_expansions, time_limit, collapse_parallel: route() と同じ
+
+        Returns:
+            edges と同じ順序の RouteResult リスト。
+        """
+        if refine_mode not in ("serial", "jacobi"):
+            raise ValueError(f'unknown refine_mode: {refine_mode!r}')
+        if len(previous) != len(edges):
+            return EdgeRouter.route(
+                nodes, edges, padding, fast_path, cache, refine_rounds,
+                workers=workers, refine_mode=refine_mode,
+                coarse_cell=coarse_cell, max_grid_points=max_grid_points,
+                hub_min_edges=hub_min_edges, nudge=nudge,
+                max_expansions=max_expansions, time_limit=time_limit,
+                collapse_parallel=collapse_parallel
+            )
+
+        options = _SearchOptions(
+            fast_path, coarse_cell, max_grid_points, max_expansions, time_limit
+        )
+        plan = EdgeRouter._plan(nodes, edges, padding, options, cache, hub_min_edges, collapse_parallel)
+        rect_map = {n.node_id: (n.x, n.y, n.width, n.height) for n in nodes}
+        moved_rects = list(moved.values())
+        moved_rects.extend(rect_map[nid] for nid in moved if nid in rect_map)
+
+        # 並列エッジの終点側ポートはレーン順に割り当て直されているので、
+        # 同じポート位置の組み合わせなら前回の割り当てを引き継ぐ
+        for leader, members in plan.trunks.items():
+            for end in (0, 1):
+                keys = [plan.trunk_ends(leader, idx)[end] for idx in members]
+                prev_ports = [
+                    previous[idx].from_point if role == 'src' else previous[idx].to_point
+                    for idx, role in keys
+                ]
+                if sorted(prev_ports) == sorted(plan.port_assignment[key] for key in keys):
+                    plan.port_assignment.update(zip(keys, prev_ports))
+
+        affected = set()
+        kept = []
+        for idx in plan.route_order:
+            info = plan.edge_info[idx]
+            prev = previous[idx]
+            src_port, dst_port = plan.ports(idx)
+            if (
+                info['src_id'] in moved or info['dst_id'] in moved
+                or prev.from_point != src_port or prev.to_point != dst_port
+                or prev.from_side != info['src_side'] or prev.to_side != info['dst_side']
+            ):
+                affected.add(idx)
+                continue
+            # 失敗していた経路も、直線フォールバックが移動前後の矩形を横切るなら引き直す
+            segments = _segments_from_points([src_port, *prev.waypoints, dst_port])
+            if any(
+                _segment_intersects_rect(*seg, *rect, padding=padding)
+                for seg in segments for rect in moved_rects
+            ):
+                affected.add(idx)
+                continue
+            kept.append(idx)
+
+        # 並列エッジは1本でも引き直すならまとめて引き直す
+        for members in plan.trunks.values():
+            if any(idx in affected for idx in members):
+                affected.update(members)
+        for idx in kept:
+            if idx in affected:
+                continue
+            prev = previous[idx]
+            if prev.route_status == "failed":
+                plan.commit(idx, None, prev.route_reason, 'kept')
+            else:
+                plan.commit(idx, list(prev.waypoints), prev.route_source, 'kept', prev.cost)
+
+        order = plan.leaders([idx for idx in plan.route_order if idx in affected])
+        EdgeRouter._route_pass(plan, order, workers)
+        if nudge:
+            EdgeRouter._nudge_pass(plan, order)
+        EdgeRouter._refine_pass(plan, order, refine_rounds, refine_mode, workers)
+        return EdgeRouter._results(plan)
+
+    @staticmethod
+    def assign_ports(nodes: List[RouteNode], edges: List[RouteEdge]) -> List[RouteResult]:
+        """経路探索をせず、各エッジの進入辺とポート位置だけを決める(Pass 1〜2)。
+
+        描画側(draw.io の orthogonalEdgeStyle など)に経路計算を任せる場合に使う。
+        ポート位置と進入辺は route() と同じ。
 
+        Returns:
+            edges と同じ順序の RouteResult リスト(waypoints は常に空)。
+            ノードが見つからないエッジは route_status="failed", route_reason="missing-node"
+        """
+        rect_map = {n.node_id: (n.x, n.y, n.width, n.height) for n in nodes}
+        edge_info, port_assignment, _ = EdgeRouter._assign_ports(rect_map, edges)
+        result: List[RouteResult] = []
+        for idx, info in enumerate(edge_info):
+            if info is None:
+                result.append(RouteResult(
+                    from_point=(0, 0), to_point=(0, 0),
+                    from_side='right', to_side='left', waypoints=[],
+                    route_status="failed",
+                    route_reason="missing-node"
+                ))
+                continue
+            result.append(RouteResult(
+                from_point=port_assignment[(idx, 'src')],
+                to_point=port_assignment[(idx, 'dst')],
+                from_side=info['src_side'],
+                to_side=info['dst_side']
+            ))
+        return result
+
+    @staticmethod
+    def _assign_ports(
+        rect_map: Dict[str, Tuple[int, int, int, int]],
+        edges: List[RouteEdge]
+    ) -> Tuple[
+        List[Optional[Dict]],
+        Dict[Tuple[int, str], Tuple[int, int]],
+        Dict[Tuple[str, str], List[Tuple[int, str, Tuple[float, float]]]]
+    ]:
+        """Pass 1〜2: 進入辺とポート位置を決める。
+
+        Returns:
+            (エッジごとの情報, (エッジ番号, 'src'|'dst') → ポート位置, (node, side) → 接続エッジ)
+        """
         # Pass 1: 各エッジの両端の進入辺(side)を決定し、相手中心位置を記録
         edge_info: List[Dict | None] = []
         for edge in edges:
@@ -485,8 +1820,25 @@ class EdgeRouter:
             for i, (edge_idx, role, _) in enumerate(entries):
                 ratio = (i + 1) / (n + 1)
                 port_assignment[(edge_idx, role)] = _port_at(rect, side, ratio)
+        return edge_info, port_assignment, groups
 
-        # Pass 3: ポート間距離が短いエッジから順に経路探索する。
+    @staticmethod
+    def _plan(
+        nodes: List[RouteNode],
+        edges: List[RouteEdge],
+        padding: int,
+        options: _SearchOptions,
+        cache: Optional[RouteCache],
+        hub_min_edges: int = 0,
+        collapse_parallel: bool = False
+    ) -> _RoutingPlan:
+        """Pass 1〜2: 進入辺とポート位置を決め、経路確定順と障害物を用意する"""
+        rect_map: Dict[str, Tuple[int, int, int, int]] = {
+            n.node_id: (n.x, n.y, n.width, n.height) for n in nodes
+        }
+        edge_info, port_assignment, groups = EdgeRouter._assign_ports(rect_map, edges)
+
+        # ポート間距離が短いエッジから順に経路を確定する。
         # 交差ペナルティは先に引かれた線に対してしか働かないため、
         # 引く順序が交差数に影響する。短い線を先に確定すると、
         # 後から引く長い線が迂回して交差を避けやすい。
@@ -507,49 +1859,367 @@ class EdgeRouter:
                 if nid != info['src_id'] and nid != info['dst_id']
             ]
 
-        paths: Dict[int, Optional[List[Tuple[int, int]]]] = {}
-        segments_map: Dict[int, List[Tuple[int, int, int, int]]] = {}
-        for idx in route_order:
-            info = edge_info[idx]
-            src_port = port_assignment[(idx, 'src')]
-            dst_port = port_assignment[(idx, 'dst')]
-            existing = [seg for segs in segments_map.values() for seg in segs]
-            waypoints = _choose_path(
-                src_port, dst_port,
-                info['src_side'], info['dst_side'],
-                obstacles_map[idx], padding, existing
+        # ハブ: 1つの辺に hub_min_edges 本以上のエッジが接続する (node, side)。
+        # 両端がハブのエッジは接続数の多い方のグループに属させる
+        hub_groups: Dict[int, _HubGroup] = {}
+        if hub_min_edges > 0:
+            hubs = sorted(
+                ((key, entries) for key, entries in groups.items() if len(entries) >= hub_min_edges),
+                key=lambda item: -len(item[1])
             )
-            paths[idx] = waypoints
-            if waypoints is not None:
-                segments_map[idx] = _segments_from_points([src_port, *waypoints, dst_port])
-
-        # Pass 4: リファインメント。Pass 3 では先行エッジしか考慮できないため、
-        # 全エッジ確定後に「他の全エッジ」を既存線として各エッジを引き直し、
-        # コストが下がる場合のみ採用する(無条件採用は悪化し得る)。
-        for idx in route_order:
-            info = edge_info[idx]
-            src_port = port_assignment[(idx, 'src')]
-            dst_port = port_assignment[(idx, 'dst')]
-            others = [seg for j, segs in segments_map.items() if j != idx for seg in segs]
-            rerouted = _choose_path(
-                src_port, dst_port,
-                info['src_side'], info['dst_side'],
-                obstacles_map[idx], padding, others
+            for (node_id, _), entries in hubs:
+                members = []
+                for edge_idx, role, _ in entries:
+                    if edge_idx not in hub_groups and all(edge_idx != m for m, _ in members):
+                        members.append((edge_idx, role))
+                if len(members) < hub_min_edges:
+                    continue
+                group = _HubGroup(members, [r for nid, r in rect_map.items() if nid != node_id])
+                for edge_idx, _ in members:
+                    hub_groups[edge_idx] = group
+
+        # 並列エッジ: 同じノードペア(向きは問わない)を結ぶエッジを番号順にまとめる
+        trunks: Dict[int, List[int]] = {}
+        if collapse_parallel:
+            pairs: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+            for idx in routable:
+                info = edge_info[idx]
+                if info['src_id'] != info['dst_id']:
+                    pairs[tuple(sorted((info['src_id'], info['dst_id'])))].append(idx)
+            trunks = {members[0]: members for members in pairs.values() if len(members) > 1}
+
+        return _RoutingPlan(
+            edge_info, port_assignment, obstacles_map, route_order,
+            padding=padding, options=options, cache=cache, hub_groups=hub_groups, trunks=trunks
+        )
+
+    @staticmethod
+    def _route_pass(plan: _RoutingPlan, order: List[int], workers: int = 1):
+        """Pass 3: order の順に、確定済みの経路を既存線として経路探索する"""
+        if workers > 1:
+            batches = plan.batches(order)
+            if len(batches) > 1:
+                EdgeRouter._route_batches(plan, order, batches, workers)
+                return
+        for idx in order:
+            existing = [seg for segs in plan.segments_map.values() for seg in segs]
+            waypoints, source = plan.choose(idx, existing)
+            EdgeRouter._commit_trunk(plan, idx, waypoints, source, 'route')
+
+    @staticmethod
+    def _route_batches(plan: _RoutingPlan, order: List[int], batches: List[List[int]], workers: int):
+        """Pass 3 の並列版: 互いに独立なバッチをプロセスプールで経路探索する。
+
+        各バッチには、範囲内にある確定済みの線だけを既存線として渡す。
+        結果は order(短い順)で確定するので、ワーカー数や完了順に依らず同じ結果になる。
+        RouteCache はプロセス間で共有できないため、このパスでは使わない。
+        """
+        committed = [seg for segs in plan.segments_map.values() for seg in segs]
+        routed: Dict[int, Tuple[Optional[List[Tuple[int, int]]], str]] = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            # 大きいバッチから投入して、ワーカー間の負荷の偏りを減らす
+            for batch in sorted(batches, key=len, reverse=True):
+                regions = [plan.region(idx) for idx in batch]
+                window = (
+                    min(r[0] for r in regions), min(r[1] for r in regions),
+                    max(r[2] for r in regions), max(r[3] for r in regions),
+                )
+                existing = [
+                    seg for seg in committed
+                    if min(seg[0], seg[2]) <= window[2] and max(seg[0], seg[2]) >= window[0]
+                    and min(seg[1], seg[3]) <= window[3] and max(seg[1], seg[3]) >= window[1]
+                ]
+                tasks = []
+                for idx in batch:
+                    info = plan.edge_info[idx]
+                    src_port, dst_port = plan.ports(idx)
+                    tasks.append((
+                        idx, src_port, dst_port, info['src_side'], info['dst_side'],
+                        plan.obstacles_map[idx]
+                    ))
+                futures.append(executor.submit(
+                    _route_batch, tasks, existing, plan.padding, plan.options
+                ))
+            for future in futures:
+                for idx, waypoints, source, stats in future.result():
+                    routed[idx] = (waypoints, source)
+                    plan.stats_for(idx).merge(stats)
+        for idx in order:
+            EdgeRouter._commit_trunk(plan, idx, *routed[idx], 'route')
+
+    @staticmethod
+    def _commit_trunk(
+        plan: _RoutingPlan,
+        idx: int,
+        waypoints: Optional[List[Tuple[int, int]]],
+        source: str,
+        route_pass: str,
+        cost: Optional[float] = None
+    ):
+        """経路を確定する。idx が並列エッジの代表なら、その経路をずらして残りのエッジも確定する。
+
+        幹がない(失敗・代替経路)場合や、ずらすと干渉するエッジは個別に探索する。
+        """
+        members = plan.trunks.get(idx)
+        if members is None:
+            plan.commit(idx, waypoints, source, route_pass, cost)
+            return
+        ends: Dict[Tuple[int, str], Tuple[int, int]] = {}
+        lanes: Dict[int, Optional[List[Tuple[int, int]]]] = {}
+        if waypoints is not None and source not in _DEGRADED_SOURCES:
+            ends, lanes = plan.lanes(idx, waypoints)
+        if lanes and None in lanes.values():
+            # 幹が障害物に沿っているとレーンが収まらないので、
+            # 障害物をレーンの幅だけ広げて幹を探し直し、収まるレーンが増えれば採用する
+            others = [seg for j, segs in plan.segments_map.items() if j not in members for seg in segs]
+            widened, widened_source = plan.choose(idx, others, widen=plan.lane_spread(idx))
+            if widened is not None and widened_source not in _DEGRADED_SOURCES:
+                widened_ends, widened_lanes = plan.lanes(idx, widened)
+                fitted = sum(1 for lane in lanes.values() if lane is not None)
+                if sum(1 for lane in widened_lanes.values() if lane is not None) > fitted:
+                    source, ends, lanes = widened_source, widened_ends, widened_lanes
+        plan.port_assignment.update(ends)
+        for member in members:
+            lane = lanes.get(member)
+            if lane is not None:
+                plan.commit(member, lane, source if member == idx else 'lane', route_pass)
+            elif member == idx and not lanes:
+                plan.commit(idx, waypoints, source, route_pass, cost)
+            else:
+                plan.commit(member, *plan.choose(member, plan.segments_except(member)), route_pass)
+
+    @staticmethod
+    def _nudge_pass(plan: _RoutingPlan, order: List[int]):
+        """Pass 3.5: ナッジング。
+
+        全エッジの線分を (軸, 座標) ごとのレーンに、区間の開始位置順で集め、
+        重なる線分の塊をスイープで求める。塊に複数のエッジが含まれていれば、
+        order に含まれるエッジの中間セグメント(両端が waypoint のもの)を
+        gap 間隔のレーンへ順にずらす。次の場合だけ採用する:
+        - 前後のセグメントの向きが変わらない
+        - 障害物と干渉しない
+        - 移動先のレーンで他のエッジの線分と重ならない
+        - 伸び縮みする前後のセグメントで、他のエッジとの重なりが増えない
+        採用したらそのエッジの区間をレーンから入れ替えるので、以降の塊は最新の経路で求める。
+
+        グループ化とソートは O(S log S)。ずらす候補の判定は、レーン内で
+        区間の開始位置が候補の終点より前にある線分を走査するため、最悪でレーンの線分数に比例する。
+        """
+        gap = max(6, plan.padding // 2)
+        movable = set(order)
+        rank = {idx: i for i, idx in enumerate(plan.route_order)}
+        # (軸, 座標) → 開始位置順の [(区間の始点, 終点, エッジ番号, セグメント番号)]
+        lanes: Dict[Tuple[str, int], List[Tuple[int, int, int, int]]] = defaultdict(list)
+        # エッジ番号 → そのエッジがレーンに登録している (キー, 区間)
+        edge_entries: Dict[int, List[Tuple[Tuple[str, int], Tuple[int, int, int, int]]]] = {}
+
+        def lane_entry(idx: int, k: int, segment: Tuple[int, int, int, int]):
+            x1, y1, x2, y2 = segment
+            direction = _segment_direction(x1, y1, x2, y2)
+            if direction == 'h':
+                return ('h', y1), (min(x1, x2), max(x1, x2), idx, k)
+            if direction == 'v':
+                return ('v', x1), (min(y1, y2), max(y1, y2), idx, k)
+            return None
+
+        def register(idx: int):
+            entries = []
+            for k, segment in enumerate(plan.segments_map.get(idx, [])):
+                item = lane_entry(idx, k, segment)
+                if item is not None:
+                    bisect.insort(lanes[item[0]], item[1])
+                    entries.append(item)
+            edge_entries[idx] = entries
+
+        def unregister(idx: int):
+            for key, entry in edge_entries.pop(idx, []):
+                lanes[key].remove(entry)
+
+        for idx in plan.route_order:
+            register(idx)
+
+        def overlap(key: Tuple[str, int], lo: int, hi: int, idx: int) -> int:
+            """レーン key で区間 [lo, hi] が他のエッジの線分と重なる長さの合計"""
+            entries = lanes.get(key, ())
+            end = bisect.bisect_left(entries, (hi,))
+            return sum(
+                _overlap_length(lo, hi, a, b)
+                for a, b, other, _ in entries[:end] if other != idx and b > lo
             )
-            if rerouted is None:
-                continue
-            current = paths[idx]
-            if current is not None:
-                new_cost = _path_cost([src_port, *rerouted, dst_port], others)
-                old_cost = _path_cost([src_port, *current, dst_port], others)
-                if new_cost >= old_cost:
+
+        def span(points: List[Tuple[int, int]], j: int, axis: int) -> Tuple[Tuple[str, int], int, int]:
+            """セグメント j(axis 方向に垂直な線分)のレーンキーと区間"""
+            a, b = points[j], points[j + 1]
+            return (
+                ('h' if axis == 1 else 'v', a[axis]),
+                min(a[1 - axis], b[1 - axis]),
+                max(a[1 - axis], b[1 - axis]),
+            )
+
+        def shift(idx: int, k: int, offset: int) -> bool:
+            waypoints = plan.paths[idx]
+            src_port, dst_port = plan.ports(idx)
+            points = [src_port, *waypoints, dst_port]
+            if not 0 < k < len(points) - 2:
+                return False
+            axis = 1 if points[k][1] == points[k + 1][1] else 0
+            moved = list(points)
+            for i in (k, k + 1):
+                p = list(moved[i])
+                p[axis] += offset
+                moved[i] = (p[0], p[1])
+            # 前後のセグメントが消えたり逆向きになったりしないこと
+            for a, b in ((k - 1, k), (k + 1, k + 2)):
+                before = points[b][axis] - points[a][axis]
+                after = moved[b][axis] - moved[a][axis]
+                if after == 0 or (before > 0) != (after > 0):
+                    return False
+            if overlap(*span(moved, k, axis), idx) > 0:
+                return False
+            # 前後のセグメントは向きが逆の軸で、長さだけが変わる
+            for j in (k - 1, k + 1):
+                if overlap(*span(moved, j, 1 - axis), idx) > overlap(*span(points, j, 1 - axis), idx):
+                    return False
+            if not _path_clear(moved, plan.obstacles_map[idx], plan.padding):
+                return False
+            unregister(idx)
+            plan.commit(idx, moved[1:-1], plan.sources[idx])
+            register(idx)
+            return True
+
+        def spread(key: Tuple[str, int], cluster: List[Tuple[int, int, int, int]]):
+            if len({idx for _, _, idx, _ in cluster}) < 2:
+                return
+            members = sorted(cluster, key=lambda e: rank[e[2]])
+            if all(e[2] in movable for e in members):
+                # 1本目はその場に残し、残りをずらす
+                members = members[1:]
+            for entry in members:
+                idx, k = entry[2], entry[3]
+                # 同じ塊の処理中に経路が変わった線分は対象外
+                if idx not in movable or (key, entry) not in edge_entries.get(idx, ()):
+                    continue
+                for step in range(1, len(cluster) + 1):
+                    if shift(idx, k, step * gap) or shift(idx, k, -step * gap):
+                        break
+
+        for key in sorted(lanes):
+            cluster: List[Tuple[int, int, int, int]] = []
+            reach = 0
+            for entry in list(lanes[key]):
+                if cluster and entry[0] < reach:
+                    cluster.append(entry)
+                    reach = max(reach, entry[1])
                     continue
-            paths[idx] = rerouted
-            segments_map[idx] = _segments_from_points([src_port, *rerouted, dst_port])
+                spread(key, cluster)
+                cluster = [entry]
+                reach = entry[1]
+            spread(key, cluster)
 
-        # 結果を edges と同じ順序で組み立てる
+    @staticmethod
+    def _refine_pass(
+        plan: _RoutingPlan,
+        order: List[int],
+        max_rounds: int,
+        mode: str = "serial",
+        workers: int = 1
+    ):
+        """Pass 4: リファインメント。
+
+        Pass 3 では先行エッジしか考慮できないため、全エッジ確定後に
+        「他の全エッジ」を既存線として引き直し、コストが下がる場合のみ
+        採用する(無条件採用は悪化し得る)。
+        引き直すのは重なり・交差ペナルティが残っているエッジだけで、
+        経路が変わったエッジと干渉するエッジは次のラウンドで再評価する。
+
+        mode="serial" では1本ずつ引き直して即座に反映する。
+        mode="jacobi" ではラウンド開始時点の経路を固定して対象エッジを
+        まとめて(workers > 1 ならプロセスプールで並列に)引き直し、
+        order の順に現在の経路に対するコストを再計算して、下がるものだけ採用する。
+        """
+        candidates = set(order)
+        # 初回は経路なし(失敗)のエッジも一度だけ再探索する
+        dirty = set(order)
+        for _ in range(max_rounds):
+            pending = [idx for idx in order if idx in dirty]
+            proposals = None
+            if mode == "jacobi":
+                pending = [idx for idx in pending if plan.penalised(idx)]
+                proposals = EdgeRouter._propose_routes(plan, pending, workers)
+            next_dirty = set()
+            for idx in pending:
+                if proposals is not None:
+                    rerouted, source = proposals[idx]
+                elif plan.penalised(idx):
+                    rerouted, source = plan.choose(idx, plan.segments_except(idx))
+                else:
+                    # ペナルティ 0 の経路は引き直しても改善しない
+                    continue
+                if rerouted is None:
+                    continue
+                current = plan.paths[idx]
+                if current is not None and source in _DEGRADED_SOURCES:
+                    # 予算切れの代替経路では既存の経路を置き換えない
+                    continue
+                # 現在の経路が代替経路なら、探索で見つかった経路で無条件に置き換える
+                new_cost = None
+                if current is not None and not plan.degraded(idx):
+                    src_port, dst_port = plan.ports(idx)
+                    others = plan.segments_except(idx)
+                    new_cost = _path_cost([src_port, *rerouted, dst_port], others)
+                    old_cost = _path_cost([src_port, *current, dst_port], others)
+                    if new_cost >= old_cost:
+                        continue
+                old_segments = plan.segments_map.get(idx, [])
+                EdgeRouter._commit_trunk(plan, idx, rerouted, source, 'refine', new_cost)
+                changed_segments = old_segments + plan.segments_map.get(idx, [])
+                for j in candidates:
+                    if j != idx and j in plan.segments_map and _segments_interact(
+                        plan.segments_map[j], changed_segments
+                    ):
+                        next_dirty.add(j)
+            dirty = next_dirty
+            if not dirty:
+                break
+
+    @staticmethod
+    def _propose_routes(
+        plan: _RoutingPlan,
+        targets: List[int],
+        workers: int
+    ) -> Dict[int, Tuple[Optional[List[Tuple[int, int]]], str]]:
+        """現在の確定経路を固定したまま、targets の各エッジを他の全エッジに対して引き直す"""
+        if workers <= 1 or len(targets) <= 1:
+            return {idx: plan.choose(idx, plan.segments_except(idx)) for idx in targets}
+
+        snapshot = dict(plan.segments_map)
+        proposals: Dict[int, Tuple[Optional[List[Tuple[int, int]]], str]] = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for offset in range(min(workers, len(targets))):
+                tasks = []
+                for idx in targets[offset::workers]:
+                    info = plan.edge_info[idx]
+                    src_port, dst_port = plan.ports(idx)
+                    tasks.append((
+                        idx, src_port, dst_port, info['src_side'], info['dst_side'],
+                        plan.obstacles_map[idx]
+                    ))
+                futures.append(executor.submit(
+                    _reroute_batch, tasks, snapshot, plan.padding, plan.options
+                ))
+            for future in futures:
+                for idx, waypoints, source, stats in future.result():
+                    proposals[idx] = (waypoints, source)
+                    plan.stats_for(idx).merge(stats)
+        return proposals
+
+    @staticmethod
+    def _results(plan: _RoutingPlan) -> List[RouteResult]:
+        """結果を edges と同じ順序で組み立てる"""
         result: List[RouteResult] = []
-        for idx, info in enumerate(edge_info):
+        for idx, info in enumerate(plan.edge_info):
             if info is None:
                 # 不正なエッジ: ダミーの結果を返す(呼び出し側で扱う)
                 result.append(RouteResult(
@@ -560,14 +2230,27 @@ class EdgeRouter:
                 ))
                 continue
 
-            waypoints = paths[idx]
+            waypoints = plan.paths[idx]
+            src_port, dst_port = plan.ports(idx)
+            stats = plan.stats_for(idx)
             result.append(RouteResult(
-                from_point=port_assignment[(idx, 'src')],
-                to_point=port_assignment[(idx, 'dst')],
+                from_point=src_port,
+                to_point=dst_port,
                 from_side=info['src_side'],
                 to_side=info['dst_side'],
                 waypoints=waypoints if waypoints is not None else [],
-                route_status="ok" if waypoints is not None else "failed",
-                route_reason="" if waypoints is not None else "no-orthogonal-path"
+                route_status=(
+                    "failed" if waypoints is None
+                    else "degraded" if plan.degraded(idx) else "ok"
+                ),
+                route_reason=plan.reasons.get(idx, ""),
+                route_source=plan.sources[idx],
+                route_pass=plan.passes.get(idx, ""),
+                grid_points=stats.grid_points,
+                blocked_points=stats.blocked_points,
+                expansions=stats.expansions,
+                peak_heap=stats.peak_heap,
+                wall_time=stats.wall_time,
+                cost=stats.cost
             ))
         return result
@@ -0,0 +1,62 @@
+"""矩形の空間索引
+
+キャンバスを一辺 cell_size の格子に分け、各マスに重なる要素の番号を持つ。
+ビューポートやタイルに重なる要素を、全要素を走査せずに取り出すのに使う。
+1つの要素に複数の矩形(エッジの各線分など)を登録できる。
+"""
+from typing import Dict, List, Set, Tuple
+
+# (left, top, right, bottom)
+Box = Tuple[float, float, float, float]
+
+
+def _boxes_overlap(a: Box, b: Box) -> bool:
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+class SpatialIndex:
+    """一様格子による矩形索引"""
+
+    def __init__(self, cell_size: int = 256):
+        """
+        Args:
+            cell_size: 格子の一辺(px)
+        """
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, Box]]] = {}
+        # 登録済みのマスの範囲(広すぎる検索範囲を切り詰める)
+        self._extent = [0, 0, -1, -1]
+
+    def _cell_range(self, box: Box):
+        size = self.cell_size
+        return (
+            range(int(box[0] // size), int(box[2] // size) + 1),
+            range(int(box[1] // size), int(box[3] // size) + 1),
+        )
+
+    def insert(self, item: int, box: Box):
+        """要素番号 item の矩形を登録する"""
+        columns, rows = self._cell_range(box)
+        if self._cells:
+            extent = self._extent
+            extent[0] = min(extent[0], columns.start)
+            extent[1] = min(extent[1], rows.start)
+            extent[2] = max(extent[2], columns.stop - 1)
+            extent[3] = max(extent[3], rows.stop - 1)
+        else:
+            self._extent = [columns.start, rows.start, columns.stop - 1, rows.stop - 1]
+        for i in columns:
+            for j in rows:
+                self._cells.setdefault((i, j), []).append((item, box))
+
+    def query(self, rect: Box) -> List[int]:
+        """rect と重なる矩形を持つ要素番号を昇順で返す(境界で接する場合も含む)"""
+        found: Set[int] = set()
+        columns, rows = self._cell_range(rect)
+        left, top, right, bottom = self._extent
+        for i in range(max(columns.start, left), min(columns.stop, right + 1)):
+            for j in range(max(rows.start, top), min(rows.stop, bottom + 1)):
+                for item, box in self._cells.get((i, j), ()):
+                    if item not in found and _boxes_overlap(box, rect):
+                        found.add(item)
+        return sorted(found)
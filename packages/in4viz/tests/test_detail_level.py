@@ -0,0 +1,62 @@
+from in4viz import DetailLevel
+from in4viz.backends.drawio import DrawioERDiagram
+from in4viz.backends.svg import SVGERDiagram
+from in4viz.core.models import Column, Table
+
+
+def _table() -> Table:
+    return Table("orders", "注文", [
+        Column("id", "ID", "INT", primary_key=True),
+        Column("user_id", "ユーザーID", "INT", foreign_key=True),
+        Column("memo", "備考メモ欄", "TEXT"),
+        Column("amount", "金額", "INT"),
+    ])
+
+
+def _size(diagram, node_id="orders"):
+    node = diagram.get_node(node_id)
+    return node.width, node.height
+
+
+def test_detail_levels_shrink_svg_tables():
+    sizes = {}
+    outputs = {}
+    for level in DetailLevel:
+        diagram = SVGERDiagram(detail_level=level)
+        diagram.add_table(_table())
+        sizes[level] = _size(diagram)
+        outputs[level] = diagram.render_svg()
+
+    full, keys, header = sizes[DetailLevel.FULL], sizes[DetailLevel.KEYS], sizes[DetailLevel.HEADER]
+    assert full[1] > keys[1] > header[1] == 25
+    assert header[0] < full[0]
+    assert ">user_id<" in outputs[DetailLevel.KEYS] and ">memo<" not in outputs[DetailLevel.KEYS]
+    assert ">id<" not in outputs[DetailLevel.HEADER]
+
+
+def test_detail_level_override_keeps_outline_and_shares_cache():
+    full = SVGERDiagram()
+    full.add_table(_table())
+    node = full.get_node("orders")
+
+    fragment = node.fragment(detail_level=DetailLevel.HEADER)
+
+    assert ">id<" not in fragment
+    assert f'width="{node.width}" height="{node.height}"' in fragment
+
+    header = SVGERDiagram(detail_level=DetailLevel.HEADER)
+    header.add_table(_table())
+    node = header.get_node("orders")
+    # ステンシルと同じ詳細度の指定は、指定なしと同じ断片として扱う
+    assert node.fragment(detail_level=DetailLevel.HEADER) == node.fragment()
+    assert len(node._fragments) == 1
+
+
+def test_drawio_detail_level_matches_svg_geometry():
+    for level in DetailLevel:
+        svg = SVGERDiagram(detail_level=level)
+        drawio = DrawioERDiagram(detail_level=level)
+        svg.add_table(_table())
+        drawio.add_table(_table())
+
+        assert _size(svg) == _size(drawio)
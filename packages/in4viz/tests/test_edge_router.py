@@ -0,0 +1,556 @@
+from dataclasses import dataclass
+
+import pytest
+
+from in4viz.backends.svg import SVGERDiagram
+from in4viz.core import routing
+from in4viz.core.models import LineType, Table
+from in4viz.core.route_cache import RouteCache
+from in4viz.core.routing import EdgeRouter
+
+
+@dataclass
+class RouteTestNode:
+    node_id: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass
+class RouteTestEdge:
+    from_node_id: str
+    to_node_id: str
+
+
+def _two_pairs():
+    nodes = [
+        RouteTestNode("a", 0, 0, 60, 40),
+        RouteTestNode("b", 200, 0, 60, 40),
+        RouteTestNode("c", 0, 400, 60, 40),
+        RouteTestNode("d", 200, 400, 60, 40),
+    ]
+    edges = [RouteTestEdge("a", "b"), RouteTestEdge("c", "d")]
+    return nodes, edges
+
+
+def _count_choose_path(monkeypatch):
+    calls = []
+    original = routing._choose_path
+
+    def counting(src_port, dst_port, *args, **kwargs):
+        calls.append((src_port, dst_port))
+        return original(src_port, dst_port, *args, **kwargs)
+
+    monkeypatch.setattr(routing, "_choose_path", counting)
+    return calls
+
+
+def test_refinement_skips_edges_without_penalties(monkeypatch):
+    nodes, edges = _two_pairs()
+    calls = _count_choose_path(monkeypatch)
+
+    EdgeRouter.route(nodes, edges)
+
+    # Pass 3 の 2 回のみ。重なり・交差のないエッジは引き直さない
+    assert len(calls) == 2
+
+
+def test_refinement_revisits_edges_with_crossings(monkeypatch):
+    nodes = [
+        RouteTestNode("left", 0, 100, 40, 40),
+        RouteTestNode("right", 300, 100, 40, 40),
+        RouteTestNode("top", 150, -100, 40, 40),
+        RouteTestNode("bottom", 150, 300, 40, 40),
+    ]
+    edges = [RouteTestEdge("left", "right"), RouteTestEdge("top", "bottom")]
+    calls = _count_choose_path(monkeypatch)
+
+    routes = EdgeRouter.route(nodes, edges)
+    without_refinement = len(calls)
+    calls.clear()
+    EdgeRouter.route(nodes, edges, refine_rounds=0)
+
+    assert all(route.route_status == "ok" for route in routes)
+    assert without_refinement > len(calls) == 2
+
+
+def test_reroute_only_touches_edges_of_moved_node(monkeypatch):
+    nodes, edges = _two_pairs()
+    previous = EdgeRouter.route(nodes, edges)
+
+    old_rect = (nodes[3].x, nodes[3].y, nodes[3].width, nodes[3].height)
+    nodes[3].y = 480
+    calls = _count_choose_path(monkeypatch)
+    routes = EdgeRouter.reroute(nodes, edges, previous, {"d": old_rect})
+
+    assert routes[0] == previous[0]
+    assert routes[1].to_point[1] > 480
+    assert calls and all(src[1] >= 400 for src, _ in calls)
+
+
+def test_reroute_includes_edges_crossing_new_position():
+    nodes, edges = _two_pairs()
+    previous = EdgeRouter.route(nodes, edges)
+
+    old_rect = (nodes[2].x, nodes[2].y, nodes[2].width, nodes[2].height)
+    # c を a-b 間の直線上に移動させると a-b も迂回が必要になる
+    nodes[2].x, nodes[2].y = 100, 0
+    routes = EdgeRouter.reroute(nodes, edges, previous, {"c": old_rect})
+
+    assert routes[0] != previous[0]
+    assert routes[0] == EdgeRouter.route(nodes, edges)[0]
+
+
+def test_reroute_retries_failed_edge_when_blocker_moves():
+    nodes = [
+        RouteTestNode("a", 0, 0, 50, 50),
+        RouteTestNode("b", 400, 60, 50, 50),
+        # b の進入面をふさぐ壁
+        RouteTestNode("w", 300, -200, 90, 450),
+    ]
+    edges = [RouteTestEdge("a", "b")]
+    previous = EdgeRouter.route(nodes, edges)
+    assert previous[0].route_status == "failed"
+
+    old_rect = (nodes[2].x, nodes[2].y, nodes[2].width, nodes[2].height)
+    nodes[2].x, nodes[2].y = 150, 400
+    routes = EdgeRouter.reroute(nodes, edges, previous, {"w": old_rect})
+
+    # 斜めの直線フォールバックが移動前の壁を横切るので引き直される
+    assert routes[0].route_status == "ok"
+    assert routes[0] == EdgeRouter.route(nodes, edges)[0]
+
+
+def test_segment_intersects_rect_handles_diagonal_fallback():
+    rect = (100, 100, 50, 50)
+
+    assert routing._segment_intersects_rect(0, 0, 300, 300, *rect, padding=0)
+    assert not routing._segment_intersects_rect(0, 200, 100, 300, *rect, padding=0)
+    # 角に接するだけなら交差としない
+    assert not routing._segment_intersects_rect(0, 200, 200, 0, *rect, padding=0)
+
+
+def test_svg_diagram_reroutes_incrementally_after_node_move(monkeypatch):
+    diagram = SVGERDiagram(default_line_type=LineType.ORTHOGONAL)
+    for name in ("users", "posts", "tags", "likes"):
+        diagram.add_table(Table(name, name, []))
+    diagram.add_edge("posts", "users")
+    diagram.add_edge("likes", "tags")
+    diagram.render_svg()
+
+    full_calls = []
+    monkeypatch.setattr(EdgeRouter, "route", staticmethod(lambda *a, **k: full_calls.append(a)))
+    node = diagram.get_node("users")
+    diagram.set_node_position("users", node.x, node.y + 300)
+    diagram.render_svg()
+
+    assert full_calls == []
+    posts_edge = diagram.canvas.edges[0]
+    assert posts_edge.to_point[1] >= node.y
+
+
+def _blocked_pair():
+    nodes = [
+        RouteTestNode("source", 0, 0, 50, 50),
+        RouteTestNode("target", 200, 0, 50, 50),
+        RouteTestNode("blocker", 75, -100, 100, 300),
+    ]
+    return nodes, [RouteTestEdge("source", "target")]
+
+
+def test_route_cache_reuses_search_results(tmp_path):
+    nodes, edges = _blocked_pair()
+    cache = RouteCache(path=str(tmp_path / "routes.json"))
+
+    first = EdgeRouter.route(nodes, edges, cache=cache)[0]
+    second = EdgeRouter.route(nodes, edges, cache=cache)[0]
+
+    assert first.route_source == "search"
+    assert second.route_source == "cache"
+    assert second.waypoints == first.waypoints
+
+    cache.save()
+    reloaded = RouteCache(path=str(tmp_path / "routes.json"))
+    third = EdgeRouter.route(nodes, edges, cache=reloaded)[0]
+    assert third.route_source == "cache"
+    assert third.waypoints == first.waypoints
+
+
+def test_route_cache_misses_when_local_obstacles_change():
+    nodes, edges = _blocked_pair()
+    cache = RouteCache()
+    EdgeRouter.route(nodes, edges, cache=cache)
+
+    nodes[2].height = 400
+    route = EdgeRouter.route(nodes, edges, cache=cache)[0]
+
+    assert route.route_source == "search"
+
+
+def test_route_cache_evicts_least_recently_used_entry():
+    cache = RouteCache(maxsize=2)
+    cache.put("a", [(0, 0)])
+    cache.put("b", [(1, 1)])
+    cache.get("a")
+    cache.put("c", [(2, 2)])
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == [(0, 0)]
+
+
+def test_search_grid_links_skip_blocked_points():
+    xs, ys = [0, 50, 100], [0, 50, 100]
+    grid = routing._SearchGrid(xs, ys, [(40, -20, 20, 40)], 0, keep=((0, 0),))
+
+    origin = grid.index((0, 0))
+    below = grid.index((0, 50))
+    # (50, 0) は障害物内なので右隣は (100, 0) だが、間の線分が障害物を横切る
+    assert grid.blocked[grid.index((50, 0))]
+    assert grid.links[1][origin] == grid.index((100, 0))
+    assert grid.neighbor(origin, 1) == -1
+    assert grid.neighbor(origin, 3) == below
+    assert grid.neighbor(below, 1) == grid.index((50, 50))
+
+
+def test_route_batches_group_overlapping_regions():
+    nodes, edges = _two_pairs()
+    nodes.append(RouteTestNode("e", 100, 60, 60, 40))
+    edges.append(RouteTestEdge("a", "e"))
+    plan = EdgeRouter._plan(nodes, edges, 12, routing._SearchOptions(), None)
+
+    batches = plan.batches(plan.route_order)
+
+    assert sorted(sorted(batch) for batch in batches) == [[0, 2], [1]]
+    for batch in batches:
+        assert batch == [idx for idx in plan.route_order if idx in batch]
+
+
+def test_parallel_route_matches_serial_for_independent_edges():
+    nodes, edges = _two_pairs()
+    nodes.append(RouteTestNode("blocker", 100, 350, 40, 140))
+
+    serial = EdgeRouter.route(nodes, edges)
+    parallel = EdgeRouter.route(nodes, edges, workers=2)
+
+    assert [r.waypoints for r in parallel] == [r.waypoints for r in serial]
+    assert [r.route_source for r in parallel] == [r.route_source for r in serial]
+
+
+def _crossing_pairs():
+    nodes = [
+        RouteTestNode("left", 0, 100, 40, 40),
+        RouteTestNode("right", 300, 100, 40, 40),
+        RouteTestNode("top", 150, -100, 40, 40),
+        RouteTestNode("bottom", 150, 300, 40, 40),
+        RouteTestNode("left2", 0, 180, 40, 40),
+        RouteTestNode("right2", 300, 180, 40, 40),
+    ]
+    edges = [
+        RouteTestEdge("left", "right"),
+        RouteTestEdge("top", "bottom"),
+        RouteTestEdge("left2", "right2"),
+    ]
+    return nodes, edges
+
+
+def _total_cost(routes):
+    total = 0.0
+    for idx, route in enumerate(routes):
+        others = [
+            seg for j, other in enumerate(routes) if j != idx
+            for seg in routing._segments_from_points([other.from_point, *other.waypoints, other.to_point])
+        ]
+        total += routing._path_cost([route.from_point, *route.waypoints, route.to_point], others)
+    return total
+
+
+def test_jacobi_refinement_never_increases_cost():
+    nodes, edges = _crossing_pairs()
+
+    unrefined = EdgeRouter.route(nodes, edges, refine_rounds=0)
+    jacobi = EdgeRouter.route(nodes, edges, refine_mode="jacobi")
+    parallel = EdgeRouter.route(nodes, edges, refine_mode="jacobi", workers=2)
+
+    assert all(route.route_status == "ok" for route in jacobi)
+    assert _total_cost(jacobi) <= _total_cost(unrefined)
+    assert [r.waypoints for r in parallel] == [r.waypoints for r in jacobi]
+
+
+def test_unknown_refine_mode_is_rejected():
+    nodes, edges = _two_pairs()
+    with pytest.raises(ValueError):
+        EdgeRouter.route(nodes, edges, refine_mode="gauss")
+
+
+def test_coarse_corridor_avoids_dense_cells():
+    wall = (100, -200, 100, 500)
+    corridor = routing._coarse_corridor((0, 50), (300, 50), [wall], 12, 50)
+
+    assert corridor is not None
+    assert corridor.contains((0, 50)) and corridor.contains((300, 50))
+    # 壁を横切るセルは含まず、上下どちらかを回り込む
+    assert not corridor.contains((150, 50))
+
+
+def test_coarse_to_fine_route_is_clear():
+    nodes, edges = _blocked_pair()
+
+    route = EdgeRouter.route(nodes, edges, coarse_cell=40)[0]
+
+    assert route.route_status == "ok"
+    points = [route.from_point, *route.waypoints, route.to_point]
+    assert routing._path_clear(points, [(75, -100, 100, 300)], 12)
+
+
+def test_grid_point_limit_marks_route_reason():
+    nodes, edges = _blocked_pair()
+
+    route = EdgeRouter.route(nodes, edges, max_grid_points=4)[0]
+
+    assert route.route_status == "failed"
+    assert route.route_reason == "grid-limit"
+    assert route.waypoints == []
+
+
+def _star():
+    nodes = [RouteTestNode("hub", 300, 300, 80, 60)]
+    edges = []
+    for i, (x, y) in enumerate([(0, 0), (600, 0), (0, 600), (600, 600), (0, 300), (600, 280)]):
+        nodes.append(RouteTestNode(f"t{i}", x, y, 60, 40))
+        edges.append(RouteTestEdge("hub", f"t{i}"))
+    nodes.append(RouteTestNode("blocker", 150, 100, 40, 160))
+    return nodes, edges
+
+
+def test_hub_edges_share_search_and_stay_clear():
+    nodes, edges = _star()
+    rects = {n.node_id: (n.x, n.y, n.width, n.height) for n in nodes}
+
+    routes = EdgeRouter.route(nodes, edges, fast_path=False, hub_min_edges=2)
+
+    assert all(route.route_status == "ok" for route in routes)
+    assert "hub" in {route.route_source for route in routes}
+    for edge, route in zip(edges, routes):
+        obstacles = [r for nid, r in rects.items() if nid not in (edge.from_node_id, edge.to_node_id)]
+        points = [route.from_point, *route.waypoints, route.to_point]
+        assert routing._path_clear(points, obstacles, 12)
+
+
+def test_hub_grouping_requires_min_edges():
+    nodes, edges = _star()
+    options = routing._SearchOptions()
+
+    grouped = EdgeRouter._plan(nodes, edges, 12, options, None, hub_min_edges=2)
+    ungrouped = EdgeRouter._plan(nodes, edges, 12, options, None, hub_min_edges=10)
+
+    assert grouped.hub_groups
+    assert all(role == "src" for group in grouped.hub_groups.values() for _, role in group.members)
+    assert not ungrouped.hub_groups
+
+
+def _overlapping_plan():
+    nodes = [
+        RouteTestNode("a", 0, 0, 40, 40),
+        RouteTestNode("b", 400, 0, 40, 40),
+        RouteTestNode("c", 0, 200, 40, 40),
+        RouteTestNode("d", 400, 200, 40, 40),
+    ]
+    edges = [RouteTestEdge("a", "b"), RouteTestEdge("c", "d")]
+    plan = EdgeRouter._plan(nodes, edges, 12, routing._SearchOptions(), None)
+    # 両エッジとも y=120 の同じ水平区間を通る経路にしておく
+    for idx in (0, 1):
+        (sx, sy), (dx, dy) = plan.ports(idx)
+        plan.commit(idx, [(sx + 40, sy), (sx + 40, 120), (dx - 40, 120), (dx - 40, dy)], "search")
+    return plan
+
+
+def test_nudge_pass_separates_overlapping_segments():
+    plan = _overlapping_plan()
+    assert plan.penalised(0) and plan.penalised(1)
+
+    EdgeRouter._nudge_pass(plan, plan.route_order)
+
+    assert not plan.penalised(0) and not plan.penalised(1)
+    assert plan.paths[0][1][1] != plan.paths[1][1][1]
+    for idx in (0, 1):
+        src_port, dst_port = plan.ports(idx)
+        points = [src_port, *plan.paths[idx], dst_port]
+        assert all(a[0] == b[0] or a[1] == b[1] for a, b in zip(points, points[1:]))
+
+
+def _collinear_overlap(plan, idx, other):
+    total = 0
+    for x1, y1, x2, y2 in plan.segments_map[idx]:
+        for u1, v1, u2, v2 in plan.segments_map[other]:
+            if y1 == y2 == v1 == v2:
+                total += routing._overlap_length(x1, x2, u1, u2)
+            elif x1 == x2 == u1 == u2:
+                total += routing._overlap_length(y1, y2, v1, v2)
+    return total
+
+
+def test_nudge_pass_does_not_create_overlap_on_neighbour_segments():
+    nodes = [
+        RouteTestNode("a", 0, 0, 40, 40),
+        RouteTestNode("b", 400, 0, 40, 40),
+        RouteTestNode("c", 0, 200, 40, 40),
+        RouteTestNode("d", 400, 200, 40, 40),
+        RouteTestNode("e", 200, 300, 40, 40),
+        RouteTestNode("f", 500, 300, 40, 40),
+    ]
+    edges = [RouteTestEdge("a", "b"), RouteTestEdge("c", "d"), RouteTestEdge("e", "f")]
+    plan = EdgeRouter._plan(nodes, edges, 12, routing._SearchOptions(), None)
+    for idx in (0, 1):
+        (sx, sy), (dx, dy) = plan.ports(idx)
+        plan.commit(idx, [(sx + 40, sy), (sx + 40, 120), (dx - 40, 120), (dx - 40, dy)], "search")
+    # 3本目: y=126 の水平区間と、x=80 の y=100..118 の垂直区間を持つ
+    (sx, sy), (dx, dy) = plan.ports(2)
+    plan.commit(2, [
+        (sx, 100), (80, 100), (80, 118), (70, 118), (70, 126), (dx, 126),
+    ], "search")
+    assert _collinear_overlap(plan, 1, 2) == 0
+
+    EdgeRouter._nudge_pass(plan, [1])
+
+    assert _collinear_overlap(plan, 1, 2) == 0
+    assert _collinear_overlap(plan, 1, 0) == 0
+
+
+def test_route_with_nudge_keeps_routes_clear():
+    nodes, edges = _crossing_pairs()
+    rects = {n.node_id: (n.x, n.y, n.width, n.height) for n in nodes}
+
+    routes = EdgeRouter.route(nodes, edges, nudge=True, refine_rounds=0)
+
+    for edge, route in zip(edges, routes):
+        obstacles = [r for nid, r in rects.items() if nid not in (edge.from_node_id, edge.to_node_id)]
+        assert routing._path_clear([route.from_point, *route.waypoints, route.to_point], obstacles, 12)
+
+
+def test_search_budget_degrades_route():
+    nodes, edges = _blocked_pair()
+
+    route = EdgeRouter.route(nodes, edges, fast_path=False, max_expansions=3, refine_rounds=0)[0]
+
+    assert route.route_status == "degraded"
+    assert route.route_reason == "search-budget"
+    # 途中経路からの L字は障害物を横切るので直線にフォールバックする
+    assert route.route_source == "straight"
+    assert route.waypoints == []
+
+
+def test_search_budget_partial_route_is_connected():
+    obstacles = [(50, -60, 40, 100)]
+    with pytest.raises(routing._SearchBudgetExceeded) as exceeded:
+        routing._find_grid_path(
+            (0, 0), (400, 300), obstacles, [], 12, budget=routing._SearchBudget(1, None)
+        )
+
+    partial = exceeded.value.partial
+    waypoints, source = routing._degraded_path(
+        (-13, 0), (0, 0), partial, (400, 300), (413, 300), obstacles, 12
+    )
+
+    assert partial[0] == (0, 0) and len(partial) > 1
+    assert source == "partial"
+    points = [(-13, 0), *waypoints, (413, 300)]
+    assert routing._path_clear(points, obstacles, 12)
+    assert all(a[0] == b[0] or a[1] == b[1] for a, b in zip(points, points[1:]))
+
+
+def test_generous_budget_keeps_search_result():
+    nodes, edges = _blocked_pair()
+
+    unlimited = EdgeRouter.route(nodes, edges, fast_path=False)[0]
+    limited = EdgeRouter.route(nodes, edges, fast_path=False, max_expansions=100000, time_limit=60)[0]
+
+    assert limited.route_status == "ok"
+    assert limited.waypoints == unlimited.waypoints
+
+
+def test_route_result_reports_search_diagnostics():
+    nodes, edges = _blocked_pair()
+
+    route = EdgeRouter.route(nodes, edges, refine_rounds=0)[0]
+
+    assert route.route_source == "search"
+    assert route.route_pass == "route"
+    assert route.grid_points > route.blocked_points >= 0
+    assert route.expansions > 0 and route.peak_heap > 0
+    assert route.wall_time > 0
+    assert route.cost > 0
+    assert route.diagnostics()["expansions"] == route.expansions
+
+
+def _parallel_pair():
+    nodes = [
+        RouteTestNode("a", 0, 0, 100, 60),
+        RouteTestNode("b", 300, 200, 100, 60),
+    ]
+    return nodes, [RouteTestEdge("a", "b"), RouteTestEdge("b", "a"), RouteTestEdge("a", "b")]
+
+
+def test_collapse_parallel_offsets_trunk_into_lanes(monkeypatch):
+    nodes, edges = _parallel_pair()
+    calls = _count_choose_path(monkeypatch)
+
+    routes = EdgeRouter.route(nodes, edges, collapse_parallel=True)
+
+    # 代表エッジだけ探索し、残りは幹をずらしたレーン
+    assert len(calls) == 1
+    assert [r.route_source for r in routes[1:]] == ["lane", "lane"]
+    paths = [[r.from_point, *r.waypoints, r.to_point] for r in routes]
+    for i, points in enumerate(paths):
+        assert all(p[0] == q[0] or p[1] == q[1] for p, q in zip(points, points[1:]))
+        # レーン同士は重ならず、交差もしない
+        others = [
+            seg for j, other in enumerate(paths) if j != i
+            for seg in routing._segments_from_points(other)
+        ]
+        assert routing._soft_path_cost(points, others) == 0
+
+
+def test_collapse_parallel_widens_trunk_around_obstacle():
+    nodes = [
+        RouteTestNode("a", 0, 0, 100, 60),
+        RouteTestNode("b", 400, 0, 100, 60),
+        RouteTestNode("x", 180, -100, 60, 260),
+    ]
+    edges = [RouteTestEdge("a", "b"), RouteTestEdge("b", "a"), RouteTestEdge("a", "b")]
+
+    routes = EdgeRouter.route(nodes, edges, fast_path=False, collapse_parallel=True)
+
+    assert [r.route_source for r in routes] == ["search", "lane", "lane"]
+    for r in routes:
+        points = [r.from_point, *r.waypoints, r.to_point]
+        assert routing._path_clear(points, [(180, -100, 60, 260)], 12)
+
+
+def test_reroute_keeps_collapsed_lanes_when_unaffected():
+    nodes, edges = _parallel_pair()
+    nodes.append(RouteTestNode("far", 800, 600, 100, 60))
+    previous = EdgeRouter.route(nodes, edges, collapse_parallel=True)
+
+    old_rect = (nodes[2].x, nodes[2].y, nodes[2].width, nodes[2].height)
+    nodes[2].x = 900
+    routes = EdgeRouter.reroute(nodes, edges, previous, {"far": old_rect}, collapse_parallel=True)
+
+    assert routes == previous
+    assert all(r.route_pass == "kept" for r in routes)
+
+
+def test_assign_ports_matches_route_ports_without_search(monkeypatch):
+    nodes, edges = _crossing_pairs()
+    routed = EdgeRouter.route(nodes, edges)
+    calls = _count_choose_path(monkeypatch)
+
+    ports = EdgeRouter.assign_ports(nodes, edges)
+
+    assert calls == []
+    assert [(p.from_point, p.to_point, p.from_side, p.to_side) for p in ports] == [
+        (r.from_point, r.to_point, r.from_side, r.to_side) for r in routed
+    ]
+    assert all(p.waypoints == [] and p.route_status == "ok" for p in ports)
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from in4viz.backends.drawio import DrawioERDiagram
+from in4viz.backends.svg import SVGERDiagram
+from in4viz.core.models import Column, Table
+
+
+def _populate(diagram, count=6):
+    for i in range(count):
+        diagram.add_table(Table(f"t{i}", f"テーブル{i}", [
+            Column("id", "ID", "INT", primary_key=True),
+            Column("name", "名前", "VARCHAR", nullable=False, index=True),
+            Column("parent_id", "親ID", "INT", foreign_key=True),
+        ], bgcolor="#ffeecc", use_gradient=bool(i % 2)), (i % 3) * 300, (i // 3) * 200)
+    return diagram
+
+
+@pytest.mark.parametrize("options", [{}, {"minify": True}, {"compact": True}])
+def test_parallel_svg_render_matches_serial(options):
+    serial = _populate(SVGERDiagram()).render_svg(**options)
+    parallel = _populate(SVGERDiagram()).render_svg(workers=2, **options)
+
+    assert parallel == serial
+
+
+def _gradient_tables(diagram):
+    for i in range(60):
+        diagram.add_table(Table(f"t{i}", f"t{i}", [
+            Column("id", "ID", "INT", primary_key=True),
+        ], bgcolor=f"#{i * 4:02x}eecc", use_gradient=True), (i % 10) * 200, (i // 10) * 100)
+    return diagram
+
+
+def test_parallel_gradient_ids_are_unique_per_table():
+    parallel = _gradient_tables(SVGERDiagram()).render_svg(workers=2)
+
+    gradients = re.findall(r'<linearGradient id="([^"]+)"', parallel)
+    assert len(gradients) == len(set(gradients)) == 60
+    assert parallel == _gradient_tables(SVGERDiagram()).render_svg()
+
+
+def test_parallel_streaming_matches_serial_without_caching():
+    # バッチ(16ノード)を複数回先読みする数にする
+    diagram = _populate(SVGERDiagram(), 40)
+    serial = diagram.render_svg(compact=True)
+    for node in diagram.nodes:
+        node._fragments.clear()
+
+    parallel = "".join(diagram.iter_svg(compact=True, workers=2))
+
+    assert parallel == serial
+    assert all(not node._fragments for node in diagram.nodes)
+
+
+def test_parallel_drawio_render_matches_serial():
+    serial = _populate(DrawioERDiagram()).render_drawio()
+    parallel = _populate(DrawioERDiagram()).render_drawio(workers=2)
+
+    assert parallel == serial
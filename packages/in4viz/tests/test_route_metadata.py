@@ -44,6 +44,39 @@ def test_edge_router_routes_around_blocking_node_with_visibility_grid():
     assert any(y < -100 for _, y in route.waypoints) or any(y > 200 for _, y in route.waypoints)
 
 
+def test_edge_router_uses_fast_path_for_unobstructed_edges():
+    nodes = [
+        RouteTestNode("source", 0, 0, 50, 50),
+        RouteTestNode("target", 200, 100, 50, 50),
+    ]
+    edges = [RouteTestEdge("source", "target")]
+
+    route = EdgeRouter.route(nodes, edges, fast_path=True)[0]
+    default = EdgeRouter.route(nodes, edges)[0]
+
+    assert route.route_status == "ok"
+    assert route.route_source in ("direct", "l-shape")
+    assert default.route_source == "search"
+    # A* の下界に等しい形だけを採用するので、探索した経路よりコストが高くならない
+    assert route.cost <= default.cost
+    assert len(route.waypoints) <= 4
+
+
+def test_edge_router_falls_back_to_search_when_fast_path_is_blocked():
+    nodes = [
+        RouteTestNode("source", 0, 0, 50, 50),
+        RouteTestNode("target", 200, 0, 50, 50),
+        RouteTestNode("blocker", 75, -100, 100, 300),
+    ]
+    edges = [RouteTestEdge("source", "target")]
+
+    route = EdgeRouter.route(nodes, edges, fast_path=True)[0]
+    disabled = EdgeRouter.route(nodes, edges)[0]
+
+    assert route.route_source == "search"
+    assert disabled.route_source == "search"
+
+
 def test_edge_router_marks_missing_node_as_failed_route():
     nodes = [RouteTestNode("source", 0, 0, 50, 50)]
     edges = [RouteTestEdge("source", "missing")]
@@ -53,6 +86,7 @@ def test_edge_router_marks_missing_node_as_failed_route():
     assert route.waypoints == []
     assert route.route_status == "failed"
     assert route.route_reason == "missing-node"
+    assert route.route_source == ""
 
 
 def test_grid_router_treats_existing_segments_as_soft_obstacles():
@@ -109,7 +143,7 @@ def test_svg_diagram_defers_layout_until_render(monkeypatch):
     original_adjust = LayoutEngine.adjust_canvas_size
 
     def fake_layout(nodes, edges, iterations=200, margin=50, min_width=800,
-                    min_height=600, ideal_length_factor=1.6):
+                    min_height=600, ideal_length_factor=1.6, collapse_parallel=False):
         nonlocal calls
         calls += 1
         return original_adjust(nodes, margin=margin, min_width=min_width, min_height=min_height)
@@ -134,7 +168,7 @@ def test_drawio_diagram_defers_layout_until_render(monkeypatch):
     original_adjust = LayoutEngine.adjust_canvas_size
 
     def fake_layout(nodes, edges, iterations=200, margin=50, min_width=800,
-                    min_height=600, ideal_length_factor=1.6):
+                    min_height=600, ideal_length_factor=1.6, collapse_parallel=False):
         nonlocal calls
         calls += 1
         return original_adjust(nodes, margin=margin, min_width=min_width, min_height=min_height)
@@ -152,3 +186,50 @@ def test_drawio_diagram_defers_layout_until_render(monkeypatch):
     assert calls == 1
     diagram.render_drawio()
     assert calls == 1
+
+
+def test_diagrams_expose_route_diagnostics():
+    for diagram in (SVGERDiagram(), DrawioERDiagram()):
+        diagram.add_table(_table("users"), 0, 0)
+        diagram.add_table(_table("orders"), 400, 200)
+        diagram.add_edge("users", "orders", line_type=LineType.ORTHOGONAL)
+
+        diagnostics = diagram.get_route_diagnostics()
+
+        assert len(diagnostics) == 1
+        assert diagnostics[0]["from"] == "users" and diagnostics[0]["to"] == "orders"
+        assert diagnostics[0]["route_pass"] == "route"
+        assert "wall_time" in diagnostics[0] and "expansions" in diagnostics[0]
+
+
+def test_layout_counts_parallel_edges_once_when_collapsed():
+    def place(edges, **kwargs):
+        nodes = [RouteTestNode(name, 0, 0, 120, 80) for name in ("a", "b", "c")]
+        LayoutEngine.layout(nodes, edges, iterations=50, **kwargs)
+        return [(n.x, n.y) for n in nodes]
+
+    single = [RouteTestEdge("a", "b"), RouteTestEdge("b", "c")]
+    parallel = [RouteTestEdge("a", "b"), RouteTestEdge("b", "a"), RouteTestEdge("a", "b"), RouteTestEdge("b", "c")]
+
+    assert place(parallel, collapse_parallel=True) == place(single)
+    assert place(parallel) != place(single)
+
+
+def test_drawio_client_routing_emits_native_orthogonal_style(monkeypatch):
+    def fail_route(*args, **kwargs):
+        raise AssertionError("EdgeRouter.route should not run in client routing mode")
+
+    monkeypatch.setattr(EdgeRouter, "route", staticmethod(fail_route))
+    diagram = DrawioERDiagram(default_line_type=LineType.ORTHOGONAL, client_routing=True)
+    diagram.add_table(_table("users"), 0, 0)
+    diagram.add_table(_table("orders"), 400, 0)
+    diagram.add_edge("users", "orders")
+
+    xml = diagram.render_drawio()
+
+    constraints = {"top": "north", "right": "east", "bottom": "south", "left": "west"}
+    route = diagram._routes[0]
+    assert "edgeStyle=orthogonalEdgeStyle" in xml
+    assert f"sourcePortConstraint={constraints[route.from_side]}" in xml
+    assert f"targetPortConstraint={constraints[route.to_side]}" in xml
+    assert "<Array" not in xml
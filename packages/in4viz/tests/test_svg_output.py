@@ -0,0 +1,216 @@
+import gzip
+import io
+from xml.dom import minidom
+
+from in4viz.backends.svg import SVGERDiagram
+from in4viz.backends.svg.rendering import _relative_path
+from in4viz.backends.svg.stencil import TableStencil
+from in4viz.core.models import Column, LineType, Table
+
+
+def _diagram() -> SVGERDiagram:
+    diagram = SVGERDiagram(default_line_type=LineType.ORTHOGONAL)
+    for name in ("users", "orders", "items"):
+        diagram.add_table(Table(name, name, [
+            Column("id", "ID", "INT", primary_key=True),
+            Column("name", "Name", "VARCHAR", nullable=False),
+        ]))
+    diagram.add_edge("users", "orders")
+    diagram.add_edge("orders", "items")
+    return diagram
+
+
+class _RecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+def test_iter_svg_concatenates_to_render_svg():
+    diagram = _diagram()
+
+    chunks = list(diagram.iter_svg())
+
+    assert "".join(chunks) == diagram.render_svg()
+    assert chunks[0].startswith("<svg ")
+    assert chunks[-1].endswith("</svg>")
+
+
+def test_save_svg_streams_chunks():
+    diagram = _diagram()
+    stream = _RecordingStream()
+
+    diagram.save_svg(stream)
+
+    assert stream.getvalue() == diagram.render_svg()
+    # ノードごと・エッジごとに書き込まれる
+    assert len(stream.writes) >= len(diagram.nodes) + len(diagram.canvas.edges)
+    assert max(len(w) for w in stream.writes) < len(stream.getvalue())
+
+
+def test_streaming_does_not_fill_fragment_cache():
+    diagram = _diagram()
+
+    diagram.save_svg(io.StringIO(), compact=True)
+    "".join(diagram.iter_svg(minify=True))
+
+    assert all(not node._fragments for node in diagram.nodes)
+
+
+def test_compact_svg_uses_shared_styles_and_gradients():
+    diagram = SVGERDiagram()
+    for name, color in (("a", "#ffeecc"), ("b", "#ccffee"), ("c", "#ffeecc")):
+        diagram.add_table(Table(name, name, [Column("id", "ID", "INT", primary_key=True)],
+                                bgcolor=color, use_gradient=True))
+    diagram.add_edge("a", "b")
+
+    compact = diagram.render_svg(compact=True)
+    full = diagram.render_svg()
+
+    minidom.parseString(compact)
+    assert compact.count("<style>") == 1
+    assert "font-family" not in compact
+    assert 'stroke="black"' not in compact.rsplit("</defs>", 1)[1]
+    assert compact.count("<linearGradient") == 2
+    assert full.count("<linearGradient") == 3
+    assert len(compact) < len(full)
+
+
+def test_cardinality_markers_use_shared_symbols():
+    diagram = _diagram()
+
+    svg = diagram.render_svg()
+
+    minidom.parseString(svg)
+    assert svg.count('<symbol id="ie-') == 4
+    assert "<circle" not in svg.split("</defs>", 1)[1]
+    uses = minidom.parseString(svg).getElementsByTagName("use")
+    assert len(uses) == 2 * len(diagram.canvas.edges)
+    for use in uses:
+        # SVG 1.1 のビューア向けに xlink:href も併記する
+        assert use.getAttribute("href").startswith("#ie-")
+        assert use.getAttributeNS("http://www.w3.org/1999/xlink", "href") == use.getAttribute("href")
+
+
+def test_save_svg_writes_svgz(tmp_path):
+    diagram = _diagram()
+    path = tmp_path / "diagram.svgz"
+
+    diagram.save_svg(str(path))
+    stream = io.BytesIO()
+    diagram.save_svg(stream, compress=True, compress_level=1)
+
+    expected = diagram.render_svg()
+    assert gzip.decompress(path.read_bytes()).decode("utf-8") == expected
+    assert gzip.decompress(stream.getvalue()).decode("utf-8") == expected
+    assert path.stat().st_size < len(expected.encode("utf-8"))
+
+
+def test_minified_svg_drops_whitespace_and_defaults():
+    diagram = _diagram()
+
+    minified = diagram.render_svg(minify=True)
+    full = diagram.render_svg()
+
+    minidom.parseString(minified)
+    assert "\n" not in minified
+    assert 'stroke-width="1"' not in minified
+    assert 'font-weight="normal"' not in minified
+    assert " L " not in minified
+    assert len(minified) < len(full)
+    assert "".join(diagram.iter_svg(compact=True, minify=True)) == diagram.render_svg(compact=True, minify=True)
+
+
+def test_relative_path_uses_h_v_commands():
+    assert _relative_path([(10, 20), (40, 20), (40, 5), (40, 5), (30, 15)]) == "M10 20h30v-15l-10 10"
+
+
+def test_node_fragments_are_cached_across_moves(monkeypatch):
+    diagram = _diagram()
+    diagram.render_svg()
+    calls = []
+    original = TableStencil.render
+    monkeypatch.setattr(TableStencil, "render", lambda self, *a, **kw: calls.append(a[0]) or original(self, *a, **kw))
+
+    diagram.set_node_position("users", 700, 40)
+    svg = diagram.render_svg()
+
+    assert calls == []
+    assert '<g id="n-users" transform="translate(700 40)">' in svg
+
+    node = diagram.get_node("orders")
+    node.data = dict(node.data, logical_name="Orders")
+    assert "Orders (orders)" in diagram.render_svg()
+    assert len(calls) == 1
+
+
+def _grid_diagram() -> SVGERDiagram:
+    diagram = SVGERDiagram(default_line_type=LineType.ORTHOGONAL)
+    for i in range(4):
+        diagram.add_table(Table(f"t{i}", f"t{i}", [
+            Column("id", "ID", "INT", primary_key=True),
+            Column("name", "Name", "VARCHAR"),
+        ]), (i % 2) * 600, (i // 2) * 600)
+    diagram.add_edge("t0", "t1")
+    diagram.add_edge("t2", "t3")
+    diagram._layout_dirty = False
+    diagram._route_dirty = True
+    return diagram
+
+
+def test_viewport_renders_only_intersecting_elements():
+    diagram = _grid_diagram()
+
+    svg = diagram.render_svg(viewport=(0, 0, 900, 300))
+
+    minidom.parseString(svg)
+    assert 'viewBox="0 0 900 300"' in svg
+    assert ">t0<" in svg and ">t1<" in svg
+    assert ">t2<" not in svg and ">t3<" not in svg
+    assert svg.count("<path") == 1
+
+
+def test_export_tiles_writes_levels_and_manifest(tmp_path):
+    diagram = _grid_diagram()
+
+    manifest = diagram.export_tiles(str(tmp_path), tile_size=256, levels=2)
+
+    coarse, fine = manifest["levels"]
+    assert coarse["detail_level"] == "header" and fine["detail_level"] == "full"
+    assert fine["columns"] == 2 * coarse["columns"]
+    assert (tmp_path / "tiles.json").exists()
+    for level in manifest["levels"]:
+        for column, row in level["tiles"]:
+            minidom.parse(str(tmp_path / str(level["level"]) / f"{column}_{row}.svg"))
+    coarse_svg = (tmp_path / "0" / "0_0.svg").read_text(encoding="utf-8")
+    assert ">t0<" in coarse_svg and ">ID<" not in coarse_svg
+
+
+def test_render_svg_delta_reports_changed_elements():
+    diagram = _grid_diagram()
+
+    first = diagram.render_svg_delta()
+    assert first.document is not None
+    assert 'id="n-t0"' in first.document and 'id="e-t0-t1-0"' in first.document
+
+    unchanged = diagram.render_svg_delta(first.token)
+    assert unchanged.document is None
+    assert (unchanged.added, unchanged.updated, unchanged.removed) == ([], [], [])
+
+    diagram.set_node_position("t3", 900, 700)
+    moved = diagram.render_svg_delta(unchanged.token)
+
+    updated = dict(moved.updated)
+    assert set(updated) == {"n-t3", "e-t2-t3-0"}
+    assert 'transform="translate(900 700)"' in updated["n-t3"]
+    assert (moved.added, moved.removed) == ([], [])
+
+    diagram.add_table(Table("t 4", "t 4", [Column("id", "ID", "INT", primary_key=True)]))
+    added = diagram.render_svg_delta(moved.token)
+    assert [element_id for element_id, _ in added.added] == ["n-t.20.4"]
+
+    assert diagram.render_svg_delta("stale").document is not None